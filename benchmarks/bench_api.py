@@ -0,0 +1,65 @@
+"""
+Benchmarks of the Concepticon API and of data-compiling commands.
+"""
+import logging
+
+from pyconcepticon import Concepticon
+from pyconcepticon.__main__ import main
+from pyconcepticon.stats import CatalogStats
+from pyconcepticon.util import CheckReport
+
+
+def concepticon(repos, *args):
+    main(['--repos', str(repos)] + list(args), log=logging.getLogger(__name__))
+
+
+def bench_load(repos):
+    def run():
+        api = Concepticon(repos)
+        assert api.conceptsets and api.relations
+        for cl in api.conceptlists.values():
+            assert cl.concepts
+    return run
+
+
+def bench_check(repos):
+    def run():
+        assert Concepticon(repos).check(report=CheckReport('benchmark'))
+    return run
+
+
+def bench_map(repos):
+    api = Concepticon(repos)
+    clist = next(iter(api.conceptlists.values())).path
+    api._get_map_for_language('en')
+    return lambda: api.map(clist, out=api.cache_path('map.tsv'))
+
+
+def bench_lookup(repos):
+    api = Concepticon(repos)
+    glosses = [c.english for c in next(iter(api.conceptlists.values())).concepts.values()]
+    api._get_map_for_language('en')
+    return lambda: list(api.lookup(glosses))
+
+
+def bench_make_linkdata(repos):
+    return lambda: concepticon(repos, 'make_linkdata')
+
+
+def bench_stats(repos):
+    def run():
+        stats = CatalogStats.from_api(Concepticon(repos))
+        assert stats.most_diverse() and stats.most_frequent()
+    return run
+
+
+def bench_dump(repos):
+    return lambda: concepticon(
+        repos, 'dump', '--destination', str(Concepticon(repos).cache_path('linkdata.zip')))
+
+
+def bench_dump_binary(repos):
+    return lambda: concepticon(
+        repos,
+        'dump', '--format', 'binary',
+        '--destination', str(Concepticon(repos).cache_path('linkdata.bin')))
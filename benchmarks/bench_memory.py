@@ -0,0 +1,22 @@
+"""
+Benchmarks of the memory retained by the data structures of the Concepticon API.
+"""
+from pyconcepticon import Concepticon
+from pyconcepticon.memory import measure
+
+
+def _retained(*structures):
+    def bench(repos):
+        # A first run makes sure modules which are imported lazily are not measured.
+        measure(Concepticon(repos), structures=structures, top=0)
+        return lambda: measure(Concepticon(repos), structures=structures, top=0).total
+    bench.unit = 'bytes'
+    return bench
+
+
+bench_conceptsets = _retained('conceptsets')
+bench_relations = _retained('relations')
+bench_bibliography = _retained('bibliography')
+bench_conceptlists = _retained('conceptlists')
+bench_concepts = _retained('concepts')
+bench_mappings = _retained('mappings')
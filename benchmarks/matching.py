@@ -0,0 +1,238 @@
+"""
+Evaluate the gloss matchers `concept_map` and `concept_map2` against linked concept lists.
+
+The linked concepts of a repository's concept lists serve as gold standard: their glosses are
+mapped to concept sets with each matcher and at each `--level` of similarity, and the concept set
+of the best match is compared to the concept set the concept is linked to. For each matcher and
+level we report
+
+- precision: the ratio of matched glosses which were matched to the linked concept set,
+- recall: the ratio of all glosses which were matched to the linked concept set,
+- coverage: the ratio of all glosses for which a match was found,
+- throughput: the number of glosses matched per second.
+
+Since the map files are compiled from the concept lists themselves, each list is matched against
+a map compiled from all other lists - unless `--no-holdout` is given, in which case the map file
+is used as is.
+
+Usage:
+
+    python benchmarks/matching.py --repos ../concepticon-data --limit 20 --save matching.json
+    python benchmarks/matching.py --repos ../concepticon-data --limit 20 --compare matching.json
+
+When comparing, the exit status is 1 if precision or recall of any matcher and level is lower than
+in the baseline, or if throughput dropped by more than `--tolerance`. Synthetic repositories are
+only useful to measure throughput, because their glosses are copies of concept set glosses.
+"""
+import sys
+import time
+import argparse
+import pathlib
+import tempfile
+import collections
+
+import attr
+from clldutils import jsonlib
+from tabulate import tabulate
+
+from pyconcepticon import Concepticon
+from pyconcepticon.glosses import concept_map, concept_map2
+from pyconcepticon.linkdata import replacements, contributions, linking_data
+from pyconcepticon.synthetic import SCALES, generate
+
+MATCHERS = collections.OrderedDict([
+    ('concept_map', concept_map),
+    ('concept_map2', concept_map2),
+])
+
+
+@attr.s
+class Result(object):
+    glosses = attr.ib(default=0)
+    matched = attr.ib(default=0)
+    correct = attr.ib(default=0)
+    seconds = attr.ib(default=0.0)
+
+    @property
+    def precision(self):
+        return self.correct / self.matched if self.matched else 0.0
+
+    @property
+    def recall(self):
+        return self.correct / self.glosses if self.glosses else 0.0
+
+    @property
+    def coverage(self):
+        return self.matched / self.glosses if self.glosses else 0.0
+
+    @property
+    def throughput(self):
+        return self.glosses / self.seconds if self.seconds else 0.0
+
+    def asdict(self):
+        return collections.OrderedDict(
+            (k, getattr(self, k))
+            for k in ['glosses', 'precision', 'recall', 'coverage', 'throughput'])
+
+
+def gold_standard(api, conceptlists, lang, holdout=True):
+    """
+    :returns: `generator` of pairs (glosses, map) per concept list, where `glosses` is a `list` \
+    of (gloss, CONCEPTICON_ID) pairs - one for each linked concept - and `map` the `list` of \
+    (CONCEPTICON_ID, GLOSS) pairs to match against.
+    """
+    rep = replacements(api)
+    counts = collections.OrderedDict(
+        (clist.id, contributions(clist, [lang])[lang.iso2])
+        for clist in api.conceptlists.values())
+    totals = sum(counts.values(), collections.Counter())
+    for clid in conceptlists:
+        glosses = [
+            (gls, rep[cid]) for (_, gls, cid), n in sorted(counts[clid].items())
+            for _ in range(n)]
+        if holdout:
+            to = [(cid, gloss) for cid, gloss, _ in linking_data(
+                api, lang, totals - counts[clid], rep)]
+        else:
+            to = api._get_map_for_language(lang.iso2)
+        yield glosses, to
+
+
+def evaluate(api, conceptlists, lang, levels, holdout=True):
+    """
+    :returns: `OrderedDict` mapping (matcher, level) pairs to `Result`s.
+    """
+    res = collections.OrderedDict(
+        ((name, level), Result()) for name in MATCHERS for level in levels)
+    for glosses, to in gold_standard(api, conceptlists, lang, holdout=holdout):
+        for (name, level), result in res.items():
+            start = time.perf_counter()
+            cmap = MATCHERS[name](
+                [gls for gls, _ in glosses],
+                [gloss for _, gloss in to],
+                similarity_level=level,
+                language=lang.iso2)
+            result.seconds += time.perf_counter() - start
+            result.glosses += len(glosses)
+            for i, (_, cid) in enumerate(glosses):
+                matches, sim = cmap.get(i, ([], 100))
+                # concept_map2 does not filter by similarity, so we do it here, like `api.map`.
+                if matches and sim <= level:
+                    result.matched += 1
+                    result.correct += to[matches[0]][0] == cid
+    return res
+
+
+def compare(results, baseline, tolerance):
+    """
+    :returns: pair (table rows, names of (matcher, level) pairs which regressed).
+    """
+    rows, regressions = [], []
+    for key, result in results.items():
+        name = '{0}:{1}'.format(*key)
+        base = baseline['results'].get(name)
+        if base:
+            if result.precision < base['precision'] or result.recall < base['recall'] \
+                    or result.throughput < base['throughput'] * (1 - tolerance):
+                regressions.append(name)
+            rows.append([
+                name,
+                base['precision'], result.precision,
+                base['recall'], result.recall,
+                base['throughput'], result.throughput])
+    return rows, regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--scale', choices=list(SCALES), default='tiny')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument(
+        '--repos',
+        type=pathlib.Path,
+        default=None,
+        help='evaluate on an existing repository instead of a synthetic one')
+    parser.add_argument('--language', default='en', help='ISO 639-1 code of the glosses')
+    parser.add_argument(
+        '--conceptlist',
+        action='append',
+        default=[],
+        help='ID of a concept list to evaluate on (default: the first `--limit` lists)')
+    parser.add_argument('--limit', type=int, default=5)
+    parser.add_argument(
+        '--levels', type=int, nargs='+', default=list(range(1, 9)), help='similarity levels')
+    parser.add_argument(
+        '--no-holdout',
+        dest='holdout',
+        action='store_false',
+        default=True,
+        help='match against the map file, including the glosses of the evaluated list')
+    parser.add_argument('--save', type=pathlib.Path, default=None, help='save results as baseline')
+    parser.add_argument(
+        '--compare', type=pathlib.Path, default=None, help='compare results to a baseline')
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.25,
+        help='maximal loss of throughput relative to baseline')
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        api = Concepticon(args.repos or generate(
+            pathlib.Path(tmp) / 'repos', SCALES[args.scale], seed=args.seed))
+        langs = [
+            lang for lang in api.vocabularies['COLUMN_TYPES'].values()
+            if getattr(lang, 'iso2', None) == args.language]
+        if not langs:
+            parser.error('no gloss column for language {0}'.format(args.language))
+        conceptlists = args.conceptlist or list(api.conceptlists)[:args.limit]
+        for clid in conceptlists:
+            if clid not in api.conceptlists:
+                parser.error('unknown concept list {0}'.format(clid))
+        setup = dict(repos=str(args.repos)) if args.repos \
+            else dict(scale=args.scale, seed=args.seed)
+        setup.update(language=args.language, conceptlists=conceptlists, holdout=args.holdout)
+        baseline = None
+        if args.compare:
+            baseline = jsonlib.load(args.compare)
+            if baseline['setup'] != setup:
+                parser.error('baseline was recorded for a different setup: {0}'.format(
+                    baseline['setup']))
+        results = evaluate(api, conceptlists, langs[-1], args.levels, holdout=args.holdout)
+
+    regressions = []
+    if baseline:
+        rows, regressions = compare(results, baseline, args.tolerance)
+        print(tabulate(
+            rows,
+            headers=[
+                'matcher:level',
+                'precision (baseline)', 'precision',
+                'recall (baseline)', 'recall',
+                'glosses/s (baseline)', 'glosses/s'],
+            floatfmt='.3f'))
+        for name in regressions:
+            print('REGRESSION: {0}'.format(name))
+    else:
+        print(tabulate(
+            [[name, level, r.glosses, r.precision, r.recall, r.coverage, r.throughput]
+             for (name, level), r in results.items()],
+            headers=[
+                'matcher', 'level', 'glosses', 'precision', 'recall', 'coverage', 'glosses/s'],
+            floatfmt='.3f'))
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        jsonlib.dump(
+            collections.OrderedDict([
+                ('setup', setup),
+                ('results', collections.OrderedDict(
+                    ('{0}:{1}'.format(*key), r.asdict()) for key, r in results.items())),
+            ]),
+            args.save,
+            indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
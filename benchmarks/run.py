@@ -0,0 +1,146 @@
+"""
+Run pyconcepticon benchmarks on a synthetic repository.
+
+Benchmarks are the functions named `bench_*` in the modules `bench_*.py` of this directory. They
+are called with the path of a repository and return the callable to be timed, so that setup is not
+part of the measurement. Each benchmark is run `--repeat` times - with a fresh setup - and the
+minimal time is reported. Benchmarks with a `unit` attribute other than "seconds" measure something
+else - e.g. memory in bytes - and the callable returns the measured value.
+
+Usage:
+
+    python benchmarks/run.py --scale small --save benchmarks/baselines/small.json
+    python benchmarks/run.py --scale small --compare benchmarks/baselines/small.json
+
+When comparing, the exit status is 1 if any benchmark exceeds the baseline value by more than
+`--tolerance`.
+"""
+import sys
+import time
+import shutil
+import argparse
+import pathlib
+import platform
+import tempfile
+import importlib
+import collections
+
+import attr
+from clldutils import jsonlib
+from tabulate import tabulate
+
+from pyconcepticon.synthetic import SCALES, generate
+
+HERE = pathlib.Path(__file__).parent
+
+
+def iter_benchmarks(pattern=None):
+    for p in sorted(HERE.glob('bench_*.py')):
+        mod = importlib.import_module(p.stem)
+        for name, func in vars(mod).items():
+            if name.startswith('bench_') and callable(func):
+                name = '{0}.{1}'.format(p.stem[len('bench_'):], name[len('bench_'):])
+                if not pattern or pattern in name:
+                    yield name, func
+
+
+def unit(func):
+    return getattr(func, 'unit', 'seconds')
+
+
+def measure(func, repos, repeat):
+    values = []
+    for _ in range(repeat):
+        run = func(repos)
+        if unit(func) != 'seconds':
+            values.append(run())
+            continue
+        start = time.perf_counter()
+        run()
+        values.append(time.perf_counter() - start)
+    return min(values)
+
+
+def compare(results, baseline, tolerance):
+    """
+    :returns: pair (table rows, names of benchmarks which regressed).
+    """
+    rows, regressions = [], []
+    for name, (value, unit_) in results.items():
+        base = baseline['results'].get(name)
+        ratio = value / base if base else None
+        if ratio and ratio > 1 + tolerance:
+            regressions.append(name)
+        rows.append([name, unit_, base, value, ratio])
+    return rows, regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--scale', choices=list(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument(
+        '--repos',
+        type=pathlib.Path,
+        default=None,
+        help='run the benchmarks on a copy of an existing repository instead of a synthetic one')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('-k', dest='pattern', default=None, help='only run matching benchmarks')
+    parser.add_argument('--save', type=pathlib.Path, default=None, help='save results as baseline')
+    parser.add_argument(
+        '--compare', type=pathlib.Path, default=None, help='compare results to a baseline')
+    parser.add_argument(
+        '--tolerance', type=float, default=0.25, help='maximal slowdown relative to baseline')
+    args = parser.parse_args(args)
+
+    setup = dict(scale=args.scale, seed=args.seed, **attr.asdict(SCALES[args.scale])) \
+        if args.repos is None else dict(repos=str(args.repos))
+    baseline = None
+    if args.compare:
+        baseline = jsonlib.load(args.compare)
+        if baseline['setup'] != setup:
+            parser.error('baseline was recorded for a different repository: {0}'.format(
+                baseline['setup']))
+
+    results = collections.OrderedDict()
+    with tempfile.TemporaryDirectory() as tmp:
+        repos = pathlib.Path(tmp) / 'repos'
+        if args.repos:
+            # Benchmarks may write to the repository, so we run them on a copy.
+            shutil.copytree(str(args.repos), str(repos), ignore=shutil.ignore_patterns('.git'))
+        else:
+            generate(repos, SCALES[args.scale], seed=args.seed)
+        for name, func in iter_benchmarks(args.pattern):
+            results[name] = (measure(func, repos, args.repeat), unit(func))
+            print('{0}: {1:.3f} {2}'.format(name, *results[name]), file=sys.stderr)
+
+    regressions = []
+    if baseline:
+        rows, regressions = compare(results, baseline, args.tolerance)
+        print(tabulate(
+            rows, headers=['benchmark', 'unit', 'baseline', 'value', 'ratio'], floatfmt='.3f'))
+        for name in regressions:
+            print('REGRESSION: {0}'.format(name))
+    else:
+        print(tabulate(
+            [(name,) + v for name, v in results.items()],
+            headers=['benchmark', 'value', 'unit'],
+            floatfmt='.3f'))
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        jsonlib.dump(
+            collections.OrderedDict([
+                ('setup', setup),
+                ('python', platform.python_version()),
+                ('machine', platform.machine()),
+                ('results', collections.OrderedDict((k, v) for k, (v, _) in results.items())),
+                ('units', collections.OrderedDict((k, u) for k, (_, u) in results.items())),
+            ]),
+            args.save,
+            indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
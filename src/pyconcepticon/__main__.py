@@ -12,6 +12,7 @@ The basic invocation looks like
 
 """
 import sys
+import cProfile
 import pathlib
 import contextlib
 
@@ -40,6 +41,17 @@ def main(args=None, catch_all=False, parsed_args=None, log=None):
         '--repos-version',
         help="version of repository data. Requires a git clone!",
         default=None)
+    parser.add_argument(
+        '--profile',
+        help="record cProfile data of the command run to this file, to be inspected e.g. with "
+             "`python -m pstats PATH`",
+        default=None,
+        type=pathlib.Path)
+    parser.add_argument(
+        '--timings',
+        help="print a summary table of the time spent loading data at exit",
+        action='store_true',
+        default=False)
     register_subcommands(subparsers, pyconcepticon.commands)
 
     args = parsed_args or parser.parse_args(args=args)
@@ -57,10 +69,20 @@ def main(args=None, catch_all=False, parsed_args=None, log=None):
             # If a specific version of the data is to be used, we make
             # use of a Catalog as context manager:
             stack.enter_context(cldfcatalog.Catalog(args.repos, tag=args.repos_version))
+        if args.profile:
+            profiler = cProfile.Profile()
+            # Callbacks are called in reverse order, i.e. profiling is stopped first:
+            stack.callback(args.log.info, 'profile written to {0}'.format(args.profile))
+            stack.callback(profiler.dump_stats, str(args.profile))
+            stack.callback(profiler.disable)
+            profiler.enable()
         args.repos = Concepticon(args.repos)
+        if args.timings:
+            stack.callback(lambda: print(args.repos.timings.table(), file=sys.stderr))
         args.log.info('concepticon/concepticon-data at {0}'.format(args.repos.repos))
         try:
-            return args.main(args) or 0
+            with args.repos.timings.timer('command', args._command):
+                return args.main(args) or 0
         except KeyboardInterrupt:  # pragma: no cover
             return 0
         except ParserError as e:
@@ -0,0 +1,137 @@
+"""
+Asynchronous access to Concepticon data, for use in `asyncio` applications.
+
+.. code-block:: python
+
+    from pyconcepticon.aio import AsyncConcepticon
+
+    api = AsyncConcepticon('path/to/concepticon-data')
+
+    async def handle(request):
+        matches = await api.lookup([request.query['gloss']])
+"""
+import typing
+import asyncio
+import pathlib
+import functools
+import concurrent.futures
+
+from pyconcepticon.api import Concepticon, read_mapping
+
+__all__ = ['AsyncConcepticon']
+
+
+class AsyncConcepticon(object):
+    """
+    Facade for a `Concepticon` instance, exposing data loaders, `lookup` and `map` as coroutines.
+
+    Parsing of data files and gloss matching are offloaded to an executor, thus never block the
+    event loop. Concurrent requests for the same data (e.g. the mapping table for a language)
+    share one in-flight load.
+
+    :param repos: `Concepticon` instance or path to a clone of concepticon-data.
+    :param executor: `concurrent.futures.Executor` to run parsing in. If this is a \
+    `ProcessPoolExecutor`, only the parsing of mapping tables is run in it, since all other \
+    work must operate on the shared `Concepticon` instance and is run in the loop's default \
+    thread pool.
+    """
+    def __init__(
+            self,
+            repos: typing.Optional[typing.Union[Concepticon, str, pathlib.Path]] = None,
+            executor: typing.Optional[concurrent.futures.Executor] = None):
+        self.api = repos if isinstance(repos, Concepticon) else Concepticon(repos)
+        self.executor = executor
+        self._inflight = {}
+
+    @property
+    def _thread_executor(self):
+        if isinstance(self.executor, concurrent.futures.ThreadPoolExecutor):
+            return self.executor
+
+    def _run(self, executor, func, *args, **kw):
+        return asyncio.get_running_loop().run_in_executor(
+            executor, functools.partial(func, *args, **kw))
+
+    async def _shared(self, key, factory):
+        """
+        Await the result of `factory()`, sharing one in-flight future per `key`.
+        """
+        loop = asyncio.get_running_loop()
+        fut = self._inflight.get(key)
+        if fut is None or fut.get_loop() is not loop:
+            fut = self._inflight[key] = asyncio.ensure_future(factory())
+            fut.add_done_callback(
+                lambda f: self._inflight.pop(key) if self._inflight.get(key) is f else None)
+        # Shield the shared future, so that cancelling one request does not cancel the others.
+        return await asyncio.shield(fut)
+
+    async def load(self, name: str):
+        """
+        Load the data of a (cached) property of the `Concepticon` API, e.g. "conceptsets".
+        """
+        if name in self.api.__dict__:
+            return self.api.__dict__[name]
+        return await self._shared(
+            ('property', name),
+            lambda: self._run(self._thread_executor, getattr, self.api, name))
+
+    async def conceptsets(self):
+        return await self.load('conceptsets')
+
+    async def conceptlists(self):
+        return await self.load('conceptlists')
+
+    async def relations(self):
+        return await self.load('relations')
+
+    async def multirelations(self):
+        return await self.load('multirelations')
+
+    async def vocabularies(self):
+        return await self.load('vocabularies')
+
+    async def bibliography(self):
+        return await self.load('bibliography')
+
+    async def load_map(self, language: str = 'en', otherlist=None) -> typing.List[tuple]:
+        """
+        Load the mapping table for `language` (or from `otherlist`).
+
+        :returns: `list` of (CONCEPTICON_ID, GLOSS) pairs as used by `Concepticon.lookup`.
+        """
+        key = (language, otherlist)
+        if key not in self.api._to_mapping:
+            self.api.counters.update(mapping_cache_misses_total=1)
+            to = await self._shared(
+                ('map', key),
+                lambda: self._run(
+                    self.executor, read_mapping, self.api.repos, language, otherlist))
+            self.api._to_mapping.setdefault(key, to)
+        else:
+            self.api.counters.update(mapping_cache_hits_total=1)
+        return self.api._to_mapping[key]
+
+    async def lookup(self, entries, language='en', **kw) -> typing.List[set]:
+        """
+        Coroutine version of `Concepticon.lookup`.
+
+        :returns: `list` of `set`s of (searchterm, concepticon_id, concepticon_gloss, similarity).
+        """
+        if kw.get('to') is None:
+            await self.load_map(language)
+        return await self._run(
+            self._thread_executor,
+            lambda: list(self.api.lookup(entries, language=language, **kw)))
+
+    async def map(self, clist, otherlist=None, language='en', **kw):
+        """
+        Coroutine version of `Concepticon.map`.
+        """
+        await self.load_map(language, otherlist)
+        return await self._run(
+            self._thread_executor,
+            self.api.map,
+            clist,
+            otherlist=otherlist,
+            language=language,
+            **kw)
@@ -1,4 +1,6 @@
 import re
+import time
+import contextlib
 import typing
 import pathlib
 import warnings
@@ -16,12 +18,31 @@ from pyconcepticon.glosses import concept_map, concept_map2
 # The following symbols from models can explicitly be imported from pyconcepticon.api:
 from pyconcepticon.models import (  # noqa: F401
     Languoid, Metadata, Concept, Conceptlist, ConceptRelations, Conceptset, REF_PATTERN, MD_SUFFIX,
+    RelationStore,
+)
+from pyconcepticon.networks import ConceptNetworks
+from pyconcepticon.stats import CatalogStats
+from pyconcepticon.util import (
+    read_dicts, lowercase, to_dict, UnicodeWriter, BIB_PATTERN, CheckReport, DisjointSet,
+    dump_atomic, WriteTransaction, PhaseTimings, timed_property, Counters,
 )
-from pyconcepticon.util import read_dicts, lowercase, to_dict, UnicodeWriter, BIB_PATTERN
 
 Editor = collections.namedtuple('Editor', ['name', 'start', 'end'])
 
 
+def read_mapping(repos, language, otherlist=None):
+    """
+    Read the (ID, GLOSS) pairs to map against for a language, or from another concept list.
+
+    .. note:: This is a module-level function, to allow running it in a process pool.
+    """
+    if otherlist is not None:
+        return [(item['ID'], item.get('GLOSS', item.get('ENGLISH')))
+                for item in read_dicts(otherlist)]
+    mapfile = pathlib.Path(repos) / 'mappings' / 'map-{0}.tsv'.format(language)
+    return [(cs['ID'], cs['GLOSS']) for cs in read_dicts(mapfile)]
+
+
 class Concepticon(API):
     """
     API to access the concepticon data.
@@ -46,6 +67,34 @@ class Concepticon(API):
         repos = repos or cldfcatalog.Config.from_file().get_clone('concepticon')
         API.__init__(self, repos)
         self._to_mapping = {}
+        self._retirement_batches = 0
+        self._transaction = None
+        #: Time spent loading data, e.g. to compute cached properties.
+        self.timings = PhaseTimings()
+        #: Counts of operations, see `Concepticon.metrics`.
+        self.counters = Counters()
+
+    def metrics(self) -> dict:
+        """
+        A snapshot of runtime metrics, e.g. to monitor services using the API.
+
+        - "counters": `dict` of counts - of concept lists loaded, concepts materialized, data files
+          and bytes read, lookup and map calls, hits and misses of the mapping cache and gloss
+          comparisons performed by the matchers.
+        - "timers": `dict` mapping phases to `dict`s mapping items to total seconds and calls,
+          see `Concepticon.timings`.
+
+        .. seealso:: `pyconcepticon.util.prometheus_text` to export metrics.
+        """
+        timers = collections.OrderedDict()
+        for (phase, item), (seconds, calls) in self.timings.snapshot().items():
+            timers.setdefault(phase, collections.OrderedDict())[item] = dict(
+                seconds=seconds, calls=calls)
+        return dict(counters=self.counters.snapshot(), timers=timers)
+
+    def _record_read(self, path: pathlib.Path) -> pathlib.Path:
+        self.counters.update(files_read_total=1, bytes_read_total=path.stat().st_size)
+        return path
 
     def data_path(self, *comps: str) -> pathlib.Path:
         """
@@ -53,7 +102,23 @@ class Concepticon(API):
         """
         return self.path('concepticondata', *comps)
 
-    @functools.cached_property
+    def cache_path(self, *comps: str) -> pathlib.Path:
+        """
+        Create a path within the `.cache` directory of the source repos, used to persist data \
+        derived from the catalog between runs of commands.
+
+        Like `.pytest_cache`, the directory contains a `.gitignore` file ignoring all its content, \
+        so cached data does not show up as untracked files in the git repository.
+        """
+        res = self.path('.cache')
+        res.mkdir(parents=True, exist_ok=True)
+        gitignore = res / '.gitignore'
+        if not gitignore.exists():
+            gitignore.write_text(
+                '# Created by pyconcepticon, see Concepticon.cache_path.\n*\n', encoding='utf8')
+        return res.joinpath(*comps)
+
+    @timed_property
     def editors(self) -> typing.List[Editor]:
         res = []
         header, rows = next(
@@ -64,12 +129,12 @@ class Concepticon(API):
             res.append(Editor(name.strip(), start, start if not to_ else end or None))
         return res
 
-    @functools.cached_property
+    @timed_property
     def vocabularies(self) -> typing.Dict[str, dict]:
         """
         Provide access to a `dict` of controlled vocabularies.
         """
-        res = jsonlib.load(self.data_path('concepticon.json'))
+        res = jsonlib.load(self._record_read(self.data_path('concepticon.json')))
         for k in res['COLUMN_TYPES']:
             v = res['COLUMN_TYPES'][k]
             if isinstance(v, list) and v and v[0] == 'languoid':
@@ -80,14 +145,15 @@ class Concepticon(API):
     def bibfile(self) -> pathlib.Path:
         return self.data_path('references', 'references.bib')
 
-    @functools.cached_property
+    @timed_property
     def sources(self) -> dict:
-        return jsonlib.load(self.data_path('sources', 'cdstar.json'))
+        return jsonlib.load(self._record_read(self.data_path('sources', 'cdstar.json')))
 
-    @functools.cached_property
+    @timed_property
     def retirements(self):
         return jsonlib.load(
-            self.data_path('retired.json'), object_pairs_hook=collections.OrderedDict)
+            self._record_read(self.data_path('retired.json')),
+            object_pairs_hook=collections.OrderedDict)
 
     def add_retirement(self, type_, repl):
         obj = collections.OrderedDict()
@@ -97,31 +163,108 @@ class Concepticon(API):
         if type_ not in self.retirements:
             self.retirements[type_] = []
         self.retirements[type_].append(obj)
-        jsonlib.dump(self.retirements, self.data_path('retired.json'), indent=2)
+        if not self._retirement_batches:
+            self._write_retirements()
+
+    def _write_retirements(self):
+        if self._transaction:
+            jsonlib.dump(
+                self.retirements, self._transaction.path(self.data_path('retired.json')), indent=2)
+        else:
+            dump_atomic(self.retirements, self.data_path('retired.json'), indent=2)
+
+    @contextlib.contextmanager
+    def retirement_batch(self):
+        """
+        Context manager to add many retirements, writing retired.json only once - atomically -
+        when the block is left. If the block is left with an exception - of any kind - retirements
+        added since entering the outermost batch are discarded.
+
+        .. code-block:: python
+
+            >>> with api.retirement_batch():
+            ...     for oid, nid in renamed:
+            ...         api.add_retirement('Concept', dict(id=oid, comment='', replacement=nid))
+        """
+        self._retirement_batches += 1
+        ok = False
+        try:
+            yield self
+            ok = True
+        finally:
+            # Note: The counter must be restored for any exception - including
+            # `KeyboardInterrupt` - otherwise `add_retirement` would never write again.
+            self._retirement_batches -= 1
+            if not self._retirement_batches:
+                if ok:
+                    self._write_retirements()
+                else:
+                    self.__dict__.pop('retirements', None)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Context manager to edit multiple files of the repository consistently.
+
+        Writes to paths obtained from the yielded `WriteTransaction` - as well as retirements -
+        are committed together when the block is left, or discarded if an exception is raised.
+        On commit, all cached data is invalidated.
+
+        .. code-block:: python
+
+            >>> with api.transaction() as txn:
+            ...     with UnicodeWriter(txn.path(api.data_path('conceptlists.tsv'))) as w:
+            ...         w.writerows(rows)
+            ...     txn.remove(api.data_path('conceptlists', 'Old-2000-1.tsv'))
+        """
+        if self._transaction:  # Nested transactions are part of the outer one.
+            yield self._transaction
+            return
+        self._transaction = WriteTransaction(on_commit=self.invalidate)
+        try:
+            with self._transaction:
+                with self.retirement_batch():
+                    yield self._transaction
+        finally:
+            self._transaction = None
+
+    def invalidate(self):
+        """
+        Invalidate all cached data, e.g. after the repository has been edited.
+
+        .. note:: `dataset_metadata`, inherited from `clldutils.apilib.API`, is not invalidated, \
+           since metadata.json is not edited by pyconcepticon.
+        """
+        for cls in type(self).__mro__:
+            for name, attr in vars(cls).items():
+                if isinstance(attr, functools.cached_property):
+                    self.__dict__.pop(name, None)
+        self._to_mapping = {}
 
-    @functools.cached_property
+    @timed_property
     def bibliography(self) -> typing.Dict[str, Source]:
         """
         :returns: `dict` mapping BibTeX IDs to `Reference` instances.
         """
         return to_dict(
             Source.from_entry(key, entry) for key, entry in pybtex.database.parse_string(
-                self.bibfile.read_text(encoding='utf8'), bib_format='bibtex').entries.items())
+                self._record_read(self.bibfile).read_text(encoding='utf8'),
+                bib_format='bibtex').entries.items())
 
-    @functools.cached_property
+    @timed_property
     def conceptsets(self) -> typing.Dict[str, Conceptset]:
         """
         :returns: `dict` mapping ConceptSet IDs to `Conceptset` instances.
         """
         return to_dict(
             Conceptset(api=self, **lowercase(d))
-            for d in read_dicts(self.data_path('concepticon.tsv')))
+            for d in read_dicts(self._record_read(self.data_path('concepticon.tsv'))))
 
-    @functools.cached_property
+    @timed_property
     def conceptlists_dicts(self):
-        return read_dicts(self.data_path('conceptlists.tsv'))
+        return read_dicts(self._record_read(self.data_path('conceptlists.tsv')))
 
-    @functools.cached_property
+    @timed_property
     def conceptlists(self):
         """
         :returns: `dict` mapping ConceptList IDs to `Conceptlist` instances.
@@ -130,39 +273,76 @@ class Concepticon(API):
         """
         return to_dict(Conceptlist(api=self, **lowercase(d)) for d in self.conceptlists_dicts)
 
-    @functools.cached_property
+    @timed_property
+    def relation_store(self) -> RelationStore:
+        """
+        The data of conceptrelations.tsv, shared by `relations` and `multirelations`.
+        """
+        return RelationStore(self._record_read(self.data_path('conceptrelations.tsv')))
+
+    @timed_property
     def relations(self):
         """
         :returns: `dict` mapping concept sets to related concepts.
         """
-        return ConceptRelations(self.data_path('conceptrelations.tsv'))
+        return ConceptRelations(self.relation_store)
 
-    @functools.cached_property
+    @timed_property
     def multirelations(self):
         """
         :returns: `dict` mapping concept sets to related concepts.
         """
-        return ConceptRelations(self.data_path('conceptrelations.tsv'), multiple=True)
+        return ConceptRelations(self.relation_store, multiple=True)
+
+    @timed_property
+    def _sameas(self) -> dict:
+        """
+        `dict` mapping IDs of concept sets in a `sameas` group to the lowest ID in the group.
+        """
+        ds = DisjointSet(
+            (r['SOURCE'], r['TARGET']) for r in self.relation_store.raw
+            if r['RELATION'] == 'sameas')
+        return {
+            csid: min(group, key=int) for group in ds.groups() for csid in group}
+
+    def canonical_conceptset(self, id_: str) -> Conceptset:
+        """
+        Concept sets related by `sameas` are grouped, with the one with the lowest ID being the
+        canonical one, i.e. the one to link to.
 
-    @functools.cached_property
+        :param id_: ID of a concept set.
+        :returns: The canonical `Conceptset` for `id_`.
+        """
+        return self.conceptsets[self._sameas.get(id_, id_)]
+
+    @timed_property
+    def networks(self) -> ConceptNetworks:
+        """
+        :returns: `Mapping` of IDs of concept lists with network columns to `EdgeTable` objects.
+        """
+        return ConceptNetworks(self)
+
+    @timed_property
+    def stats(self) -> CatalogStats:
+        """
+        :returns: Statistics aggregated over all concept lists.
+        """
+        return CatalogStats.from_api(self)
+
+    @timed_property
     def frequencies(self):
-        D = collections.defaultdict(int)
-        for cl in self.conceptlists.values():
-            for concept in cl.concepts.values():
-                if concept.concepticon_id:
-                    D[concept.concepticon_gloss] += 1
-        return D
+        return self.stats.frequencies
 
     def _get_map_for_language(self, language, otherlist=None):
         if (language, otherlist) not in self._to_mapping:
-            if otherlist is not None:
-                to = []
-                for item in read_dicts(otherlist):
-                    to.append((item['ID'], item.get('GLOSS', item.get('ENGLISH'))))
-            else:
-                mapfile = self.repos / 'mappings' / 'map-{0}.tsv'.format(language)
-                to = [(cs['ID'], cs['GLOSS']) for cs in read_dicts(mapfile)]
-            self._to_mapping[(language, otherlist)] = to
+            self.counters.update(mapping_cache_misses_total=1)
+            self._record_read(pathlib.Path(otherlist) if otherlist is not None else
+                              self.path('mappings', 'map-{0}.tsv'.format(language)))
+            with self.timings.timer('Concepticon.mapping', otherlist or language):
+                self._to_mapping[(language, otherlist)] = read_mapping(
+                    self.repos, language, otherlist)
+        else:
+            self.counters.update(mapping_cache_hits_total=1)
         return self._to_mapping[(language, otherlist)]
 
     def map(self,
@@ -174,7 +354,8 @@ class Concepticon(API):
             language='en',
             skip_multiple=False):
         assert clist.exists(), "File %s does not exist" % clist
-        from_ = read_dicts(clist)
+        self.counters.update(map_calls_total=1)
+        from_ = read_dicts(self._record_read(clist))
 
         to = self._get_map_for_language(language, otherlist)
         gloss = {
@@ -189,12 +370,15 @@ class Concepticon(API):
             'ru': 'RUSSIAN',
             'it': 'ITALIAN',
         }.get(language, 'GLOSS')
-        cmap = (concept_map if full_search else concept_map2)(
-            [i.get('GLOSS', i.get(gloss)) for i in from_],
-            [i[1] for i in to],
-            similarity_level=similarity_level,
-            language=language
-        )
+        cfunc = concept_map if full_search else concept_map2
+        with self.timings.timer('glosses.' + cfunc.__name__, language):
+            cmap = cfunc(
+                [i.get('GLOSS', i.get(gloss)) for i in from_],
+                [i[1] for i in to],
+                similarity_level=similarity_level,
+                language=language,
+                counters=self.counters,
+            )
         good_matches = 0
         with UnicodeWriter(out) as writer:
             writer.writerow(
@@ -245,27 +429,56 @@ class Concepticon(API):
             to=None,
     ):
         """
+        :param entries: Iterable of glosses to look up.
         :returns: `generator` of tuples (searchterm, concepticon_id, concepticon_gloss, similarity).
         """
+        # Note: Calls are counted right away - not only once the generator is consumed.
+        entries = list(entries)
+        self.counters.update(lookup_calls_total=1, lookup_entries_total=len(entries))
+        return self._lookup(entries, full_search, similarity_level, language, mincsid, to)
+
+    def _lookup(self, entries, full_search, similarity_level, language, mincsid, to):
         if to is None:
             to = [
                 t for t in self._get_map_for_language(language, None)
                 if mincsid is None or (int(t[0]) >= mincsid)]
         tox = [i[1] for i in to]
         cfunc = concept_map2 if full_search else concept_map
-        cmap = cfunc(
-            entries,
-            tox,
-            similarity_level=similarity_level,
-            language=language)
+        with self.timings.timer('glosses.' + cfunc.__name__, language):
+            cmap = cfunc(
+                entries,
+                tox,
+                similarity_level=similarity_level,
+                language=language,
+                counters=self.counters)
         for i, e in enumerate(entries):
             match, simil = cmap.get(i, [[], 100])
             yield set((e, to[m][0], to[m][1].split("///")[0], simil) for m in match)
 
-    def check(self, *clids):
+    def check(self, *clids, report: typing.Optional[CheckReport] = None) -> bool:
+        """
+        Check the integrity of the data.
+
+        :param clids: IDs of concept lists to check. If none are given, all are checked.
+        :param report: `CheckReport` to collect problems and timings in. If none is passed, \
+        problems are printed.
+        """
         errors = []
         assert self.retirements
-        print('testing {0} concept lists'.format(len(clids) if clids else len(self.conceptlists)))
+        if report is None:
+            print('testing {0} concept lists'.format(
+                len(clids) if clids else len(self.conceptlists)))
+        # We time the checks in stages, and record the stage in which a problem was found:
+        stage = dict(check='conceptlists', file='', start=time.perf_counter(), rows=None)
+
+        def next_stage(check, file=''):
+            if report is not None:
+                report.add_timing(
+                    stage['check'],
+                    stage['file'],
+                    time.perf_counter() - stage['start'],
+                    stage['rows'])
+            stage.update(check=check, file=file, start=time.perf_counter(), rows=None)
 
         def _msg(type_, msg, name, line):  # pragma: no cover
             if line:
@@ -273,10 +486,12 @@ class Concepticon(API):
             return '%s:%s%s: %s' % (type_.upper(), name, line or '', msg)
 
         def error(msg, name, line=0):  # pragma: no cover
-            errors.append((msg, name, line))
+            errors.append((msg, name, line, stage['check']))
 
         def warning(msg, name, line=0):  # pragma: no cover
             warnings.warn(_msg('warning', msg, name, line), Warning)
+            if report is not None:
+                report.add_problem(stage['check'], name, msg, line, level='warning')
 
         for i, d in enumerate(self.conceptlists_dicts, start=1):
             if (not clids) or d['ID'] in clids:
@@ -286,8 +501,12 @@ class Concepticon(API):
                     error(str(e), 'conceptlists.tsv', i)
 
         def exit():
-            for msg, name, line in errors:
-                print(_msg('error', msg, name, line))
+            next_stage(None)
+            for msg, name, line, check in errors:
+                if report is None:
+                    print(_msg('error', msg, name, line))
+                else:
+                    report.add_problem(check, name, msg, line)
             return not bool(errors)
 
         if errors:  # pragma: no cover
@@ -297,6 +516,7 @@ class Concepticon(API):
         REF_WITHOUT_LINK_PATTERN = re.compile('[^(]:(ref|bib):[A-Za-z0-9-]+')
 
         # Make sure all language-specific mappings are well specified
+        next_stage('vocabularies')
         iso_langs = [
             lang.iso2 for lang in self.vocabularies['COLUMN_TYPES'].values()
             if isinstance(lang, Languoid) and lang.iso2]
@@ -308,6 +528,7 @@ class Concepticon(API):
             .issubset(iso_langs)
 
         # We collect all cite keys used to refer to references.
+        next_stage('references')
         all_refs = set()
         refs_in_bib = set(ref for ref in self.bibliography)
 
@@ -350,6 +571,7 @@ class Concepticon(API):
             'concepticon_gloss': set(cs.gloss for cs in self.conceptsets.values()),
         }
 
+        next_stage('conceptrelations')
         for i, rel in enumerate(self.relations.raw):
             for attr, type_ in [
                 ('SOURCE', 'concepticon_id'),
@@ -361,6 +583,7 @@ class Concepticon(API):
                     error(
                         'invalid {0}: {1}'.format(attr, rel[attr]), 'conceptrelations', i + 2)
 
+        next_stage('conceptlist_files')
         for fname in self.data_path('conceptlists').glob('*.tsv'):
             if clids and fname.stem not in clids:
                 continue  # pragma: no cover
@@ -368,11 +591,11 @@ class Concepticon(API):
                 error(
                     'conceptlist missing in conceptlists.tsv: {0}'.format(fname.name), '')
 
-        broken_cls = []
-
         for cl in self.conceptlists.values():
             if clids and cl.id not in clids:
                 continue  # pragma: no cover
+            next_stage('concepts', cl.id)
+            stage['rows'] = len(cl.concepts)
             #
             # Check consistency between the csvw metadata and the column names in the list.
             #
@@ -411,8 +634,12 @@ class Concepticon(API):
 
                     if concept.concepticon_id:
                         cs = self.conceptsets.get(concept.concepticon_id)
-                        if not cs:  # pragma: no cover
+                        if not cs:
                             error('invalid conceptset ID %s' % concept.concepticon_id, cl.id)
+                        elif self._sameas.get(concept.concepticon_id, concept.concepticon_id) \
+                                != concept.concepticon_id:  # pragma: no cover
+                            error('deprecated concept set {0} linked for {1}'.format(
+                                concept.concepticon_id, concept.id), cl.id)
                         elif cs.gloss != concept.concepticon_gloss:  # pragma: no cover
                             error(
                                 'wrong conceptset GLOSS for ID {0}: {1} -> {2}'.format(
@@ -442,38 +669,14 @@ class Concepticon(API):
                             if val not in values:  # pragma: no cover
                                 error('invalid value for %s: %s' % (attr, val), cl.id, i + 2)
             except TypeError as e:  # pragma: no cover
-                broken_cls.append(cl.id)
                 error(str(e), cl.id)
                 raise
 
-        sameas = {}
+        next_stage('conceptsets')
         glosses = set()
         for cs in self.conceptsets.values():
             if cs.gloss in glosses:  # pragma: no cover
                 error('duplicate conceptset gloss: {0}'.format(cs.gloss), cs.id)
             glosses.add(cs.gloss)
-            for target, rel in cs.relations.items():
-                if rel == 'sameas':
-                    for group in sameas.values():
-                        if target in group:  # pragma: no cover
-                            group.add(cs.id)
-                            break
-                    else:
-                        sameas[cs.gloss] = {cs.id, target}
-
-        deprecated = {}
-        for s in sameas.values():
-            csids = sorted(s, key=lambda j: int(j))
-            for csid in csids[1:]:
-                assert csid not in deprecated
-                deprecated[csid] = csids[0]
-
-        for cl in self.conceptlists.values():
-            if cl.id in broken_cls:
-                continue  # pragma: no cover
-            for concept in cl.concepts.values():
-                if concept.concepticon_id in deprecated:  # pragma: no cover
-                    error('deprecated concept set {0} linked for {1}'.format(
-                        concept.concepticon_id, concept.id), cl.id)
 
         return exit()
@@ -1,8 +1,11 @@
+import glob
 import pathlib
 
+import tabulate
 from clldutils.clilib import ParserError
 
 from pyconcepticon.models import Conceptlist
+from pyconcepticon.util import parallel_map  # noqa: F401
 
 
 def readme(outdir, text):
@@ -23,6 +26,26 @@ def add_search(parser):
         type=str)
 
 
+#: Formats for structured (machine-readable) reports, see `pyconcepticon.util.CheckReport`.
+REPORT_FORMATS = ['json', 'sarif']
+
+
+def add_report_format(parser, default='simple'):
+    """
+    Add a `format` option, accepting tabular formats as well as structured report formats.
+    """
+    parser.add_argument(
+        "--format",
+        default=default,
+        choices=tabulate.tabulate_formats + REPORT_FORMATS,
+        help="Format of tabular output or of a structured report ({0}).".format(
+            ', '.join(REPORT_FORMATS)))
+
+
+def add_jobs(parser, default=1, help='number of parallel processes'):
+    parser.add_argument('--jobs', type=int, default=default, help=help)
+
+
 def add_conceptlist(parser, multiple=False):
     kw = dict(
         metavar='CONCEPTLIST',
@@ -35,10 +58,28 @@ def add_conceptlist(parser, multiple=False):
 
 def get_conceptlist(args, path_only=False):
     if isinstance(args.conceptlist, list):
-        return [_get_conceptlist(cl, args, path_only=path_only) for cl in args.conceptlist]
+        return [
+            _get_conceptlist(c, args, path_only=path_only)
+            for cl in args.conceptlist for c in _expand(cl, args)]
     return _get_conceptlist(args.conceptlist, args, path_only=path_only)
 
 
+def _expand(cl, args):
+    """
+    Expand glob patterns, matching paths or IDs of concept lists in the repository.
+    """
+    if pathlib.Path(cl).exists() or not any(c in str(cl) for c in '*?['):
+        return [cl]
+    res = sorted(glob.glob(str(cl)))
+    if not res and pathlib.Path(cl).parent.name == '':
+        res = sorted(
+            p.stem for p in args.repos.data_path('conceptlists').glob(pathlib.Path(cl).name)
+            if p.suffix == '.tsv')
+    if not res:
+        raise ParserError("no conceptlist matching %s found" % cl)
+    return res
+
+
 def _get_conceptlist(cl, args, path_only=False):
     cl = pathlib.Path(cl)
     if cl.exists() and cl.is_file():
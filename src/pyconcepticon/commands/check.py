@@ -8,42 +8,94 @@ Expects well-formed concept lists as input, i.e. TSV files, with columns
 - CONCEPTICON_ID
 - NUMBER
 - CONCEPTICON_GLOSS
+
+All checks are run in one pass over the rows of a concept list; multiple concept lists can be
+checked in parallel.
+
+With "--format json" or "--format sarif" a machine-readable report is printed, and the exit status
+is 1 if problems were found - e.g. to gate merges in CI.
 """
+import time
+import itertools
 import collections
 
 import termcolor
-from clldutils.clilib import Table, add_format
+from clldutils.clilib import Table
+from csvw.dsv import reader
 
-from pyconcepticon.cli_util import add_conceptlist, get_conceptlist
-from pyconcepticon.util import read_dicts, CS_ID, CS_GLOSS
+from pyconcepticon.cli_util import (
+    add_conceptlist, get_conceptlist, add_report_format, REPORT_FORMATS, add_jobs, parallel_map,
+)
+from pyconcepticon.util import CS_ID, CS_GLOSS, CheckReport
 from pyconcepticon.models import CONCEPT_NETWORK_COLUMNS
-
-import json
+from pyconcepticon.networks import iter_edges
 
 
 def register(parser):
     add_conceptlist(parser, multiple=True)
-    add_format(parser, default='simple')
+    add_report_format(parser, default='simple')
     parser.add_argument(
         '--verbose',
         action='store_true',
         help='print check descriptions',
         default=False)
+    add_jobs(parser, help='number of concept lists to check in parallel')
 
 
 def run(args):
-    for cl in get_conceptlist(args, path_only=True):
+    context = CheckContext.from_api(args.repos)
+    paths = get_conceptlist(args, path_only=True)
+    results = zip(paths, parallel_map(args.jobs, check_file, paths, itertools.repeat(context)))
+    if args.format in REPORT_FORMATS:
+        report = CheckReport('concepticon check')
+        for cl, checks in results:
+            for check in checks:
+                check.add_to_report(report, cl)
+        print(report.dumps(args.format))
+        return 0 if report else 1
+
+    for cl, checks in results:
         print(termcolor.colored(cl, attrs=['bold', 'underline']))
-        items = list(enumerate(read_dicts(cl), start=2))
-        for check in CHECKS:
-            print(termcolor.colored('Check: {0}'.format(check.__name__), attrs=['bold']))
+        for check in checks:
+            print(termcolor.colored('Check: {0}'.format(check.name), attrs=['bold']))
             if args.verbose and check.__doc__:
                 print(check.__doc__)  # pragma: no cover
+            if check.error:  # pragma: no cover
+                print(termcolor.colored(check.error, color='red'))
+                continue
+            with Result(args, *check.cols) as t:
+                t.extend(check.problems)
+        print()
+
+
+def check_file(path, context):
+    """
+    Run all checks on a concept list, in one pass over its rows.
+
+    :returns: `list` of `Check` instances, holding the problems found.
+    """
+    checks = [cls(context) for cls in CHECKS]
+    rows = 0
+    for line, item in enumerate(reader(path, dicts=True, delimiter='\t'), start=2):
+        rows += 1
+        for check in checks:
+            if not check.error:
+                start = time.perf_counter()
+                try:
+                    check.visit(line, item)
+                except Exception as e:  # pragma: no cover
+                    check.error = '{0}: {1}'.format(e.__class__.__name__, e)
+                check.time += time.perf_counter() - start
+    for check in checks:
+        check.rows = rows
+        if not check.error:
+            start = time.perf_counter()
             try:
-                check(items, args)
+                check.finish()
             except Exception as e:  # pragma: no cover
-                print(termcolor.colored('{0}: {1}'.format(e.__class__.__name__, e), color='red'))
-        print()
+                check.error = '{0}: {1}'.format(e.__class__.__name__, e)
+            check.time += time.perf_counter() - start
+    return checks
 
 
 #
@@ -62,138 +114,221 @@ def id_number_gloss(item):
     return [item.get('ID', ''), item.get('NUMBER', ''), item.get('GLOSS', item.get('ENGLISH', ''))]
 
 
+class CheckContext(
+        collections.namedtuple('CheckContext', ['glosses', 'valid_glosses', 'valid_ids'])):
+    """
+    Lookup data shared by all checks, computed once per run.
+
+    :ivar glosses: `dict` mapping CONCEPTICON_ID to CONCEPTICON_GLOSS.
+    :ivar valid_glosses: `set` of CONCEPTICON_GLOSS.
+    :ivar valid_ids: `set` of IDs of concept sets which have not been superseded.
+    """
+    @classmethod
+    def from_api(cls, api):
+        glosses = {cs.id: cs.gloss for cs in api.conceptsets.values()}
+        return cls(
+            glosses,
+            set(glosses.values()),
+            {cs.id for cs in api.conceptsets.values() if not cs.replacement_id})
+
+
+class Check(object):
+    """
+    A check is visited with each row of a concept list, and may report problems at the end.
+
+    :ivar problems: `list` of rows of the problems table.
+    :ivar error: Message of an exception raised while running the check.
+    :ivar time: Wall-clock time spent in the check, in seconds.
+    :ivar rows: Number of rows the check was run on.
+    """
+    name = None
+    cols = []
+
+    def __init__(self, context):
+        self.context = context
+        self.problems = []
+        self.error = None
+        self.time = 0.0
+        self.rows = 0
+
+    def visit(self, line, item):
+        pass
+
+    def finish(self):
+        pass
+
+    def describe(self, problem):
+        """
+        :returns: A problem message, assembled from the columns describing the problem.
+        """
+        return ', '.join(
+            '{0}: {1}'.format(c, v) for c, v in zip(self.cols, problem)
+            if c not in ['LINE_NO', 'ID', 'NUMBER', 'GLOSS'])
+
+    def add_to_report(self, report, file):
+        report.add_timing(self.name, file, self.time, self.rows)
+        if self.error:  # pragma: no cover
+            report.add_problem(self.name, file, self.error)
+        for problem in self.problems:
+            problem = dict(zip(self.cols, problem), message=self.describe(problem))
+            report.add_problem(
+                self.name, file, problem['message'], problem.get('LINE_NO'), problem.get('ID'))
+
+
 #
 # check implementations
 #
-def matching_concepticon_gloss_and_id(items, args):
+class MatchingConcepticonGlossAndId(Check):
     """
     CONCEPTICON_ID and CONCEPTICON_GLOSS must match the corresponding values of **one**
     Concepticon Conceptset.
     """
-    with Result(
-            args, 'CONCEPTICON_ID', 'CONCEPTICON_GLOSS', 'LINE_NO', 'ID', 'NUMBER', 'GLOSS') as t:
-        for line, item in items:
-            cid = item.get(CS_ID)
-            cgloss = item.get(CS_GLOSS)
-            if cid and cgloss:
-                cs = args.repos.conceptsets[cid]
-                if cs.gloss != cgloss:
-                    t.append([cid, cgloss, line] + id_number_gloss(item))  # pragma: no cover
-
-
-def valid_concepticon_gloss(items, args):
+    name = 'matching_concepticon_gloss_and_id'
+    cols = ['CONCEPTICON_ID', 'CONCEPTICON_GLOSS', 'LINE_NO', 'ID', 'NUMBER', 'GLOSS']
+
+    def visit(self, line, item):
+        cid = item.get(CS_ID)
+        cgloss = item.get(CS_GLOSS)
+        if cid and cgloss and cid in self.context.glosses:
+            if self.context.glosses[cid] != cgloss:
+                self.problems.append([cid, cgloss, line] + id_number_gloss(item))
+
+
+class ValidConcepticonGloss(Check):
     """
     CONCEPTICON_GLOSS - if given - must match corresponding value of a Concepticon Conceptset.
     """
-    valid = set(cs.gloss for cs in args.repos.conceptsets.values())
-    with Result(
-            args, 'CONCEPTICON_GLOSS', 'LINE_NO', 'ID', 'NUMBER', 'GLOSS') as t:
-        for line, item in items:
-            cgloss = item.get(CS_GLOSS)
-            if cgloss and cgloss not in valid:
-                t.append([cgloss, line] + id_number_gloss(item))  # pragma: no cover
-
-
-def valid_concepticon_id(items, args):
-    valid = set(cs.id for cs in args.repos.conceptsets.values() if not cs.replacement_id)
-    with Result(
-            args, 'CONCEPTICON_ID', 'LINE_NO', 'ID', 'NUMBER', 'GLOSS') as t:
-        for line, item in items:
-            cid = item.get(CS_ID)
-            if cid and cid not in valid:
-                t.append([cid, line] + id_number_gloss(item))  # pragma: no cover
-
-
-def _unique(items, args, *cols):
-    col = None
-    clashes = collections.defaultdict(list)
-    for line, item in items:
-        col = [c for c in cols if c in item]
-        if not col:  # pragma: no cover
-            print(termcolor.colored('no column {0}'.format(' or '.join(cols)), color='red'))
-            return
-        col = col[0]
-        clashes[item[col]].append([line] + id_number_gloss(item))
-
-    with Result(args, col, 'LINE_NO', 'ID', 'NUMBER', 'GLOSS') as t:
-        for val in sorted(c for c in clashes if len(clashes[c]) > 1):
-            for item in clashes[val]:
-                t.append([val] + item)
-
-
-def unique_concepticon_gloss(items, args):
-    _unique(items, args, CS_ID, CS_GLOSS)
-
-
-def unique_id(items, args):
-    _unique(items, args, 'ID')
-
-
-def unique_number(items, args):
-    _unique(items, args, 'NUMBER')
-
-
-def good_graph(items, args):
-    cids = {
-        "ID": {b["ID"] for a, b in items},
-        "NAME": {b.get("ENGLISH", b.get("GLOSS")) for a, b in items}}
-    # name suffixes for columns
-    all_problems = collections.OrderedDict({
-        "ID": {name: [] for name in CONCEPT_NETWORK_COLUMNS},
-        "NAME": {name: [] for name in CONCEPT_NETWORK_COLUMNS}
-    })
-
-    for cid, concept in items:
-        for name in CONCEPT_NETWORK_COLUMNS:
-            nodes_ = concept.get(name)
-            if nodes_:
-                nodes = json.loads(nodes_)
-                for node in nodes:
-                    for itm in ["ID", "NAME"]:
-                        if not node.get(itm) or not node.get(itm) in cids[itm]:
-                            all_problems[itm][name].append([cid] + id_number_gloss(concept))
-
-    graph_problems = []
-    # assemble edges and make sure they make sense
-    edges, id2num = collections.defaultdict(dict), {}
-    for i, (cid, concept) in enumerate(items):
-        # LINKED_CONCEPTS are considered undirected. They may be specified twice - i.e. in both
-        # directions - but then they must carry the same exact attributes.
-        nodes_ = concept.get("LINKED_CONCEPTS")
-        id2num[concept["ID"]] = (concept["NUMBER"], i + 2)
-        if nodes_:
-            nodes = json.loads(nodes_)
-            for node in nodes:
-                for k, v in node.items():
-                    if isinstance(v, (float, int)):
-                        edges[concept["ID"], node["ID"]][k] = v
-    for nA, nB in list(edges):
-        if (nB, nA) in edges:  # Check attributes:
-            for attr in edges[nA, nB]:
-                if edges[nA, nB][attr] != edges[nB, nA].get(attr):
-                    graph_problems.append([
-                        "different values for {} / {} in {}".format(nA, nB, attr),
-                        id2num[nA][1], nA, id2num[nA][0]])
-
-    with Result(args, "good graph", 'LINE_NO', 'ID', 'NUMBER', 'GLOSS') as t:
+    name = 'valid_concepticon_gloss'
+    cols = ['CONCEPTICON_GLOSS', 'LINE_NO', 'ID', 'NUMBER', 'GLOSS']
+
+    def visit(self, line, item):
+        cgloss = item.get(CS_GLOSS)
+        if cgloss and cgloss not in self.context.valid_glosses:
+            self.problems.append([cgloss, line] + id_number_gloss(item))  # pragma: no cover
+
+
+class ValidConcepticonId(Check):
+    name = 'valid_concepticon_id'
+    cols = ['CONCEPTICON_ID', 'LINE_NO', 'ID', 'NUMBER', 'GLOSS']
+
+    def visit(self, line, item):
+        cid = item.get(CS_ID)
+        if cid and cid not in self.context.valid_ids:
+            self.problems.append([cid, line] + id_number_gloss(item))  # pragma: no cover
+
+
+class Unique(Check):
+    """
+    Values in a column must be unique within the list.
+    """
+    candidate_cols = []
+
+    def __init__(self, context):
+        Check.__init__(self, context)
+        self.col = None
+        self.clashes = collections.defaultdict(list)
+
+    def visit(self, line, item):
+        if self.col is None:
+            col = [c for c in self.candidate_cols if c in item]
+            if not col:  # pragma: no cover
+                self.error = 'no column {0}'.format(' or '.join(self.candidate_cols))
+                return
+            self.col = col[0]
+            self.cols = [self.col, 'LINE_NO', 'ID', 'NUMBER', 'GLOSS']
+        self.clashes[item[self.col]].append([line] + id_number_gloss(item))
+
+    def describe(self, problem):
+        return 'non-unique {0}: {1}'.format(self.col, problem[0])
+
+    def finish(self):
+        for val in sorted(c for c in self.clashes if len(self.clashes[c]) > 1):
+            for item in self.clashes[val]:
+                self.problems.append([val] + item)
+
+
+class UniqueConcepticonGloss(Unique):
+    name = 'unique_concepticon_gloss'
+    candidate_cols = [CS_ID, CS_GLOSS]
+
+
+class UniqueId(Unique):
+    name = 'unique_id'
+    candidate_cols = ['ID']
+
+
+class UniqueNumber(Unique):
+    name = 'unique_number'
+    candidate_cols = ['NUMBER']
+
+
+class GoodGraph(Check):
+    """
+    Linked concepts in network columns must be concepts of the list. LINKED_CONCEPTS are
+    considered undirected. They may be specified twice - i.e. in both directions - but then they
+    must carry the same exact attributes.
+    """
+    name = 'good_graph'
+    cols = ["good graph", 'LINE_NO', 'ID', 'NUMBER', 'GLOSS']
+
+    def describe(self, problem):
+        return problem[0]
+
+    def __init__(self, context):
+        Check.__init__(self, context)
+        self.cids = {"ID": set(), "NAME": set()}
+        self.labels, self.id2num = {}, {}
+        self.edges = []
+        self.linked = collections.defaultdict(dict)
+
+    def visit(self, line, item):
+        self.cids["ID"].add(item["ID"])
+        self.cids["NAME"].add(item.get("ENGLISH", item.get("GLOSS")))
+        self.id2num[item["ID"]] = (item["NUMBER"], line)
+        for edge in iter_edges([(line, item)]):
+            # The linked concept is the target of the edge - or the source for SOURCE_CONCEPTS.
+            node = (edge.source, edge.source_name) \
+                if edge.column == 'SOURCE_CONCEPTS' else (edge.target, edge.target_name)
+            self.edges.append((edge.column, line, node))
+            if line not in self.labels:
+                self.labels[line] = id_number_gloss(item)
+            # Only links with numeric attributes are compared to their reverse:
+            if edge.column == "LINKED_CONCEPTS" and edge.weights:
+                self.linked[edge.source, edge.target].update(edge.weights)
+
+    def finish(self):
+        # name suffixes for columns
+        all_problems = collections.OrderedDict({
+            "ID": {name: [] for name in CONCEPT_NETWORK_COLUMNS},
+            "NAME": {name: [] for name in CONCEPT_NETWORK_COLUMNS}
+        })
+        for column, line, node in self.edges:
+            for itm, value in zip(["ID", "NAME"], node):
+                if not value or value not in self.cids[itm]:
+                    all_problems[itm][column].append([line] + self.labels[line])
+
         for item, problems in all_problems.items():
             for name in CONCEPT_NETWORK_COLUMNS:
                 for problem in problems[name]:
-                    problem.insert(
-                        0,
-                        "Attribute {} in column {}_CONCEPTS does not occur in concept list".format(
-                            item, name))
-                    t.append(problem)
-        for problem in graph_problems:
-            t.append(problem)
+                    self.problems.append([
+                        "Attribute {} in column {} does not occur in concept list".format(
+                            item, name)] + problem)
+
+        for nA, nB in list(self.linked):
+            if (nB, nA) in self.linked:  # Check attributes:
+                for attr in self.linked[nA, nB]:
+                    if self.linked[nA, nB][attr] != self.linked[nB, nA].get(attr):
+                        self.problems.append([
+                            "different values for {} / {} in {}".format(nA, nB, attr),
+                            self.id2num[nA][1], nA, self.id2num[nA][0]])
 
 
 CHECKS = [
-    unique_concepticon_gloss,
-    unique_id,
-    unique_number,
-    matching_concepticon_gloss_and_id,
-    valid_concepticon_gloss,
-    valid_concepticon_id,
-    good_graph
+    UniqueConcepticonGloss,
+    UniqueId,
+    UniqueNumber,
+    MatchingConcepticonGlossAndId,
+    ValidConcepticonGloss,
+    ValidConcepticonId,
+    GoodGraph,
 ]
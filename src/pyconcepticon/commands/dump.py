@@ -1,11 +1,16 @@
 """
 Write concepticon linking data to file.
+
+Notes
+-----
+By default, linking data is written as JSON file concepticon.json in a zip archive. With
+"--format binary", it is written in a binary format, which can be memory-mapped and queried using
+pyconcepticon.linkdata.LinkingData.
 """
 import json
 import zipfile
-import collections
 
-from csvw.dsv import UnicodeDictReader
+from pyconcepticon.linkdata import read_mappings, write_binary
 
 
 def register(parser):
@@ -14,40 +19,19 @@ def register(parser):
         default=None,
         help="Name of the file to store data in compressed form."
     )
+    parser.add_argument(
+        "--format",
+        choices=['json', 'binary'],
+        default='json',
+        help="Format of the linking data."
+    )
 
 
 def run(args):
-    paths = {p.stem.split('-')[1]: p for p in args.repos.path(
-        'mappings').glob('map-*.tsv')}
-    translate = {
-        'Person/Thing': 'noun',
-        'Other': 'other',
-        'Number': 'numeral',
-        'Action/Process': 'verb',
-        'Property': 'adjective',
-        'Classifier': 'classifier'
-    }
-    mappings = {}
-    for language, path in paths.items():
-        mappings[language] = collections.defaultdict(set)
-        with UnicodeDictReader(path, delimiter='\t') as reader:
-            for line in reader:
-                gloss = line['GLOSS'].split('///')[1]
-                oc = translate.get(
-                    args.repos.conceptsets[line['ID']].ontological_category,
-                    'other')
-                cgl = args.repos.conceptsets[line['ID']].gloss
-                mappings[language][gloss].add(
-                    (line['ID'], cgl, int(line['PRIORITY']), oc, 1))
-            for gloss in list(mappings[language].keys()):
-                if gloss.lower() not in mappings[language]:
-                    mappings[language][gloss.lower()] = set([
-                        (x[0], x[1], x[2], x[3], 0) for x in
-                        mappings[language][gloss]])
-
-    for language, path in paths.items():
-        for k, v in mappings[language].items():
-            mappings[language][k] = sorted(v, key=lambda x: x[1], reverse=True)
+    mappings = read_mappings(args.repos)
+    if args.format == 'binary':
+        write_binary(args.destination, mappings)
+        return
 
     with zipfile.ZipFile(
         args.destination,
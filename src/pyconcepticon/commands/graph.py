@@ -1,5 +1,5 @@
 """
-Converts a concept list into a graph.
+Converts concept lists into a graph.
 
 Notes
 -----
@@ -8,13 +8,24 @@ Expects well-formed concept lists as input, i.e. TSV files, with columns
 - CONCEPTICON_ID
 - NUMBER
 - CONCEPTICON_GLOSS
+
+Edges of all given lists are streamed - i.e. written while the lists are parsed - to the output,
+unless a tabular format other than "tsv" is requested for printing, or edges are merged across
+lists.
+
+Edges are listed as specified in the concept lists, i.e. from the concept of a row to the linked
+concept, with all properties of the link. Edges merged across lists (with "--merge") or written in
+binary format are edges of the concept network instead: They only carry numeric weights, and the
+linked concepts in SOURCE_CONCEPTS columns are their sources.
 """
+import sys
+import itertools
+
 from clldutils.clilib import Table, add_format
+from csvw.dsv import UnicodeWriter, reader
 
 from pyconcepticon.cli_util import add_conceptlist, get_conceptlist
-from pyconcepticon.util import read_dicts
-
-import json
+from pyconcepticon.networks import iter_edges, EdgeTable, BinaryEdgeWriter
 
 
 def register(parser):
@@ -33,7 +44,7 @@ def register(parser):
     parser.add_argument(
         "--threshold",
         action='store',
-        type=int,
+        type=float,
         help='set the threshold for the inclusion of an edge',
         default=0)
     parser.add_argument(
@@ -49,20 +60,76 @@ def register(parser):
         default=[],
         help='specify weights to be listed in the graph, separated by comma.'
     )
+    parser.add_argument(
+        '--merge',
+        action='store_true',
+        default=False,
+        help='merge edges across concept lists by CONCEPTICON_ID, summing weights.')
+    parser.add_argument(
+        '--output',
+        default=None,
+        help='path of a file to write the edges to.')
+    parser.add_argument(
+        '--output-format',
+        choices=['tsv', 'binary'],
+        default='tsv',
+        help='format of the output file, see pyconcepticon.networks.BinaryEdgeWriter for the '
+             'binary edge list format.')
+
+
+def iter_graph(args, raw=True):
+    threshold = (args.threshold_property, args.threshold) \
+        if args.threshold and args.threshold_property else None
+    paths = get_conceptlist(args, path_only=True)
+    if args.merge:
+        edges = EdgeTable.concat(
+            EdgeTable.from_file(p, columns=[args.graph_column], threshold=threshold)
+            for p in paths).aggregate()
+        for edge in edges:
+            yield edge._replace(
+                source_name=args.repos.conceptsets[edge.source].gloss
+                if edge.source in args.repos.conceptsets else None,
+                target_name=args.repos.conceptsets[edge.target].gloss
+                if edge.target in args.repos.conceptsets else None)
+        return
+    for p in paths:
+        yield from iter_edges(
+            enumerate(reader(p, dicts=True, delimiter='\t'), start=2),
+            conceptlist=p.stem,
+            columns=[args.graph_column],
+            threshold=threshold,
+            raw=raw)
 
 
 def run(args):
-    header = args.weights
+    edges = iter_graph(args, raw=not (args.output and args.output_format == 'binary'))
+    # Peek at the first edge, to determine the weights to list - if not specified.
+    first = next(edges, None)
+    header = args.weights or (
+        [k for k in first.weights if k != 'OCCURRENCES'] if first else [])
+    if args.merge and not args.weights:
+        header.append('OCCURRENCES')
+    edges = itertools.chain([first] if first else [], edges)
+    cols = ["SOURCE_ID", "SOURCE_NAME", "TARGET_ID", "TARGET_NAME"] + header
+
+    def number(v):
+        # Weights of merged edges are floats, but mostly integral.
+        return int(v) if isinstance(v, float) and v.is_integer() else v
+
+    def row(edge):
+        return [edge.source, edge.source_name or '?', edge.target, edge.target_name] + \
+            [number(edge.weights.get(h, '')) for h in header]
 
-    with Table(args, *["SOURCE_ID", "SOURCE_NAME", "TARGET_ID", "TARGET_NAME"] + header) as t:
-        for idx, item in enumerate(read_dicts(get_conceptlist(args, path_only=True)[0]), start=2):
-            links = json.loads(item[args.graph_column])
-            source_id, source_name = (item["ID"], item.get("ENGLISH", item.get("GLOSS", "?")))
-            for link in links:
-                link_id, link_name = link["ID"], link["NAME"]
-                if args.threshold and args.threshold_property:
-                    if link[args.threshold_property] < args.threshold:
-                        continue
-                if not header:
-                    header = [key for key in link if key not in ["ID", "NAME"]]
-                t.append([source_id, source_name, link_id, link_name] + [link[h] for h in header])
+    if args.output and args.output_format == 'binary':
+        with BinaryEdgeWriter(args.output, header) as writer:
+            for edge in edges:
+                writer.write(edge)
+    elif args.output or args.format == 'tsv':
+        with UnicodeWriter(args.output or sys.stdout, delimiter='\t') as writer:
+            writer.writerow(cols)
+            for edge in edges:
+                writer.writerow(row(edge))
+    else:
+        with Table(args, *cols) as t:
+            for edge in edges:
+                t.append(row(edge))
@@ -1,37 +1,85 @@
 """
-Link concepts to concept sets for a given concept list.
+Link concepts to concept sets for the given concept lists.
 
 Notes
 -----
 If either CONCEPTICON_GLOSS or CONCEPTICON_ID is given in the list, the other is added.
+
+Many lists - or glob patterns - can be given; they are rewritten in parallel with "--jobs", and
+a consolidated report of unknown or mismatching IDs and glosses is printed.
 """
-from pyconcepticon.util import rewrite, CS_GLOSS, CS_ID
-from pyconcepticon.cli_util import add_conceptlist, get_conceptlist
+import itertools
+import collections
+
+from csvw.dsv import UnicodeWriter, reader
+
+from pyconcepticon.util import CS_GLOSS, CS_ID
+from pyconcepticon.cli_util import add_conceptlist, get_conceptlist, add_jobs, parallel_map
 
 
 def register(parser):
-    add_conceptlist(parser)
+    add_conceptlist(parser, multiple=True)
+    add_jobs(parser, help='number of concept lists to rewrite in parallel')
 
 
 def run(args):
-    cl = get_conceptlist(args, path_only=True)
-    rewrite(cl, Linker(cl.stem, args.repos.conceptsets.values()))
+    paths = list(collections.OrderedDict.fromkeys(get_conceptlist(args, path_only=True)))
+    # The lookup indexes are built once, for all lists:
+    index = Linker.index(args.repos.conceptsets.values())
+    with args.repos.transaction() as txn:
+        reports = list(parallel_map(
+            args.jobs, link, paths, [txn.path(p) for p in paths], itertools.repeat(index)))
+
+    problems = 0
+    for path, messages in zip(paths, reports):
+        if messages:
+            print(path)
+            for lineno, msg in messages:
+                print('{0}: {1}'.format(lineno, msg))
+            problems += len(messages)
+    if len(paths) > 1:
+        print('{0} concept lists linked, {1} problems'.format(len(paths), problems))
+
+
+def link(path, target, index):
+    """
+    Link concepts of the list at `path`, writing the result to `target`.
+
+    :returns: `list` of (line number, message) pairs, reporting problems.
+    """
+    linker = Linker(path.stem, concepts=index)
+    with UnicodeWriter(target, delimiter='\t') as writer:
+        for i, row in enumerate(reader(path, delimiter='\t')):
+            writer.writerow(linker(i, row))
+    return linker.messages
 
 
 class Linker(object):
-    def __init__(self, clid, conceptsets):
+    def __init__(self, clid, conceptsets=(), concepts=None):
+        """
+        :param conceptsets: Concept sets to link to.
+        :param concepts: Lookup indexes for concept sets, as computed with `Linker.index`.
+        """
         self.clid = clid
-        self.concepts = {
+        self.concepts = concepts or self.index(conceptsets)
+        self.messages = []
+
+        self._cid_index = None
+        self._cgloss_index = None
+        self._link_col = (None, None)
+        self._number_index = None
+
+    @staticmethod
+    def index(conceptsets):
+        return {
             CS_ID: {cs.id: cs.gloss for cs in conceptsets},
             # maps ID to GLOSS
             CS_GLOSS: {cs.gloss: cs.id for cs in conceptsets},
             # maps GLOSS to ID
         }
 
-        self._cid_index = None
-        self._cgloss_index = None
-        self._link_col = (None, None)
-        self._number_index = None
+    def report(self, i, msg):
+        self.messages.append((i + 1, msg))
 
     def __call__(self, i, row):
         if i == 0:
@@ -57,17 +105,18 @@ class Linker(object):
         if self._link_col[1]:
             val = self.concepts[self._link_col[1]].get(row[self._link_col[0]], "")
             if not val:  # pragma: no cover
-                print("unknown %s: %s" % (self._link_col[1], row[self._link_col[0]]))
+                self.report(i, "unknown %s: %s" % (self._link_col[1], row[self._link_col[0]]))
             row = [val] + row
         else:
             cid = self.concepts[CS_GLOSS].get(row[self._cgloss_index], "")
             if not cid:
-                print("unknown CONCEPTICON_GLOSS: {0}".format(row[self._cgloss_index]))
+                self.report(i, "unknown CONCEPTICON_GLOSS: {0}".format(row[self._cgloss_index]))
             elif cid != row[self._cid_index]:
                 if not row[self._cid_index]:
                     row[self._cid_index] = cid
                 else:
-                    print(
+                    self.report(
+                        i,
                         "unknown CONCEPTICON_ID/GLOSS mismatch: %s %s"
                         % (row[self._cid_index], row[self._cgloss_index])
                     )
@@ -3,7 +3,14 @@ Dumps Concepticon's contents for English, German, Chinese, and French.
 
 Notes
 -----
-Data are by default dumped into a structured JSON file in html/data.js.
+Data are by default dumped into a structured JSON file in <repos>/app/data/data.js.
+
+With "--shards", data are instead dumped into <repos>/app/data/shards/, to be loaded lazily
+by the app:
+- conceptsets.json: list of concept sets as [ID, GLOSS, DEFINITION, ONTOLOGICAL_CATEGORY],
+- one JSON file per language and first character of glosses, mapping glosses to lists of indices
+  into the concept set list,
+- index.json: mapping languages to dicts mapping first characters of glosses to shard files.
 """
 import json
 import argparse
@@ -11,33 +18,70 @@ import collections
 
 from pyconcepticon import Concepticon
 
+LANGUAGES = ["en", "de", "zh", "fr", "ru", "es", "pt"]
+
 
 def register(parser):
     parser.add_argument('--recreate', default=True, help=argparse.SUPPRESS)
+    parser.add_argument(
+        '--shards',
+        action='store_true',
+        default=False,
+        help='dump data into per-language shards, keyed by the first character of glosses')
+
+
+def dumps(obj):
+    return json.dumps(obj, separators=(',', ':'))
 
 
 @Concepticon.app_wrapper
 def run(args):
-    data = collections.defaultdict(list)
-
-    def key(g, l_):
-        return "{0}---{1}".format(g, l_)
+    # Concept sets are looked up once, and referenced by index into `conceptsets`.
+    conceptsets, index = [], {}
+    data = collections.OrderedDict()
 
-    for lang in ["en", "de", "zh", "fr", "ru", "es", "pt"]:
+    for lang in LANGUAGES:
         for cidx, gloss in args.api._get_map_for_language(lang):
+            if cidx not in index:
+                cs = args.api.conceptsets[cidx]
+                index[cidx] = len(conceptsets)
+                conceptsets.append((cidx, cs.gloss, cs.definition, cs.ontological_category))
             g0, _, g1 = gloss.partition("///")
-            csspec = (
-                cidx,
-                args.api.conceptsets[cidx].gloss,
-                args.api.conceptsets[cidx].definition,
-                args.api.conceptsets[cidx].ontological_category,
-            )
-            data[key(g1, lang)].append(csspec)
+            data.setdefault((lang, g1), []).append(index[cidx])
             if lang == "en":
-                data[key(g0, lang)].append(csspec)
-                data[key(g0.lower(), lang)].append(csspec)
-    data["language"] = "en"
-    args.api.appdatadir.joinpath("data.js").write_text(
-        "var Concepticon = {0};\n".format(json.dumps(data, indent=2)),
-        encoding='utf-8')
+                data.setdefault((lang, g0), []).append(index[cidx])
+                data.setdefault((lang, g0.lower()), []).append(index[cidx])
+
+    if args.shards:
+        write_shards(args.api.appdatadir.joinpath('shards'), conceptsets, data)
+    else:
+        js = collections.OrderedDict(
+            ("{0}---{1}".format(g, lang), [conceptsets[i] for i in v])
+            for (lang, g), v in data.items())
+        js["language"] = "en"
+        args.api.appdatadir.joinpath("data.js").write_text(
+            "var Concepticon = {0};\n".format(dumps(js)), encoding='utf-8')
     args.log.info("app data recreated")
+
+
+def write_shards(d, conceptsets, data):
+    if d.exists():
+        for p in d.glob('*.json'):
+            p.unlink()
+    else:
+        d.mkdir()
+
+    shards = collections.OrderedDict()
+    for (lang, gloss), v in data.items():
+        shards.setdefault(lang, collections.OrderedDict()).setdefault(
+            gloss[:1].lower(), collections.OrderedDict())[gloss] = v
+
+    shard_index = collections.OrderedDict()
+    for lang, prefixes in shards.items():
+        shard_index[lang] = collections.OrderedDict()
+        for i, (prefix, glosses) in enumerate(sorted(prefixes.items())):
+            fname = '{0}-{1}.json'.format(lang, i)
+            d.joinpath(fname).write_text(dumps(glosses), encoding='utf-8')
+            shard_index[lang][prefix] = fname
+    d.joinpath('conceptsets.json').write_text(dumps(conceptsets), encoding='utf-8')
+    d.joinpath('index.json').write_text(dumps(shard_index), encoding='utf-8')
@@ -5,67 +5,102 @@ Notes
 -----
 map* files contain lists of all concept-to-word-in-language mappings
 available within Concepticon.
+
+All concept lists are read once, collecting the glosses for all languages; the map files can then
+be written in parallel.
+
+The glosses counted per concept list are cached in <repos>/.cache/linkdata.json, keyed by the
+content hash of the list and its metadata. With "--incremental", only the contributions of lists
+which have been added, changed or removed since the last run are recounted.
 """
+import json
 import collections
 
-from csvw.dsv import UnicodeWriter
+from clldutils import jsonlib
+
+from pyconcepticon.cli_util import add_jobs
+from pyconcepticon.linkdata import languages, contributions, write_mappings
+
+CACHE_VERSION = 2
+
+
+def register(parser):
+    add_jobs(parser, help='number of map files to write in parallel')
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        default=False,
+        help='only recount the glosses of concept lists changed since the last run')
 
 
 def run(args):
-    for lang in args.repos.vocabularies["COLUMN_TYPES"].values():
-        if getattr(lang, "iso2", None):
-            _write_linking_data(args.repos, lang, args)
-
-
-def _write_linking_data(api, lang, args):
-    out, freqs = collections.defaultdict(int), collections.defaultdict(int)
-    # find those concept sets that are wrongly linked, they should not go into
-    # the mapping, so we just make a re-linker here
-    rep = {}
-    for c in api.conceptsets.values():
-        if c.replacement_id:
-            rep[c.id] = c.replacement_id
-            rep[c.gloss] = api.conceptsets[c.replacement_id].gloss
-        else:
-            rep[c.id] = c.id
-            rep[c.gloss] = c.gloss
-
-    for clist in api.conceptlists.values():
+    langs = languages(args.repos)
+    cache_path = args.repos.cache_path('linkdata.json')
+    key = cache_key(langs)
+    cache = None
+    if args.incremental and cache_path.exists():
+        cache = load_cache(cache_path, key)
+    cache = cache or dict(lists={}, totals={iso2: collections.Counter() for iso2 in langs})
+    counts, changed = cache['totals'], 0
+
+    lists = {}
+    for clist in args.repos.conceptlists.values():
+        checksum = clist.content_hash()
+        old = cache['lists'].pop(clist.id, None)
+        if old and old['hash'] == checksum:
+            lists[clist.id] = old
+            continue
         args.log.info("checking {clist.id}".format(clist=clist))
-        for row in clist.concepts.values():
-            if row.concepticon_id:
-                gls = None
-                if lang.iso2 == "en":
-                    if row.english:
-                        gls = row.english.strip("*$-—+")
-                else:
-                    if lang.name in row.attributes and row.attributes[lang.name]:
-                        gls = row.attributes[lang.name].strip("*$-—+")
-
-                if gls:
-                    out[rep[row.concepticon_gloss] + "///" + gls, rep[row.concepticon_id]] += 1
-                    freqs[rep[row.concepticon_id]] += 1
-
-    if lang.iso2 == "en":
-        for cset in api.conceptsets.values():
-            gloss = rep[cset.gloss]
-            cid = rep[cset.id]
-            if cset.ontological_category == "Person/Thing":
-                out[gloss + "///the " + cset.gloss.lower(), cid] = freqs[cid]
-                out[gloss + "///the " + cset.gloss.lower() + "s", cid] = freqs[cid]
-            elif cset.ontological_category == "Action/Process":
-                out[gloss + "///to " + cset.gloss.lower(), cid] = freqs[cid]
-            elif cset.ontological_category == "Property":
-                out[gloss + "///" + cset.gloss.lower() + " (adjective)", cid] = freqs[cid]
-            elif cset.ontological_category == "Classifier":
-                out[gloss + "///" + cset.gloss.lower() + " (classifier)", cid] = freqs[cid]
-            else:
-                out[gloss + "///" + cset.gloss.lower(), cid] = freqs[cid]
-
-    p = api.path("mappings", "map-{0}.tsv".format(lang.iso2))
-    if not p.parent.exists():
-        p.parent.mkdir()
-    with UnicodeWriter(p, delimiter="\t") as f:
-        f.writerow(["ID", "GLOSS", "PRIORITY"])
-        for i, (gloss, cid) in enumerate(sorted(out)):
-            f.writerow([cid, gloss, out[gloss, cid]])
+        changed += 1
+        new = contributions(clist, langs.values())
+        for iso2 in langs:
+            if old:
+                counts[iso2] -= old['counts'][iso2]
+            counts[iso2] += new[iso2]
+        lists[clist.id] = dict(hash=checksum, counts=new)
+    for old in cache['lists'].values():  # Contributions of removed lists.
+        changed += 1
+        for iso2 in langs:
+            counts[iso2] -= old['counts'][iso2]
+    if args.incremental:
+        args.log.info('{0} concept lists changed'.format(changed))
+    dump_cache(cache_path, key, lists, counts)
+    write_mappings(args.repos, counts, jobs=args.jobs)
+
+
+def cache_key(langs):
+    """
+    Cached contributions are only valid for the same languages.
+    """
+    return json.dumps([CACHE_VERSION, [[iso2, lang.name] for iso2, lang in langs.items()]])
+
+
+def _counter(rows):
+    return collections.Counter({tuple(row[:3]): row[3] for row in rows})
+
+
+def _rows(counter):
+    return [list(k) + [n] for k, n in sorted(counter.items())]
+
+
+def load_cache(p, key):
+    cache = jsonlib.load(p)
+    if cache.get('key') != key:
+        return None
+    return dict(
+        lists={
+            clid: dict(hash=d['hash'], counts={k: _counter(v) for k, v in d['counts'].items()})
+            for clid, d in cache['lists'].items()},
+        totals={k: _counter(v) for k, v in cache['totals'].items()})
+
+
+def dump_cache(p, key, lists, totals):
+    jsonlib.dump(
+        collections.OrderedDict([
+            ('key', key),
+            ('lists', {
+                clid: dict(hash=d['hash'], counts={k: _rows(v) for k, v in d['counts'].items()})
+                for clid, d in lists.items()}),
+            ('totals', {k: _rows(v) for k, v in totals.items()}),
+        ]),
+        p)
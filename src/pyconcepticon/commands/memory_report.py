@@ -0,0 +1,60 @@
+"""
+Report the memory retained by the data structures of the Concepticon API.
+
+Notes
+-----
+Memory is traced with tracemalloc while loading concept sets, relations, the bibliography,
+concept lists, the concepts of each list and the mapping tables - in this order. The memory of a
+structure is the traced memory still allocated after loading it, not counting data shared with
+structures loaded before. Peak memory is measured relative to the memory allocated before loading.
+Note that memory allocated by modules which are only imported when loading a structure - e.g.
+pybtex for the bibliography - is attributed to this structure.
+
+Besides the totals per structure, the concept lists and the source lines of allocations which
+retain most memory are listed.
+"""
+from clldutils.clilib import Table, add_format
+
+from pyconcepticon import Concepticon
+from pyconcepticon.memory import STRUCTURES, measure
+
+
+def register(parser):
+    add_format(parser, default='simple')
+    parser.add_argument(
+        '--structure',
+        help='structure to measure (default: all)',
+        choices=STRUCTURES,
+        action='append',
+        default=[])
+    parser.add_argument(
+        '--top',
+        help='number of concept lists and allocation sites to list',
+        type=int,
+        default=10)
+
+
+def kib(n):
+    return None if n is None else round(n / 1024, 1)
+
+
+def run(args):
+    # We measure on a fresh instance, to make sure no data has been loaded already.
+    report = measure(Concepticon(args.repos.repos), structures=args.structure, top=args.top)
+
+    with Table(args, 'structure', 'items', 'retained KiB', 'peak KiB') as t:
+        for structure, items, retained, peak in report.structures():
+            t.append([structure, items, kib(retained), kib(peak)])
+        t.append(['total', len(report.measurements), kib(report.total), None])
+
+    if report.top('concepts'):
+        print('\nConcept lists retaining most memory:')
+        with Table(args, 'concept list', 'retained KiB', 'peak KiB') as t:
+            for m in report.top('concepts', args.top):
+                t.append([m.item, kib(m.retained), kib(m.peak)])
+
+    print('\nAllocation sites retaining most memory:')
+    with Table(args, 'source', 'blocks', 'KiB') as t:
+        for stat in report.allocations:
+            frame = stat.traceback[0]
+            t.append(['{0}:{1}'.format(frame.filename, frame.lineno), stat.count, kib(stat.size)])
@@ -1,12 +1,23 @@
 """
 Recreate the concept lists containing network data.
+
+Notes
+-----
+A manifest of hashes of the inputs of each conversion - i.e. the files in the directory of the
+list and the list itself - is kept in <repos>/.cache/recreate_networks.json. Lists are only
+recreated if their inputs changed since the last run, unless "--force" or "--download" is given.
 """
 import json
 import shutil
+import hashlib
 import subprocess
+import concurrent.futures
 
+from clldutils import jsonlib
+from clldutils.path import md5
 from csvw.dsv import reader
 
+from pyconcepticon.cli_util import add_jobs
 from pyconcepticon.models import CONCEPT_NETWORK_COLUMNS
 
 
@@ -21,6 +32,12 @@ def register(parser):
         action='store_true',
         default=False,
         help="Do not overwrite lists, but compute diff")
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        default=False,
+        help="Recreate lists even if their inputs did not change")
+    add_jobs(parser, help='number of conversions to run in parallel')
 
 
 def idname(t):
@@ -34,9 +51,13 @@ def hashable_dict(d):
 
 
 def diff(new, old):
+    """
+    :returns: `list` of lines describing the differences in network columns between lists.
+    """
     old = {r['ID']: r for r in reader(old, dicts=True, delimiter='\t')}
     new = {r['ID']: r for r in reader(new, dicts=True, delimiter='\t')}
 
+    res = []
     for k, i1 in old.items():
         i2 = new[k]
         for col in CONCEPT_NETWORK_COLUMNS:
@@ -44,24 +65,79 @@ def diff(new, old):
                 v1 = set(hashable_dict(i) for i in json.loads(i1[col] or '[]'))
                 v2 = set(hashable_dict(i) for i in json.loads(i2[col] or '[]'))
                 if v1 != v2:
-                    print('== {}\t{}'.format(k, col))
+                    res.append('== {}\t{}'.format(k, col))
                     for ii in v1:
                         if ii not in v2:
-                            print('-- {}'.format(idname(ii)))
+                            res.append('-- {}'.format(idname(ii)))
                     for ii in v2:
                         if ii not in v1:
-                            print('++ {}'.format(idname(ii)))
+                            res.append('++ {}'.format(idname(ii)))
+    return res
+
+
+def inputs_hash(cl, d):
+    """
+    Hash of the inputs of the conversion of a list, i.e. of the files in its directory - except
+    for the converted list - and of the list itself.
+    """
+    h = hashlib.md5()
+    for p in sorted(d.glob('**/*')):
+        if p.is_file() and p != d / cl.path.name and '__pycache__' not in p.parts:
+            h.update('{0} {1}\n'.format(p.relative_to(d).as_posix(), md5(p)).encode('utf8'))
+    if cl.path.exists():
+        h.update(md5(cl.path).encode('utf8'))
+    return h.hexdigest()
+
+
+def recreate(cl, d, args):
+    """
+    Run the conversion for one list.
+
+    :returns: `list` of lines of output.
+    """
+    out, scripts = [], ['convert.py']
+    if d.joinpath('download.py').exists() and args.download:  # pragma: no cover
+        scripts.insert(0, 'download.py')
+    for script in scripts:
+        res = subprocess.run(
+            ['python', script], cwd=d, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        out.extend(res.stdout.decode('utf8', errors='replace').splitlines())
+        if res.returncode:
+            raise subprocess.CalledProcessError(
+                res.returncode, res.args, output='\n'.join(out))
+    if args.diff and cl.path.exists():
+        out.extend(diff(d / cl.path.name, cl.path))
+    else:
+        shutil.move(d / cl.path.name, cl.path)
+    return out
 
 
 def run(args):
+    manifest_path = args.repos.cache_path('recreate_networks.json')
+    manifest = jsonlib.load(manifest_path) if manifest_path.exists() else {}
+    todo = []
     for cl in args.repos.conceptlists.values():
         d = cl.path.parent / cl.path.stem
         if d.exists() and d.is_dir():
-            print(d)
-            if d.joinpath('download.py').exists() and args.download:  # pragma: no cover
-                subprocess.check_call(['python', 'download.py'], cwd=d)
-            subprocess.check_call(['python', 'convert.py'], cwd=d)
-            if args.diff and cl.path.exists():
-                diff(d / cl.path.name, cl.path)
+            if args.force or args.download or manifest.get(cl.id) != inputs_hash(cl, d):
+                todo.append((cl, d))
             else:
-                shutil.move(d / cl.path.name, cl.path)
+                args.log.info('skipping unchanged {0}'.format(cl.id))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as executor:
+        futures = [executor.submit(recreate, cl, d, args) for cl, d in todo]
+        # Output is printed per list, in the order of the lists:
+        for (cl, d), future in zip(todo, futures):
+            print(d)
+            try:
+                lines = future.result()
+            except subprocess.CalledProcessError as e:
+                args.log.error('conversion of {0} failed:\n{1}'.format(cl.id, e.output))
+                raise
+            for line in lines:
+                print(line)
+            if not args.diff:
+                manifest[cl.id] = inputs_hash(cl, d)
+
+    if not args.diff:
+        jsonlib.dump(manifest, manifest_path, indent=2)
@@ -37,47 +37,52 @@ def run(args):
     except KeyError:  # pragma: no cover
         raise ParserError('Source conceptlist {0} does not exist!'.format(args.from_))
 
-    # write the adapted concept list to the new path:
-    with UnicodeWriter(
-            cl.path.parent / cl.path.name.replace(args.from_, args.to), delimiter='\t') as writer:
-        header = []
-        for i, row in enumerate(reader(cl.path, delimiter='\t')):
-            if i == 0:
-                header = row
-                writer.writerow(row)
-                header = {v: k for k, v in enumerate(header)}  # Map col name to row index
-            else:
-                oid = row[header['ID']]
-                assert oid.startswith(args.from_)
-                nid = oid.replace(args.from_, args.to)
-                args.repos.add_retirement(
-                    'Concept', dict(id=oid, comment='renaming', replacement=nid))
-                row[header['ID']] = nid
-                writer.writerow(row)
+    # All files are written in one transaction, i.e. the repository is only changed if all
+    # steps succeed:
+    with args.repos.transaction() as txn:
+        # write the adapted concept list to the new path:
+        with UnicodeWriter(
+                txn.path(cl.path.parent / cl.path.name.replace(args.from_, args.to)),
+                delimiter='\t') as writer:
+            header = []
+            for i, row in enumerate(reader(cl.path, delimiter='\t')):
+                if i == 0:
+                    header = row
+                    writer.writerow(row)
+                    header = {v: k for k, v in enumerate(header)}  # Map col name to row index
+                else:
+                    oid = row[header['ID']]
+                    assert oid.startswith(args.from_)
+                    nid = oid.replace(args.from_, args.to)
+                    args.repos.add_retirement(
+                        'Concept', dict(id=oid, comment='renaming', replacement=nid))
+                    row[header['ID']] = nid
+                    writer.writerow(row)
 
-    # write adapted metadata to the new path:
-    fname_md = cl.path.name.replace(args.from_, args.to) + MD_SUFFIX
-    fname_url = cl.path.name.replace(args.from_, args.to)
-    md = jsonlib.load(
-        cl.path.parent / (cl.path.name + MD_SUFFIX),
-        object_pairs_hook=collections.OrderedDict)
-    md['tables'][0]['url'] = fname_url
-    jsonlib.dump(md, cl.path.parent / fname_md, indent=4)
+        # write adapted metadata to the new path:
+        fname_md = cl.path.name.replace(args.from_, args.to) + MD_SUFFIX
+        fname_url = cl.path.name.replace(args.from_, args.to)
+        md = jsonlib.load(
+            cl.path.parent / (cl.path.name + MD_SUFFIX),
+            object_pairs_hook=collections.OrderedDict)
+        md['tables'][0]['url'] = fname_url
+        jsonlib.dump(md, txn.path(cl.path.parent / fname_md), indent=4)
 
-    # remove obsolete concept list and metadata:
-    cl.path.unlink()
-    cl.path.parent.joinpath(cl.path.name + MD_SUFFIX).unlink()
+        # remove obsolete concept list and metadata:
+        txn.remove(cl.path)
+        txn.remove(cl.path.parent.joinpath(cl.path.name + MD_SUFFIX))
 
-    # adapt conceptlists.tsv
-    rows = []
-    for row in reader(args.repos.data_path('conceptlists.tsv'), delimiter='\t'):
-        rows.append([col.replace(args.from_, args.to) if col else col for col in row])
+        # adapt conceptlists.tsv
+        rows = []
+        for row in reader(args.repos.data_path('conceptlists.tsv'), delimiter='\t'):
+            rows.append([col.replace(args.from_, args.to) if col else col for col in row])
 
-    with UnicodeWriter(args.repos.data_path('conceptlists.tsv'), delimiter='\t') as writer:
-        writer.writerows(rows)
+        with UnicodeWriter(
+                txn.path(args.repos.data_path('conceptlists.tsv')), delimiter='\t') as writer:
+            writer.writerows(rows)
 
-    args.repos.add_retirement(
-        'Conceptlist', dict(id=args.from_, comment='renaming', replacement=args.to))
+        args.repos.add_retirement(
+            'Conceptlist', dict(id=args.from_, comment='renaming', replacement=args.to))
 
     print("""Please run
 grep -r "{0}" concepticondata/ | grep -v retired.json
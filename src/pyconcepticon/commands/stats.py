@@ -1,45 +1,39 @@
 """
 Generate new statistics for concepticondata/README.md.
+
+Notes
+-----
+Statistics per concept list are cached in <repos>/.cache/stats.json, so only lists which changed
+since the last run are read.
 """
 import operator
-import collections
 
 from clldutils.markup import Table
 
 from pyconcepticon.cli_util import readme
+from pyconcepticon.stats import CatalogStats
 
 
 def run(args):
-    cls = args.repos.conceptlists.values()
-    readme_conceptlists(args.repos, cls, args)
-    readme_concepticondata(args.repos, cls)
+    stats = CatalogStats.from_api(args.repos, cache=args.repos.cache_path('stats.json'))
+    readme_conceptlists(args.repos, stats, args)
+    readme_concepticondata(args.repos, stats)
 
 
-def readme_conceptlists(api, cls, args):
+def readme_conceptlists(api, stats, args):
     table = Table("name", "# mapped", "% mapped", "mergers")
-    for cl in cls:
-        args.log.info("processing <" + cl.path.name + ">")
-        mapped, mapped_ratio, mergers = cl.stats()
-        table.append(["[%s](%s) " % (cl.id, cl.path.name), len(mapped), mapped_ratio, len(mergers)])
+    for cl in stats.conceptlists:
+        args.log.info("processing <" + cl.filename + ">")
+        table.append([
+            "[%s](%s) " % (cl.id, cl.filename), len(cl.mapped), cl.mapped_ratio, len(cl.mergers)])
     readme(
         api.data_path("conceptlists"),
         "# Concept Lists\n\n{0}".format(table.render(verbose=True, sortkey=operator.itemgetter(0))),
     )
 
 
-def readme_concepticondata(api, cls):
-    """
-    Returns a dictionary with concept set label as value and tuples of concept
-    list identifier and concept label as values.
-    """
-    D, G = collections.defaultdict(list), collections.defaultdict(list)
-    labels = collections.Counter()
-
-    for cl in cls:
-        for concept in [c for c in cl.concepts.values() if c.concepticon_id]:
-            D[concept.concepticon_gloss].append((cl.id, concept.label))
-            G[concept.label].append((concept.concepticon_id, concept.concepticon_gloss, cl.id))
-            labels.update([concept.label])
+def readme_concepticondata(api, stats):
+    D = stats.conceptsets
     txt = ["""
 # Concepticon Statistics
 * concept sets (used): {0}
@@ -52,30 +46,27 @@ def readme_concepticondata(api, cls):
 
 """.format(
         len(D),
-        len(cls),
-        sum(list(labels.values())),
-        len(labels),
-        sum(list(labels.values())) / len(cls),
+        len(stats.conceptlists),
+        sum(list(stats.labels.values())),
+        len(stats.labels),
+        sum(list(stats.labels.values())) / len(stats.conceptlists),
         sum([len(v) for k, v in D.items()]) / len(D),
-        sum([len(set([label for _, label in v])) for k, v in D.items()]) / len(D),
+        sum([len(v) for v in stats.distinct_labels.values()]) / len(D),
     )]
 
-    for attr, key in [
-        ("Diverse", lambda x: (len(set([label for _, label in x[1]])), x[0] or "")),
-        ("Frequent", lambda x: (len(set([clist for clist, _ in x[1]])), x[0] or "18G18G")),
-    ]:
+    for attr, top in [("Diverse", stats.most_diverse()), ("Frequent", stats.most_frequent())]:
         table = Table("No.", "concept set", "distinct labels", "concept lists", "examples")
-        for i, (k, v) in enumerate(sorted(D.items(), key=key, reverse=True)[:20]):
+        for i, k in enumerate(top):
             table.append([
                 i + 1,
                 k,
-                len(set([label for _, label in v])),
-                len(set([clist for clist, _ in v])),
+                len(stats.distinct_labels[k]),
+                len(stats.distinct_conceptlists[k]),
                 ", ".join(
-                    sorted(set(["«{0}»".format(label.replace("*", "`*`")) for _, label in v]))
+                    sorted(set(["«{0}»".format(label.replace("*", "`*`"))
+                                for label in stats.distinct_labels[k]]))
                 ),
             ])
         txt.append("## Twenty Most {0} Concept Sets\n\n{1}\n".format(attr, table.render()))
 
     readme(api.data_path(), txt)
-    return D, G
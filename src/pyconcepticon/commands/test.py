@@ -6,10 +6,16 @@ Notes
 Tests for issues with column names, file names, IDs, source
 availability, etc. Best run after you went through the whole
 procedure of adding a new list to Concepticon.
+
+With "--format json" or "--format sarif" a machine-readable report - including timings of the
+test stages - is printed, and the exit status is 1 if problems were found.
 """
+from pyconcepticon.cli_util import add_report_format, REPORT_FORMATS
+from pyconcepticon.util import CheckReport
 
 
 def register(parser):
+    add_report_format(parser, default='simple')
     parser.add_argument(
         'clids',
         metavar='CONCEPTLIST_ID',
@@ -18,6 +24,11 @@ def register(parser):
 
 
 def run(args):
+    if args.format in REPORT_FORMATS:
+        report = CheckReport('concepticon test')
+        args.repos.check(*args.clids, report=report)
+        print(report.dumps(args.format))
+        return 0 if report else 1
     if args.repos.check(*args.clids):  # pragma: no cover
         args.log.info("all integrity tests passed: OK")
     else:  # pragma: no cover
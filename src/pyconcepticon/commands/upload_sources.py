@@ -6,15 +6,21 @@ environment variables
 - CDSTAR_URL,
 - CDSTAR_USER and
 - CDSTAR_PWD
+
+Uploads run in parallel; sources/cdstar.json is written after each successful upload, so an
+interrupted run can simply be restarted. With "--backend local", files are copied to a local
+directory instead, e.g. for testing.
 """
 import os
-import pathlib
+import concurrent.futures
 
-from cdstarcat.catalog import Catalog
+from clldutils.clilib import ParserError
 from clldutils.misc import format_size
+from clldutils.path import md5
 
 from pyconcepticon.util import SourcesCatalog
-from pyconcepticon.cli_util import readme
+from pyconcepticon.cli_util import readme, add_jobs
+from pyconcepticon.sources import CdstarBackend, LocalBackend
 
 
 def register(parser):
@@ -22,24 +28,51 @@ def register(parser):
         '--cdstar-catalog',
         default=os.environ.get("CDSTAR_CATALOG"),
         help='Path to global CDSTAR catalog')
+    parser.add_argument(
+        '--backend',
+        choices=['cdstar', 'local'],
+        default='cdstar',
+        help='Where to upload sources to')
+    parser.add_argument(
+        '--local-directory',
+        default=None,
+        help='Directory to upload sources to with the local backend')
+    add_jobs(parser, default=4, help='number of parallel uploads')
+
+
+def get_backend(args):
+    if args.backend == 'local':
+        if not args.local_directory:
+            raise ParserError('--local-directory is required with --backend local')
+        return LocalBackend(args.local_directory)
+    return CdstarBackend(
+        args.cdstar_catalog,
+        cdstar_url=os.environ["CDSTAR_URL"],
+        cdstar_user=os.environ["CDSTAR_USER"],
+        cdstar_pwd=os.environ["CDSTAR_PWD"])
 
 
 def run(args):
     toc = ["# Sources\n"]
     with SourcesCatalog(args.repos.data_path("sources", "cdstar.json")) as lcat:
-        with Catalog(
-            pathlib.Path(args.cdstar_catalog),
-            cdstar_url=os.environ["CDSTAR_URL"],
-            cdstar_user=os.environ["CDSTAR_USER"],
-            cdstar_pwd=os.environ["CDSTAR_PWD"],
-        ) as cat:  # pragma: no cover
-            for fname in sorted(
-                    args.repos.data_path("sources").glob("*.pdf"), key=lambda f: f.stem):
-                clid = fname.stem
-                spec = lcat.get(clid)
-                if not spec:
-                    _, _, obj = list(cat.create(fname, {"collection": "concepticon"}))[0]
-                    lcat.add(clid, obj)
+        todo = []
+        for fname in sorted(args.repos.data_path("sources").glob("*.pdf"), key=lambda f: f.stem):
+            spec = lcat.get(fname.stem)
+            if not spec:
+                todo.append(fname)
+            elif spec.get('md5') and spec['md5'] != md5(fname):
+                args.log.warning('local file differs from upload: {0}'.format(fname.name))
+
+        with get_backend(args) as backend:
+            def upload(fname):
+                obj = backend.upload(fname)
+                lcat.add(fname.stem, obj, url=backend.url(obj), md5=md5(fname))
+                lcat.write()  # Checkpoint.
+                args.log.info('uploaded {0}'.format(fname.name))
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as ex:
+                for future in [ex.submit(upload, fname) for fname in todo]:
+                    future.result()
 
         for key in sorted(lcat.items):
             spec = lcat.get(key)
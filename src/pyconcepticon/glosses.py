@@ -214,7 +214,10 @@ def parse_gloss(gloss, language='en'):
     return G
 
 
-def concept_map2(from_, to, freqs=None, language='en', **_):
+def concept_map2(from_, to, freqs=None, language='en', counters=None, **_):
+    """
+    :param counters: Optional `collections.Counter` to count the gloss comparisons performed in.
+    """
     # get frequencies
     freqs = freqs or collections.defaultdict(int)
 
@@ -228,12 +231,14 @@ def concept_map2(from_, to, freqs=None, language='en', **_):
                 mapped[gloss.main][key] += [i]
     mapping = {}
     sims = {}
+    comparisons = 0
     for k, v in mapped.items():
         if 'from' in v and 'to' in v:
             for i in v['from']:
                 current_sim = sims.get(i, 10)
                 best = mapping.get(i, set())
                 for j in v['to']:
+                    comparisons += len(glosses['from'][i]) * len(glosses['to'][j])
                     for glossA in glosses['from'][i]:
                         for glossB in glosses['to'][j]:
                             sim = glossA.similarity(glossB) or 10
@@ -244,6 +249,8 @@ def concept_map2(from_, to, freqs=None, language='en', **_):
                                 best.add(j)
                 mapping[i] = best
                 sims[i] = current_sim
+    if counters is not None:
+        counters.update(matcher_comparisons_total=comparisons)
     for i in mapping:
         mapping[i] = (
             sorted(
@@ -257,6 +264,7 @@ def concept_map(from_: typing.Iterable[typing.Union[typing.Tuple[str, str, float
                 to: typing.Iterable[typing.Union[typing.Tuple[str, str, float], str]],
                 similarity_level=5,
                 language='en',
+                counters=None,
                 **kw) -> typing.Dict[int, typing.Tuple[typing.List[int], int]]:
     """
     Function compares two concept lists and outputs suggestions for mapping.
@@ -267,6 +275,8 @@ def concept_map(from_: typing.Iterable[typing.Union[typing.Tuple[str, str, float
     mapping of concepts in the second list to the first list. All suggestions can then be
     output in various forms, both with multiple matches excluded or included, and in
     textform or in other forms.
+
+    :param counters: Optional `collections.Counter` to count the gloss comparisons performed in.
     """
     # extract glossing information from the data
     glosses = {'from': {}, 'to': {}}
@@ -292,6 +302,11 @@ def concept_map(from_: typing.Iterable[typing.Union[typing.Tuple[str, str, float
                     if sim and sim <= similarity_level:
                         sims.append((i, j, sim, tgloss.frequency))
 
+    if counters is not None:
+        counters.update(matcher_comparisons_total=(
+            sum(len(g) for g in glosses['from'].values())
+            * sum(len(g) for g in glosses['to'].values())))
+
     # we keep track of which target concepts have already been chosen as best matches:
     best, consumed, alternatives = {}, set(), collections.defaultdict(list)
 
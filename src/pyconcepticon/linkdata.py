@@ -0,0 +1,325 @@
+"""
+Linking data, i.e. the glosses per language linked to Concepticon concept sets, as compiled from
+the concept lists into the map files in <repos>/mappings.
+
+Besides the JSON serialization written by the `dump` command, linking data can be stored in a
+compact binary format, which can be memory-mapped and queried without loading the whole file.
+"""
+import mmap
+import struct
+import typing
+import collections
+
+from csvw.dsv import UnicodeDictReader, UnicodeWriter
+
+from pyconcepticon.models import Languoid
+from pyconcepticon.util import parallel_map
+
+__all__ = [
+    'languages', 'replacements', 'contributions', 'linking_data', 'write_linking_data',
+    'write_mappings', 'read_mappings', 'write_binary', 'LinkingData']
+
+ONTOLOGICAL_CATEGORIES = {
+    'Person/Thing': 'noun',
+    'Other': 'other',
+    'Number': 'numeral',
+    'Action/Process': 'verb',
+    'Property': 'adjective',
+    'Classifier': 'classifier'
+}
+
+#: A mapping of a gloss to a concept set: (CONCEPTICON_ID, CONCEPTICON_GLOSS, priority,
+#: part of speech, flag signaling whether the gloss matched exactly or in lowercase).
+Mapping = typing.Tuple[str, str, int, str, int]
+
+
+def replacements(api):
+    """
+    Find those concept sets that are wrongly linked, they should not go into the mapping, so we
+    just make a re-linker here.
+
+    :returns: `dict` mapping concept set IDs and glosses to the ones to be used instead.
+    """
+    rep = {}
+    for c in api.conceptsets.values():
+        if c.replacement_id:
+            rep[c.id] = c.replacement_id
+            rep[c.gloss] = api.conceptsets[c.replacement_id].gloss
+        else:
+            rep[c.id] = c.id
+            rep[c.gloss] = c.gloss
+    return rep
+
+
+def contributions(clist, langs):
+    """
+    Count the glosses of a concept list's linked concepts.
+
+    :returns: `dict` mapping ISO 639-1 codes to `Counter`s of \
+    (CONCEPTICON_GLOSS, gloss, CONCEPTICON_ID) triples.
+    """
+    res = {lang.iso2: collections.Counter() for lang in langs}
+    for row in clist.concepts.values():
+        if row.concepticon_id:
+            for lang in langs:
+                gls = None
+                if lang.iso2 == "en":
+                    if row.english:
+                        gls = row.english.strip("*$-—+")
+                else:
+                    if lang.name in row.attributes and row.attributes[lang.name]:
+                        gls = row.attributes[lang.name].strip("*$-—+")
+
+                if gls:
+                    res[lang.iso2][row.concepticon_gloss, gls, row.concepticon_id] += 1
+    return res
+
+
+def linking_data(api, lang, counts, rep):
+    """
+    :returns: Sorted `list` of rows of the map file for `lang`.
+    """
+    out, freqs = collections.defaultdict(int), collections.defaultdict(int)
+    for (cgloss, gls, cid), n in counts.items():
+        out[rep[cgloss] + "///" + gls, rep[cid]] += n
+        freqs[rep[cid]] += n
+
+    if lang.iso2 == "en":
+        for cset in api.conceptsets.values():
+            gloss = rep[cset.gloss]
+            cid = rep[cset.id]
+            if cset.ontological_category == "Person/Thing":
+                out[gloss + "///the " + cset.gloss.lower(), cid] = freqs[cid]
+                out[gloss + "///the " + cset.gloss.lower() + "s", cid] = freqs[cid]
+            elif cset.ontological_category == "Action/Process":
+                out[gloss + "///to " + cset.gloss.lower(), cid] = freqs[cid]
+            elif cset.ontological_category == "Property":
+                out[gloss + "///" + cset.gloss.lower() + " (adjective)", cid] = freqs[cid]
+            elif cset.ontological_category == "Classifier":
+                out[gloss + "///" + cset.gloss.lower() + " (classifier)", cid] = freqs[cid]
+            else:
+                out[gloss + "///" + cset.gloss.lower(), cid] = freqs[cid]
+
+    return [[cid, gloss, out[gloss, cid]] for gloss, cid in sorted(out)]
+
+
+def write_linking_data(p, rows):
+    with UnicodeWriter(p, delimiter="\t") as f:
+        f.writerow(["ID", "GLOSS", "PRIORITY"])
+        f.writerows(rows)
+
+
+def languages(api) -> typing.Dict[str, Languoid]:
+    """
+    :returns: `OrderedDict` mapping ISO 639-1 codes to the languages for which map files are \
+    compiled. If two languages share a code, the last one listed determines the map file.
+    """
+    return collections.OrderedDict(
+        (lang.iso2, lang) for lang in api.vocabularies["COLUMN_TYPES"].values()
+        if getattr(lang, "iso2", None))
+
+
+def write_mappings(api, counts, jobs=1):
+    """
+    Write the map files <repos>/mappings/map-<ISO 639-1 code>.tsv.
+
+    :param counts: `dict` mapping ISO 639-1 codes to the sum of the `contributions` of all \
+    concept lists.
+    :param jobs: Number of map files to write in parallel.
+    """
+    langs, rep = languages(api), replacements(api)
+    p = api.path("mappings")
+    if not p.exists():
+        p.mkdir()
+    list(parallel_map(
+        jobs,
+        write_linking_data,
+        [p / "map-{0}.tsv".format(iso2) for iso2 in langs],
+        [linking_data(api, lang, counts[iso2], rep) for iso2, lang in langs.items()]))
+
+
+def read_mappings(api) -> typing.Dict[str, typing.Dict[str, typing.List[Mapping]]]:
+    """
+    :returns: `dict` mapping ISO 639-1 codes of languages to `dict`s mapping glosses to `list`s \
+    of mappings.
+    """
+    paths = {p.stem.split('-')[1]: p for p in api.path('mappings').glob('map-*.tsv')}
+    mappings = {}
+    for language, path in paths.items():
+        mappings[language] = collections.defaultdict(set)
+        with UnicodeDictReader(path, delimiter='\t') as reader:
+            for line in reader:
+                gloss = line['GLOSS'].split('///')[1]
+                oc = ONTOLOGICAL_CATEGORIES.get(
+                    api.conceptsets[line['ID']].ontological_category,
+                    'other')
+                cgl = api.conceptsets[line['ID']].gloss
+                mappings[language][gloss].add(
+                    (line['ID'], cgl, int(line['PRIORITY']), oc, 1))
+            for gloss in list(mappings[language].keys()):
+                if gloss.lower() not in mappings[language]:
+                    mappings[language][gloss.lower()] = set([
+                        (x[0], x[1], x[2], x[3], 0) for x in
+                        mappings[language][gloss]])
+
+    for language, path in paths.items():
+        for k, v in mappings[language].items():
+            mappings[language][k] = sorted(v, key=lambda x: x[1], reverse=True)
+    return mappings
+
+
+# The binary format
+# -----------------
+# All integers are little-endian. Strings are stored once, UTF-8 encoded, in a string table and
+# referenced by (offset, length) into it.
+#
+# - header: magic bytes, version (uint16), number of languages (uint16), offsets of the string
+#   table, the concept set table and the value table (uint64).
+# - language directory: per language the code (string reference), the offset of its key table
+#   (uint64) and the number of keys (uint32).
+# - string table.
+# - concept set table: ID, gloss and part of speech (string references) per concept set.
+# - per language a key table: gloss (string reference), index of its first value and number of
+#   values, sorted by the UTF-8 encoded gloss.
+# - value table: concept set index, priority and the exact match flag.
+MAGIC, VERSION = b'CLNK', 1
+HEADER = struct.Struct('<4sHHQQQ')
+LANGUAGE = struct.Struct('<IIQI')
+CONCEPTSET = struct.Struct('<IIIIII')
+KEY = struct.Struct('<IIII')
+VALUE = struct.Struct('<III')
+
+
+def write_binary(path, mappings: typing.Dict[str, typing.Dict[str, typing.List[Mapping]]]):
+    """
+    Write linking data in the binary format read by `LinkingData`.
+    """
+    strings, blob = {}, bytearray()
+
+    def string(s):
+        if s not in strings:
+            b = s.encode('utf8')
+            strings[s] = (len(blob), len(b))
+            blob.extend(b)
+        return strings[s]
+
+    conceptsets, values, keys = collections.OrderedDict(), bytearray(), []
+    for language in sorted(mappings):
+        table = []
+        for gloss in sorted(mappings[language], key=lambda g: g.encode('utf8')):
+            first = len(values) // VALUE.size
+            for cid, cgl, priority, oc, exact in mappings[language][gloss]:
+                cs = conceptsets.setdefault((cid, cgl, oc), len(conceptsets))
+                values.extend(VALUE.pack(cs, priority, exact))
+            table.append(KEY.pack(
+                *string(gloss), first, len(mappings[language][gloss])))
+        keys.append((string(language), b''.join(table), len(table)))
+
+    cstable = b''.join(
+        CONCEPTSET.pack(*string(cid), *string(cgl), *string(oc)) for cid, cgl, oc in conceptsets)
+    offset = HEADER.size + LANGUAGE.size * len(keys)
+    strings_offset = offset
+    cs_offset = strings_offset + len(blob)
+    offset = cs_offset + len(cstable)
+    directory = []
+    for code, table, n in keys:
+        directory.append(LANGUAGE.pack(*code, offset, n))
+        offset += len(table)
+    with open(path, 'wb') as fp:
+        fp.write(HEADER.pack(MAGIC, VERSION, len(keys), strings_offset, cs_offset, offset))
+        fp.write(b''.join(directory))
+        fp.write(blob)
+        fp.write(cstable)
+        for _, table, _ in keys:
+            fp.write(table)
+        fp.write(values)
+
+
+class LinkingData(object):
+    """
+    Read access to linking data in the binary format written by `write_binary`.
+
+    The file is memory-mapped; looking up a gloss is a binary search in the key table of a
+    language.
+
+    .. code-block:: python
+
+        >>> with LinkingData('linkdata.bin') as ld:
+        ...     ld.lookup('hand', 'en')
+        [('1277', 'HAND', 1, 'noun', 1)]
+    """
+    def __init__(self, path):
+        self._fp, self._data = open(path, 'rb'), None
+        try:
+            # Note: Empty files cannot be mapped, and too short files cannot be unpacked.
+            self._data = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, nlanguages, self._strings, self._conceptsets, self._values = \
+                HEADER.unpack_from(self._data, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError('invalid magic number or version')
+            self.languages = collections.OrderedDict()
+            for i in range(nlanguages):
+                offset, length, keys, nkeys = LANGUAGE.unpack_from(
+                    self._data, HEADER.size + i * LANGUAGE.size)
+                self.languages[self._string(offset, length)] = (keys, nkeys)
+        except (ValueError, struct.error) as e:
+            self.close()
+            raise ValueError('invalid linking data file {0}'.format(path)) from e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+        self._fp.close()
+
+    def _bytes(self, offset, length):
+        return self._data[self._strings + offset:self._strings + offset + length]
+
+    def _string(self, offset, length):
+        return self._bytes(offset, length).decode('utf8')
+
+    def _key(self, language, i):
+        offset, nkeys = self.languages[language]
+        return KEY.unpack_from(self._data, offset + i * KEY.size)
+
+    def _conceptset(self, i):
+        refs = CONCEPTSET.unpack_from(self._data, self._conceptsets + i * CONCEPTSET.size)
+        return tuple(self._string(refs[j], refs[j + 1]) for j in range(0, 6, 2))
+
+    def keys(self, language: str) -> typing.Generator[str, None, None]:
+        """
+        :returns: Glosses of a language, in the order of their UTF-8 encoding.
+        """
+        for i in range(self.languages[language][1]):
+            yield self._string(*self._key(language, i)[:2])
+
+    def lookup(self, gloss: str, language: str = 'en') -> typing.List[Mapping]:
+        """
+        :returns: `list` of mappings for a gloss - empty if the gloss is unknown.
+        """
+        if language not in self.languages:
+            raise KeyError(language)
+        target = gloss.encode('utf8')
+        lo, hi = 0, self.languages[language][1]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bytes(*self._key(language, mid)[:2]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.languages[language][1]:
+            return []
+        offset, length, first, nvalues = self._key(language, lo)
+        if self._bytes(offset, length) != target:
+            return []
+        res = []
+        for i in range(first, first + nvalues):
+            cs, priority, exact = VALUE.unpack_from(self._data, self._values + i * VALUE.size)
+            cid, cgl, oc = self._conceptset(cs)
+            res.append((cid, cgl, priority, oc, exact))
+        return res
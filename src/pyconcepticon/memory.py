@@ -0,0 +1,111 @@
+"""
+Measure the memory retained by the data structures of the `Concepticon` API, using `tracemalloc`.
+
+Structures are loaded one after the other. The memory attributed to a structure is the traced
+memory still allocated after loading it minus the traced memory allocated before, i.e. data shared
+with structures loaded before - like concept sets referenced by concepts - is not counted again.
+"""
+import gc
+import typing
+import tracemalloc
+import collections
+
+__all__ = ['STRUCTURES', 'Measurement', 'MemoryReport', 'measure']
+
+#: The structures which are measured, in the order of loading.
+STRUCTURES = ['conceptsets', 'relations', 'bibliography', 'conceptlists', 'concepts', 'mappings']
+
+#: Memory (in bytes) retained after loading an item of a structure - e.g. the concepts of one
+#: concept list - and the peak memory while loading it (or `None` if this cannot be determined).
+Measurement = collections.namedtuple('Measurement', ['structure', 'item', 'retained', 'peak'])
+
+
+def _loaders(api):
+    yield 'conceptsets', '', lambda: api.conceptsets
+    yield 'relations', '', lambda: api.relations
+    yield 'bibliography', '', lambda: api.bibliography
+    yield 'conceptlists', '', lambda: api.conceptlists
+    for cl in api.conceptlists.values():
+        yield 'concepts', cl.id, lambda cl=cl: cl.concepts
+    for p in sorted(api.path('mappings').glob('map-*.tsv')):
+        language = p.stem.split('-')[1]
+        yield 'mappings', language, \
+            lambda language=language: api._get_map_for_language(language)
+
+
+class MemoryReport(object):
+    """
+    :ivar measurements: `list` of `Measurement`s.
+    :ivar allocations: `list` of `tracemalloc.Statistic`s of the source lines which allocated \
+    the most memory still retained after loading all structures.
+    """
+    def __init__(self, measurements, allocations):
+        self.measurements = measurements
+        self.allocations = allocations
+
+    def structures(self) -> typing.List[typing.Tuple[str, int, int, typing.Optional[int]]]:
+        """
+        :returns: `list` of (structure, number of items, retained, peak) tuples, sorted by \
+        retained memory.
+        """
+        res = collections.OrderedDict()
+        for m in self.measurements:
+            items, retained, peak = res.get(m.structure, (0, 0, 0))
+            res[m.structure] = (
+                items + 1,
+                retained + m.retained,
+                None if m.peak is None or peak is None else max(peak, m.peak))
+        return sorted(((k,) + v for k, v in res.items()), key=lambda r: -r[2])
+
+    def top(self, structure: str, n: int = 10) -> typing.List[Measurement]:
+        """
+        :returns: The `n` items of `structure` retaining the most memory.
+        """
+        return sorted(
+            (m for m in self.measurements if m.structure == structure),
+            key=lambda m: -m.retained)[:n]
+
+    @property
+    def total(self) -> int:
+        return sum(m.retained for m in self.measurements)
+
+
+def measure(api, structures=None, top=10) -> MemoryReport:
+    """
+    Load and measure the structures of a `Concepticon` instance.
+
+    .. note:: Only data which has not yet been loaded by `api` can be measured - so a fresh \
+    instance should be passed.
+
+    :param structures: Names of structures to measure - defaulting to all of `STRUCTURES`. \
+    Structures required to load these are loaded, but not measured.
+    :param top: Number of allocation sites to report.
+    """
+    structures = structures or STRUCTURES
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        gc.collect()
+        res = []
+        for structure, item, load in _loaders(api):
+            if structure not in structures:
+                continue
+            before = tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc, 'reset_peak'):  # Python >= 3.9
+                tracemalloc.reset_peak()
+            load()
+            current, peak = tracemalloc.get_traced_memory()
+            res.append(Measurement(
+                structure,
+                item,
+                current - before,
+                peak - before if hasattr(tracemalloc, 'reset_peak') else None))
+        allocations = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ]).statistics('lineno')[:top]
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    return MemoryReport(res, allocations)
@@ -4,18 +4,20 @@ import operator
 import warnings
 import functools
 import collections
+import collections.abc
 
 import attr
 from clldutils.apilib import DataObject
 from clldutils.jsonlib import load
+from clldutils.path import md5
 from csvw.dsv import reader
 from csvw.metadata import TableGroup, Link
 
-from pyconcepticon.util import split, split_ids, read_dicts, to_dict
+from pyconcepticon.util import split, split_ids, read_dicts, to_dict, timed_property
 
 __all__ = [
     'Languoid', 'Concept', 'Conceptlist', 'ConceptRelations', 'Conceptset', 'Metadata',
-    'REF_PATTERN', 'MD_SUFFIX']
+    'RelationStore', 'RelationGraph', 'REF_PATTERN', 'MD_SUFFIX']
 
 CONCEPTLIST_ID_PATTERN = re.compile(
     '(?P<author>[A-Za-z]+)-(?P<year>[0-9]+)-(?P<items>[0-9]+)(?P<letter>[a-z]?)$')
@@ -96,11 +98,15 @@ class Conceptset(Bag):
         if self._api and self.replacement_id:
             return self._api.conceptsets[self.replacement_id]
 
+    @property
+    def timings(self):
+        return getattr(self._api, 'timings', None)
+
     @functools.cached_property
     def relations(self):
         return self._api.relations.get(self.id, {}) if self._api else {}
 
-    @functools.cached_property
+    @timed_property
     def concepts(self):
         res = []
         if self._api:
@@ -131,31 +137,197 @@ _INVERSE_RELATIONS = {'broader': 'narrower'}
 _INVERSE_RELATIONS.update({v: k for k, v in _INVERSE_RELATIONS.items()})
 
 
+class RelationGraph(object):
+    """
+    Concept relations compiled into integer-indexed adjacency lists, one per relation type.
+
+    :ivar nodes: `list` of concepts, i.e. mapping node index to concept.
+    :ivar index: `dict` mapping concept to node index.
+    :ivar adjacency: `dict` mapping relation to a `list` of `tuple`s of target node indices \
+    per source node index.
+    """
+    def __init__(self, edges):
+        """
+        :param edges: iterable of (source, target, relation) triples.
+        """
+        self.nodes, self.index = [], {}
+        adjacency = collections.defaultdict(lambda: collections.defaultdict(list))
+        for source, target, relation in edges:
+            adjacency[relation][self._node(source)].append(self._node(target))
+        self.adjacency = {
+            relation: [tuple(targets.get(i, ())) for i in range(len(self.nodes))]
+            for relation, targets in adjacency.items()}
+        self._closures = {}
+
+    def _node(self, concept):
+        if concept not in self.index:
+            self.index[concept] = len(self.nodes)
+            self.nodes.append(concept)
+        return self.index[concept]
+
+    def _bfs(self, node, relation, max_depth):
+        adjacency = self.adjacency.get(relation)
+        if not adjacency:
+            return
+        queue = collections.deque([(node, 0)])
+        while queue:
+            current, depth = queue.popleft()
+            depth += 1
+            if depth > max_depth:
+                continue
+            for target in adjacency[current]:
+                queue.append((target, depth))
+                yield target, depth
+
+    def precompute(self, relation, max_depth):
+        """
+        Compute the transitive closure of `relation` up to `max_depth` for all nodes.
+        """
+        if (relation, max_depth) not in self._closures:
+            self._closures[relation, max_depth] = [
+                tuple(self._bfs(i, relation, max_depth)) for i in range(len(self.nodes))]
+        return self._closures[relation, max_depth]
+
+    def related(self, concept, relation, max_depth):
+        """
+        :returns: `list` of (concept, depth) pairs of concepts related to `concept`.
+        """
+        if concept not in self.index:
+            return []
+        node = self.index[concept]
+        if (relation, max_depth) in self._closures:
+            related = self._closures[relation, max_depth][node]
+        else:
+            related = self._bfs(node, relation, max_depth)
+        return [(self.nodes[i], depth) for i, depth in related]
+
+
+class RelationStore(object):
+    """
+    The rows of a conceptrelations.tsv file, read once and shared between `ConceptRelations`.
+    """
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self.raw = read_dicts(self.path)
+
+    @functools.cached_property
+    def glosses(self):
+        """
+        `dict` mapping CONCEPTICON_ID to CONCEPTICON_GLOSS of related concepts.
+        """
+        res = {}
+        for item in self.raw:
+            res[item['SOURCE']] = item['SOURCE_GLOSS']
+            res[item['TARGET']] = item['TARGET_GLOSS']
+        return res
+
+    @functools.cached_property
+    def index(self):
+        """
+        Pair (relations, multiple) where `relations` maps concepts - keyed by CONCEPTICON_ID and \
+        by CONCEPTICON_GLOSS - to `dict`s mapping related concepts to the relation listed last, \
+        and `multiple` maps the pairs of concepts with more than one relation to the `set` of \
+        relations.
+        """
+        rels, multiple = collections.defaultdict(dict), collections.defaultdict(set)
+
+        def add(source, target, relation):
+            if target in rels[source]:
+                multiple[source, target].add(rels[source][target])
+                multiple[source, target].add(relation)
+            rels[source][target] = relation
+
+        for item in self.raw:
+            for source, target in [('SOURCE', 'TARGET'), ('SOURCE_GLOSS', 'TARGET_GLOSS')]:
+                add(item[source], item[target], item['RELATION'])
+            if item['RELATION'] in _INVERSE_RELATIONS:
+                for source, target in [('SOURCE', 'TARGET'), ('SOURCE_GLOSS', 'TARGET_GLOSS')]:
+                    add(item[target], item[source], _INVERSE_RELATIONS[item['RELATION']])
+        return dict(rels), {k: v for k, v in multiple.items() if len(v) > 1}
+
+
+class _MultipleRelations(collections.abc.Mapping):
+    """
+    Read-only view on the related concepts of a concept in `RelationStore.index`, mapping each
+    related concept to the `set` of relations.
+    """
+    __slots__ = ['_concept', '_targets', '_multiple']
+
+    def __init__(self, concept, targets, multiple):
+        self._concept, self._targets, self._multiple = concept, targets, multiple
+
+    def __getitem__(self, target):
+        return set(self._multiple.get((self._concept, target), [self._targets[target]]))
+
+    def __iter__(self):
+        return iter(self._targets)
+
+    def __len__(self):
+        return len(self._targets)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
 class ConceptRelations(dict):
     """
     Class handles relations between concepts.
+
+    Relations are accessible keyed by CONCEPTICON_ID and by CONCEPTICON_GLOSS.
+
+    .. note:: All `ConceptRelations` sharing a `RelationStore` are views on the same index. With \
+       `multiple=False` related concepts are mapped to the relation listed last in the data; \
+       with `multiple=True` to `set`s of relations, through read-only mappings.
     """
     def __init__(self, path, multiple=False):
-        rels = collections.defaultdict(lambda: collections.defaultdict(set))
-        self.raw = list(read_dicts(path))
-        for item in self.raw:
-            if multiple:
-                rels[item['SOURCE']][item['TARGET']].add(item['RELATION'])
-                rels[item['SOURCE_GLOSS']][item['TARGET_GLOSS']].add(item['RELATION'])
-                if item['RELATION'] in _INVERSE_RELATIONS:
-                    rels[item['TARGET']][item['SOURCE']].add(
-                        _INVERSE_RELATIONS[item['RELATION']])
-                    rels[item['TARGET_GLOSS']][item['SOURCE_GLOSS']].add(
-                        _INVERSE_RELATIONS[item['RELATION']])
-            else:
-                rels[item['SOURCE']][item['TARGET']] = item['RELATION']
-                rels[item['SOURCE_GLOSS']][item['TARGET_GLOSS']] = item['RELATION']
-                if item['RELATION'] in _INVERSE_RELATIONS:
-                    rels[item['TARGET']][item['SOURCE']] = \
-                        _INVERSE_RELATIONS[item['RELATION']]
-                    rels[item['TARGET_GLOSS']][item['SOURCE_GLOSS']] = \
-                        _INVERSE_RELATIONS[item['RELATION']]
-        dict.__init__(self, rels.items())
+        """
+        :param path: Path of a conceptrelations.tsv file or a `RelationStore` to share.
+        :param multiple: Flag signaling whether to store sets of relations per pair of concepts.
+        """
+        self.store = path if isinstance(path, RelationStore) else RelationStore(path)
+        rels, multi = self.store.index
+        if multiple:
+            dict.__init__(
+                self, ((k, _MultipleRelations(k, v, multi)) for k, v in rels.items()))
+        else:
+            dict.__init__(self, rels)
+
+    @property
+    def raw(self):
+        return self.store.raw
+
+    @property
+    def glosses(self):
+        return self.store.glosses
+
+    @functools.cached_property
+    def graph(self):
+        """
+        The ID-keyed relations compiled into a `RelationGraph`.
+        """
+        def edges():
+            for source in self.glosses:
+                for target, rels in self.get(source, {}).items():
+                    for rel in (rels if isinstance(rels, set) else [rels]):
+                        yield source, target, rel
+
+        return RelationGraph(edges())
+
+    def _related(self, concept, relation, max_degree_of_separation):
+        if concept in self.glosses:
+            return self.graph.related(concept, relation, max_degree_of_separation)
+        # We may be passed a CONCEPTICON_GLOSS. Since the gloss-keyed relations are not
+        # compiled, we search the nested dicts.
+        res, queue = [], collections.deque([(concept, 0)])
+        while queue:
+            current_concept, depth = queue.popleft()
+            depth += 1
+            for target, rels in self.get(current_concept, {}).items():
+                if (relation == rels or relation in (rels if isinstance(rels, set) else [])) \
+                        and depth <= max_degree_of_separation:
+                    queue.append((target, depth))
+                    res.append((target, depth))
+        return res
 
     def iter_related(self, concept, relation, max_degree_of_separation=2):
         """
@@ -166,14 +338,27 @@ class ConceptRelations(dict):
         :param relation: the concept relation to be searched (currently only "broader" and \
         "narrower")
         """
-        queue = collections.deque([(concept, 0)])
-        while queue:
-            current_concept, depth = queue.popleft()
-            depth += 1
-            for target, rels in self.get(current_concept, {}).items():
-                if (relation in rels or relation == rels) and depth <= max_degree_of_separation:
-                    queue.append((target, depth))
-                    yield target, depth
+        yield from self._related(concept, relation, max_degree_of_separation)
+
+    def precompute(self, relation, max_degree_of_separation=2):
+        """
+        Precompute the transitive closure of a relation for all concepts, to speed up subsequent
+        calls of `iter_related` and `related_many` with the same arguments.
+        """
+        self.graph.precompute(relation, max_degree_of_separation)
+
+    def related_many(self, concepts, relation, max_degree_of_separation=2):
+        """
+        Search for concept relations of many concepts at once.
+
+        :returns: `dict` mapping each concept to the `list` of (concept, depth) pairs, \
+        `iter_related` would yield.
+        """
+        concepts = list(concepts)
+        if len(concepts) > len(self.graph.nodes) / 2:
+            # For big batches, computing the closure for all concepts is cheaper.
+            self.precompute(relation, max_degree_of_separation)
+        return {c: self._related(c, relation, max_degree_of_separation) for c in concepts}
 
 
 @attr.s
@@ -217,7 +402,10 @@ class Conceptlist(Bag):
     local = attr.ib(default=False)
 
     @functools.cached_property
-    def tg(self):
+    def metadata_path(self):
+        """
+        Path of the CSVW metadata describing the list - specific to the list or shared.
+        """
         md = self.path.parent.joinpath(self.path.name + MD_SUFFIX)
         if not md.exists():
             if hasattr(self._api, 'repos'):
@@ -228,6 +416,26 @@ class Conceptlist(Bag):
                     md = ddir.joinpath('conceptlists', 'default' + MD_SUFFIX)
             else:
                 md = pathlib.Path(__file__).parent / 'conceptlist-metadata.json'
+        return md
+
+    def content_hash(self):
+        """
+        :returns: Hash of the data of the list and its metadata, e.g. to key cached data derived \
+        from the list.
+        """
+        return ' '.join(md5(p) for p in [self.path, self.metadata_path])
+
+    @property
+    def timings(self):
+        return getattr(self._api, 'timings', None)
+
+    @property
+    def counters(self):
+        return getattr(self._api, 'counters', None)
+
+    @timed_property
+    def tg(self):
+        md = self.metadata_path
         metadata = load(md)
         metadata['tables'][0]['url'] = 'u'
         tg = TableGroup.from_file(md, data=metadata)
@@ -256,7 +464,7 @@ class Conceptlist(Bag):
         return [c.name for c in self.metadata.tableSchema.columns
                 if c.name.lower() not in Concept.public_fields()]
 
-    @functools.cached_property
+    @timed_property
     def concepts(self):
         res = []
         if self.path.exists():
@@ -267,6 +475,12 @@ class Conceptlist(Bag):
                         kl = k.lower()
                         operator.setitem(kw if kl in Concept.public_fields() else attributes, kl, v)
                 res.append(Concept(list=self, attributes=attributes, **kw))
+            if self.counters is not None:
+                self.counters.update(
+                    conceptlists_loaded_total=1,
+                    concepts_materialized_total=len(res),
+                    files_read_total=1,
+                    bytes_read_total=self.path.stat().st_size)
         return to_dict(res)
 
     @classmethod
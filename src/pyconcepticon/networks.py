@@ -0,0 +1,343 @@
+"""
+Access to the concept networks stored in the *_CONCEPTS columns of concept lists.
+
+Each cell of such a column holds a JSON array of objects, specifying linked concepts by `ID`
+and `NAME`, and the properties of the link - typically numeric weights.
+"""
+import json
+import math
+import array
+import struct
+import typing
+import functools
+import itertools
+import collections
+import collections.abc
+
+from pyconcepticon.models import CONCEPT_NETWORK_COLUMNS
+from pyconcepticon.util import CS_ID, read_dicts
+
+__all__ = [
+    'Edge', 'EdgeTable', 'ConceptNetworks', 'iter_edges', 'BinaryEdgeWriter', 'read_binary_edges']
+
+#: An edge of a concept network. `source` and `target` are concept IDs, `line` is the line number
+#: of the row in which the edge is specified, `weights` is a `dict` of numeric properties.
+Edge = collections.namedtuple(
+    'Edge',
+    ['conceptlist', 'column', 'line',
+     'source', 'source_name', 'target', 'target_name', 'directed', 'weights'])
+
+
+def concept_name(row):
+    return row.get('ENGLISH', row.get('GLOSS'))
+
+
+def iter_edges(rows, conceptlist='', columns=None, threshold=None, raw=False):
+    """
+    Parse the network columns of concept list rows.
+
+    Edges in SOURCE_CONCEPTS columns are reversed, i.e. the linked concept becomes the source of
+    the edge.
+
+    :param rows: iterable of (line number, row `dict`) pairs.
+    :param columns: names of the columns to parse, defaulting to `CONCEPT_NETWORK_COLUMNS`.
+    :param threshold: optional pair (weight, minimum) - edges with a smaller (or missing) weight \
+    are skipped while parsing.
+    :param raw: If `True`, edges are returned as specified in the data, i.e. from the concept of \
+    the row to the linked concept - also in SOURCE_CONCEPTS columns - with all properties of the \
+    link - not only the numeric ones - as `weights`.
+    """
+    columns = list(CONCEPT_NETWORK_COLUMNS) if columns is None else columns
+    for line, row in rows:
+        for column in columns:
+            cell = row.get(column)
+            if not cell:
+                continue
+            directed = CONCEPT_NETWORK_COLUMNS.get(column, False)
+            for node in json.loads(cell):
+                weights = {
+                    k: v for k, v in node.items()
+                    if (raw or isinstance(v, (int, float))) and k not in ('ID', 'NAME')}
+                if threshold:
+                    value = weights.get(threshold[0])
+                    if not isinstance(value, (int, float)) or value < threshold[1]:
+                        continue
+                edge = [row.get('ID'), concept_name(row), node.get('ID'), node.get('NAME')]
+                if column == 'SOURCE_CONCEPTS' and not raw:
+                    edge = edge[2:] + edge[:2]
+                yield Edge(conceptlist, column, line, *edge, directed, weights)
+
+
+class EdgeTable(object):
+    """
+    A table of concept network edges, stored column-wise.
+
+    Weights are stored as `array`s of floats, with NaN marking missing values, which makes
+    filtering by weight a simple operation on one column.
+    """
+    columns = [
+        'conceptlist', 'column', 'line',
+        'source', 'source_name', 'target', 'target_name',
+        'source_concepticon_id', 'target_concepticon_id']
+
+    def __init__(self):
+        for col in self.columns:
+            setattr(self, col, array.array('l') if col == 'line' else [])
+        self.directed = array.array('b')
+        self.weights = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.directed)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        return Edge(
+            self.conceptlist[i],
+            self.column[i],
+            self.line[i],
+            self.source[i],
+            self.source_name[i],
+            self.target[i],
+            self.target_name[i],
+            bool(self.directed[i]),
+            {k: v[i] for k, v in self.weights.items() if not math.isnan(v[i])})
+
+    def append(self, edge: Edge, source_concepticon_id='', target_concepticon_id=''):
+        for col in self.columns[:7]:
+            getattr(self, col).append(getattr(edge, col))
+        self.source_concepticon_id.append(source_concepticon_id)
+        self.target_concepticon_id.append(target_concepticon_id)
+        self.directed.append(edge.directed)
+        for k in edge.weights:
+            if k not in self.weights:
+                self.weights[k] = array.array('d', itertools.repeat(math.nan, len(self) - 1))
+        for k, v in self.weights.items():
+            v.append(edge.weights.get(k, math.nan))
+
+    @classmethod
+    def from_rows(cls, rows: typing.Iterable[dict], conceptlist='', **kw) -> 'EdgeTable':
+        """
+        Create an `EdgeTable` from the rows of a concept list.
+
+        :param rows: iterable of row `dict`s or of (line number, row `dict`) pairs.
+        """
+        rows = [r if isinstance(r, tuple) else (i, r) for i, r in enumerate(rows, start=2)]
+        cids = {row.get('ID'): row.get(CS_ID) or '' for _, row in rows}
+        res = cls()
+        for edge in iter_edges(rows, conceptlist=conceptlist, **kw):
+            res.append(edge, cids.get(edge.source, ''), cids.get(edge.target, ''))
+        return res
+
+    @classmethod
+    def from_file(cls, path, conceptlist=None, **kw) -> 'EdgeTable':
+        return cls.from_rows(read_dicts(path), conceptlist=conceptlist or path.stem, **kw)
+
+    @classmethod
+    def concat(cls, tables: typing.Iterable['EdgeTable']) -> 'EdgeTable':
+        res = cls()
+        for table in tables:
+            for i, edge in enumerate(table):
+                res.append(
+                    edge, table.source_concepticon_id[i], table.target_concepticon_id[i])
+        return res
+
+    def select(self, mask: typing.Iterable[bool]) -> 'EdgeTable':
+        """
+        :returns: A new `EdgeTable` with the edges for which `mask` is true.
+        """
+        mask = list(mask)
+        res = self.__class__()
+        for col in self.columns:
+            getattr(res, col).extend(itertools.compress(getattr(self, col), mask))
+        res.directed.extend(itertools.compress(self.directed, mask))
+        for k, v in self.weights.items():
+            res.weights[k] = array.array('d', itertools.compress(v, mask))
+        return res
+
+    def where(self, weight: str, minimum=None, maximum=None) -> 'EdgeTable':
+        """
+        Filter edges by weight. Edges without the weight are dropped.
+        """
+        values = self.weights.get(weight, array.array('d', itertools.repeat(math.nan, len(self))))
+        return self.select(
+            (not math.isnan(v))
+            and (minimum is None or v >= minimum)
+            and (maximum is None or v <= maximum)
+            for v in values)
+
+    def aggregate(self, func=sum) -> 'EdgeTable':
+        """
+        Merge edges linking the same pair of Concepticon concept sets.
+
+        Edges with unlinked source or target are dropped. Undirected edges are merged regardless of
+        their direction. The weights of merged edges are aggregated with `func` - skipping
+        missing values - and the number of merged edges is stored as weight `OCCURRENCES`.
+
+        :returns: `EdgeTable` with CONCEPTICON_IDs as `source` and `target`.
+        """
+        groups = collections.OrderedDict()
+        for i in range(len(self)):
+            s, t = self.source_concepticon_id[i], self.target_concepticon_id[i]
+            if not (s and t):
+                continue
+            if not self.directed[i] and t < s:
+                s, t = t, s
+            groups.setdefault((s, t, self.directed[i]), []).append(i)
+
+        res = self.__class__()
+        for (s, t, directed), indices in groups.items():
+            weights = {}
+            for k, v in self.weights.items():
+                values = [v[i] for i in indices if not math.isnan(v[i])]
+                if values:
+                    weights[k] = func(values)
+            weights['OCCURRENCES'] = len(indices)
+            res.append(
+                Edge(
+                    ' '.join(sorted(set(self.conceptlist[i] for i in indices))),
+                    self.column[indices[0]],
+                    0,
+                    s,
+                    None,
+                    t,
+                    None,
+                    bool(directed),
+                    weights),
+                s,
+                t)
+        return res
+
+
+class ConceptNetworks(collections.abc.Mapping):
+    """
+    `Mapping` of IDs of concept lists with network columns to the `EdgeTable` of their edges.
+
+    Edge tables are parsed lazily, once per list.
+    """
+    def __init__(self, api):
+        self._api = api
+        self._tables = {}
+
+    @functools.cached_property
+    def _ids(self):
+        return [
+            clid for clid, cl in self._api.conceptlists.items()
+            if cl.path.exists() and any(c in CONCEPT_NETWORK_COLUMNS for c in cl.cols_in_list)]
+
+    def __getitem__(self, clid):
+        if clid not in self._tables:
+            if clid not in self._ids:
+                raise KeyError(clid)
+            self._tables[clid] = EdgeTable.from_file(
+                self._api.conceptlists[clid].path, conceptlist=clid)
+        return self._tables[clid]
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def edges(self, *clids) -> EdgeTable:
+        """
+        :returns: `EdgeTable` with the edges of all (or the specified) concept lists.
+        """
+        return EdgeTable.concat(self[clid] for clid in (clids or self))
+
+    def aggregate(self, *clids, **kw) -> EdgeTable:
+        """
+        :returns: `EdgeTable` with edges across concept lists merged by CONCEPTICON_ID.
+        """
+        return self.edges(*clids).aggregate(**kw)
+
+
+class BinaryEdgeWriter(object):
+    """
+    Writes edges to a compact binary edge list, without buffering the edges in memory.
+
+    The format is
+
+    - the magic bytes `CEDG`, a format version and the names of the weights,
+    - one fixed-size record per edge: source and target node index (uint32), directedness \
+      (uint8) and one float64 per weight (NaN for missing values),
+    - the node table, i.e. ID and name per node,
+    - the offset of the node table (uint64).
+
+    All integers are little-endian; strings are UTF-8 encoded, prefixed with their length as \
+    uint16.
+    """
+    magic, version = b'CEDG', 1
+
+    def __init__(self, path, weights):
+        self.path = path
+        self.weights = list(weights)
+        self.record = struct.Struct('<IIB' + len(self.weights) * 'd')
+        self.nodes = {}
+        self._fp = None
+
+    @staticmethod
+    def _string(s):
+        s = (s or '').encode('utf8')
+        return struct.pack('<H', len(s)) + s
+
+    def _node(self, id_, name):
+        if id_ not in self.nodes:
+            self.nodes[id_] = (len(self.nodes), name)
+        return self.nodes[id_][0]
+
+    def __enter__(self):
+        self._fp = open(self.path, 'wb')
+        self._fp.write(self.magic + struct.pack('<HH', self.version, len(self.weights)))
+        for w in self.weights:
+            self._fp.write(self._string(w))
+        return self
+
+    def write(self, edge):
+        self._fp.write(self.record.pack(
+            self._node(edge.source, edge.source_name),
+            self._node(edge.target, edge.target_name),
+            bool(edge.directed),
+            *[edge.weights.get(w, math.nan) for w in self.weights]))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        offset = self._fp.tell()
+        self._fp.write(struct.pack('<I', len(self.nodes)))
+        for id_, (_, name) in self.nodes.items():
+            self._fp.write(self._string(id_) + self._string(name))
+        self._fp.write(struct.pack('<Q', offset))
+        self._fp.close()
+
+
+def read_binary_edges(path) -> typing.Generator[Edge, None, None]:
+    """
+    Read edges from a file written by `BinaryEdgeWriter`.
+    """
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    assert data[:4] == BinaryEdgeWriter.magic, 'invalid binary edge list'
+    _, nweights = struct.unpack_from('<HH', data, 4)
+    pos, weights = 8, []
+
+    def string(pos):
+        n, = struct.unpack_from('<H', data, pos)
+        return data[pos + 2:pos + 2 + n].decode('utf8'), pos + 2 + n
+
+    for _ in range(nweights):
+        w, pos = string(pos)
+        weights.append(w)
+    offset, = struct.unpack_from('<Q', data, len(data) - 8)
+    nnodes, = struct.unpack_from('<I', data, offset)
+    nodes, npos = [], offset + 4
+    for _ in range(nnodes):
+        id_, npos = string(npos)
+        name, npos = string(npos)
+        nodes.append((id_, name))
+
+    for s, t, directed, *values in struct.iter_unpack(
+            '<IIB' + nweights * 'd', data[pos:offset]):
+        yield Edge(
+            '', '', 0, *nodes[s], *nodes[t], bool(directed),
+            {w: v for w, v in zip(weights, values) if not math.isnan(v)})
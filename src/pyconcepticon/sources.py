@@ -0,0 +1,104 @@
+"""
+Backends to upload source PDFs to, see the `upload_sources` command.
+
+A backend is a context manager with methods `upload`, returning the uploaded file as
+`cdstarcat.catalog.Object`, and `url`, returning the URL under which an uploaded file can be
+accessed. `upload` must be thread-safe.
+"""
+import shutil
+import pathlib
+import threading
+import mimetypes
+
+from cdstarcat.catalog import Catalog, Object, Bitstream
+from clldutils.path import md5
+from pycdstar.media import File
+
+__all__ = ['CdstarBackend', 'LocalBackend']
+
+
+class Backend(object):
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def upload(self, path: pathlib.Path) -> Object:
+        raise NotImplementedError()  # pragma: no cover
+
+    def url(self, obj: Object) -> str:
+        raise NotImplementedError()  # pragma: no cover
+
+
+class CdstarBackend(Backend):
+    """
+    Uploads to a CDSTAR instance, registering objects in a cdstarcat catalog.
+
+    Like `Catalog.create`, files are only uploaded if the catalog has no object with the same
+    MD5 hash. Uploads run concurrently, while the catalog is only accessed under a lock, and files
+    with the same content are uploaded one after the other - so they are uploaded only once.
+    """
+    def __init__(self, catalog, cdstar_url, cdstar_user, cdstar_pwd):
+        self.catalog = Catalog(
+            pathlib.Path(catalog),
+            cdstar_url=cdstar_url,
+            cdstar_user=cdstar_user,
+            cdstar_pwd=cdstar_pwd)
+        self._lock = threading.Lock()
+        self._md5_locks = {}
+
+    def __enter__(self):
+        self.catalog.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.catalog.__exit__(exc_type, exc_val, exc_tb)
+
+    def upload(self, path):
+        file_ = File(path)
+        with self._lock:
+            md5_lock = self._md5_locks.setdefault(file_.md5, threading.Lock())
+        with md5_lock:
+            with self._lock:
+                existing = self.catalog.md5_to_object.get(file_.md5)
+            if existing:
+                return existing[0]
+            obj, md, _ = file_.create_object(self.catalog.api, {"collection": "concepticon"})
+            with self._lock:
+                return self.catalog.add(obj, metadata=md)
+
+    def url(self, obj):  # pragma: no cover
+        return 'https://cdstar.eva.mpg.de/bitstreams/{0}/{1}'.format(
+            obj.id, obj.bitstreams[0].id)
+
+
+class LocalBackend(Backend):
+    """
+    Stores uploads in a local directory, e.g. as stand-in for CDSTAR in tests and benchmarks.
+
+    Objects are identified by the MD5 hash of the file.
+    """
+    def __init__(self, directory):
+        self.directory = pathlib.Path(directory)
+
+    def __enter__(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return self
+
+    def upload(self, path):
+        checksum = md5(path)
+        target = self.directory / checksum / path.name
+        target.parent.mkdir(exist_ok=True)
+        shutil.copy(str(path), str(target))
+        stat = target.stat()
+        return Object(
+            checksum,
+            [Bitstream(
+                path.name,
+                stat.st_size,
+                mimetypes.guess_type(path.name)[0] or 'application/octet-stream',
+                checksum,
+                stat.st_mtime * 1e3,
+                stat.st_mtime * 1e3)],
+            {"collection": "concepticon"})
+
+    def url(self, obj):
+        return (self.directory / obj.id / obj.bitstreams[0].id).resolve().as_uri()
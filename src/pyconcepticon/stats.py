@@ -0,0 +1,133 @@
+"""
+Statistics on the concept lists in Concepticon, aggregated in one pass over the catalog.
+"""
+import heapq
+import typing
+import functools
+import collections
+
+from clldutils import jsonlib
+
+__all__ = ['ConceptlistStats', 'CatalogStats']
+
+CACHE_VERSION = 1
+
+
+class ConceptlistStats(
+        collections.namedtuple('ConceptlistStats', ['id', 'filename', 'concepts', 'mapped'])):
+    """
+    Statistics of one concept list.
+
+    :ivar concepts: Number of concepts in the list.
+    :ivar mapped: `list` of (CONCEPTICON_ID, CONCEPTICON_GLOSS, label) triples of mapped concepts.
+    """
+    @classmethod
+    def from_conceptlist(cls, cl) -> 'ConceptlistStats':
+        return cls(
+            cl.id,
+            cl.path.name,
+            len(cl.concepts),
+            [(c.concepticon_id, c.concepticon_gloss, c.label)
+             for c in cl.concepts.values() if c.concepticon_id])
+
+    @property
+    def mapped_ratio(self) -> int:
+        return int((len(self.mapped) / self.concepts) * 100) if self.concepts else 0
+
+    @property
+    def mergers(self) -> typing.List[typing.Tuple[str, int]]:
+        """
+        Concept sets to which more than one concept of the list is mapped, with the number of
+        concepts.
+        """
+        counts = collections.Counter(cid for cid, _, _ in self.mapped)
+        return [(k, v) for k, v in counts.items() if v > 1]
+
+
+class CatalogStats(object):
+    """
+    Statistics aggregated over concept lists.
+
+    :ivar conceptlists: `list` of `ConceptlistStats`.
+    :ivar conceptsets: `OrderedDict` mapping CONCEPTICON_GLOSS to `list`s of (concept list ID, \
+    label) pairs of the concepts mapped to the concept set.
+    :ivar labels: `Counter` of labels of mapped concepts.
+    """
+    def __init__(self, conceptlists: typing.Iterable[ConceptlistStats]):
+        self.conceptlists = list(conceptlists)
+        self.conceptsets = collections.OrderedDict()
+        self.labels = collections.Counter()
+        for cl in self.conceptlists:
+            for _, gloss, label in cl.mapped:
+                self.conceptsets.setdefault(gloss, []).append((cl.id, label))
+                self.labels[label] += 1
+
+    @classmethod
+    def from_api(cls, api, cache=None) -> 'CatalogStats':
+        """
+        :param cache: Path of a JSON file to cache statistics per concept list in, keyed by the \
+        content hash of the list. Only lists which changed since the cache was written are read.
+        """
+        if cache is None:
+            return cls(ConceptlistStats.from_conceptlist(cl) for cl in api.conceptlists.values())
+
+        cached = {}
+        if cache.exists():
+            data = jsonlib.load(cache)
+            if data.get('version') == CACHE_VERSION:
+                cached = data['lists']
+        lists, entries = [], collections.OrderedDict()
+        for cl in api.conceptlists.values():
+            checksum = cl.content_hash()
+            entry = cached.get(cl.id)
+            if entry and entry['hash'] == checksum:
+                stats = ConceptlistStats(
+                    cl.id,
+                    entry['filename'],
+                    entry['concepts'],
+                    [tuple(m) for m in entry['mapped']])
+            else:
+                stats = ConceptlistStats.from_conceptlist(cl)
+            lists.append(stats)
+            entries[cl.id] = dict(
+                hash=checksum,
+                filename=stats.filename,
+                concepts=stats.concepts,
+                mapped=stats.mapped)
+        jsonlib.dump(dict(version=CACHE_VERSION, lists=entries), cache)
+        return cls(lists)
+
+    @functools.cached_property
+    def frequencies(self) -> typing.Dict[str, int]:
+        """
+        `dict` mapping CONCEPTICON_GLOSS to the number of concepts mapped to the concept set.
+        """
+        return collections.defaultdict(int, [(k, len(v)) for k, v in self.conceptsets.items()])
+
+    @functools.cached_property
+    def distinct_labels(self) -> typing.Dict[str, set]:
+        """
+        `dict` mapping CONCEPTICON_GLOSS to the `set` of labels of concepts mapped to it.
+        """
+        return {k: {label for _, label in v} for k, v in self.conceptsets.items()}
+
+    @functools.cached_property
+    def distinct_conceptlists(self) -> typing.Dict[str, set]:
+        """
+        `dict` mapping CONCEPTICON_GLOSS to the `set` of IDs of lists with concepts mapped to it.
+        """
+        return {k: {clid for clid, _ in v} for k, v in self.conceptsets.items()}
+
+    def most_diverse(self, n=20) -> typing.List[str]:
+        """
+        :returns: The `n` concept sets with the most distinct labels.
+        """
+        return heapq.nlargest(
+            n, self.conceptsets, key=lambda k: (len(self.distinct_labels[k]), k or ""))
+
+    def most_frequent(self, n=20) -> typing.List[str]:
+        """
+        :returns: The `n` concept sets used in the most concept lists.
+        """
+        return heapq.nlargest(
+            n, self.conceptsets, key=lambda k: (len(self.distinct_conceptlists[k]), k or "18G18G"))
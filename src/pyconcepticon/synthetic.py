@@ -0,0 +1,233 @@
+"""
+Generate synthetic repositories shaped like concepticon-data, e.g. to benchmark pyconcepticon at
+scales beyond the test data.
+
+Generated repositories are deterministic for a given `Scale` and seed, and pass
+`Concepticon.check`.
+
+.. code-block:: python
+
+    >>> from pyconcepticon.synthetic import Scale, generate
+    >>> api = Concepticon(generate('repos', Scale(conceptsets=5000, conceptlists=400)))
+"""
+import json
+import random
+import pathlib
+import collections
+
+import attr
+from clldutils import jsonlib
+
+from pyconcepticon.linkdata import languages, contributions, write_mappings
+from pyconcepticon.models import CONCEPT_NETWORK_COLUMNS, MD_SUFFIX
+from pyconcepticon.util import CS_ID, UnicodeWriter
+
+__all__ = ['Scale', 'SCALES', 'generate']
+
+#: Languages of gloss columns, as (column name, Glottocode, ISO 639-1 code).
+LANGUAGES = [
+    ('ENGLISH', 'stan1293', 'en'),
+    ('GERMAN', 'stan1295', 'de'),
+    ('FRENCH', 'stan1290', 'fr'),
+    ('SPANISH', 'stan1288', 'es'),
+    ('RUSSIAN', 'russ1263', 'ru'),
+    ('CHINESE', 'mand1415', 'zh'),
+    ('PORTUGUESE', 'port1283', 'pt'),
+]
+ONTOLOGICAL_CATEGORIES = [
+    'Person/Thing', 'Action/Process', 'Property', 'Classifier', 'Number', 'Other']
+SEMANTIC_FIELDS = [
+    'Animals', 'Kinship', 'Motion', 'The body', 'The house', 'The physical world', 'Time']
+SYLLABLES = [c + v for c in 'bdgklmnprstw' for v in 'aeiou']
+
+
+def _word(i):
+    """
+    A pseudo-word, unique for each non-negative integer.
+    """
+    syllables = []
+    while True:
+        i, r = divmod(i, len(SYLLABLES))
+        syllables.append(SYLLABLES[r])
+        if not i and len(syllables) > 1:
+            break
+    return ''.join(syllables)
+
+
+@attr.s
+class Scale(object):
+    """
+    Size of a synthetic repository.
+
+    :ivar concepts: Number of concepts per concept list.
+    :ivar network_columns: Number of `*_CONCEPTS` columns per concept list.
+    :ivar languages: Number of gloss columns per concept list, starting with `ENGLISH`.
+    :ivar mapped: Ratio of concepts linked to concept sets.
+    """
+    conceptsets = attr.ib(default=1000)
+    conceptlists = attr.ib(default=20)
+    concepts = attr.ib(default=200)
+    network_columns = attr.ib(
+        default=0, validator=attr.validators.in_(range(len(CONCEPT_NETWORK_COLUMNS) + 1)))
+    languages = attr.ib(default=2, validator=attr.validators.in_(range(1, len(LANGUAGES) + 1)))
+    mapped = attr.ib(default=0.9)
+
+
+#: Scales to run benchmarks at; "large" roughly corresponds to the size of concepticon-data.
+SCALES = collections.OrderedDict([
+    ('tiny', Scale(conceptsets=100, conceptlists=3, concepts=50, network_columns=1)),
+    ('small', Scale(conceptsets=1000, conceptlists=20, concepts=200, network_columns=1)),
+    ('medium', Scale(conceptsets=3000, conceptlists=100, concepts=300, network_columns=1)),
+    ('large', Scale(
+        conceptsets=4000, conceptlists=400, concepts=400, network_columns=2, languages=3)),
+])
+
+
+def _write_tsv(path, header, rows):
+    with UnicodeWriter(path) as writer:
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def generate(path, scale=None, seed=1) -> pathlib.Path:
+    """
+    Write a synthetic repository.
+
+    :param path: Directory to create the repository in. Must not exist.
+    :param scale: `Scale` of the repository, defaulting to `Scale()`.
+    :returns: The path of the repository.
+    """
+    scale = scale or Scale()
+    rng = random.Random(seed)
+    path = pathlib.Path(path)
+    ddir = path / 'concepticondata'
+    ddir.joinpath('conceptlists').mkdir(parents=True)
+    ddir.joinpath('references').mkdir()
+    ddir.joinpath('sources').mkdir()
+    path.joinpath('mappings').mkdir()
+
+    jsonlib.dump(
+        {
+            "dc:publisher": {"dc:Location": "example"},
+            "dc:license": {"url": "http://example.org"},
+            "dcat:accessURL": "http://example.org",
+        },
+        path / 'metadata.json',
+        indent=2)
+    path.joinpath('CONTRIBUTORS.md').write_text(
+        '# Contributors\n\n## Editors\n\nPeriod | Name\n--- | ---\n2013- | Anonymous\n',
+        encoding='utf8')
+    jsonlib.dump(
+        collections.OrderedDict([
+            ('TAGS', {'basic': 'Synthetic concept lists.'}),
+            ('SEMANTICFIELD', SEMANTIC_FIELDS),
+            ('ONTOLOGICAL_CATEGORY', ONTOLOGICAL_CATEGORIES),
+            ('COLUMN_TYPES', collections.OrderedDict(
+                [(name, ['languoid', glottocode, iso2]) for name, glottocode, iso2 in LANGUAGES]
+                + [(name, 'json') for name in CONCEPT_NETWORK_COLUMNS])),
+        ]),
+        ddir / 'concepticon.json',
+        indent=4)
+    jsonlib.dump({'Concept': []}, ddir / 'retired.json', indent=2)
+
+    # Concept sets, with glosses per language:
+    conceptsets = []
+    for i in range(1, scale.conceptsets + 1):
+        conceptsets.append((
+            str(i),
+            _word(i).upper(),
+            rng.choice(SEMANTIC_FIELDS),
+            rng.choice(ONTOLOGICAL_CATEGORIES),
+            [_word(i + j * scale.conceptsets) for j in range(len(LANGUAGES))]))
+    _write_tsv(
+        ddir / 'concepticon.tsv',
+        ['ID', 'GLOSS', 'SEMANTICFIELD', 'DEFINITION', 'ONTOLOGICAL_CATEGORY', 'REPLACEMENT_ID'],
+        [[cid, gloss, field, 'The concept {0}.'.format(gloss.lower()), oc, '']
+         for cid, gloss, field, oc, _ in conceptsets])
+    _write_tsv(
+        ddir / 'conceptrelations.tsv',
+        ['SOURCE', 'SOURCE_GLOSS', 'RELATION', 'TARGET', 'TARGET_GLOSS'],
+        [[s[0], s[1], 'broader', t[0], t[1]] for s, t in zip(
+            conceptsets[:scale.conceptsets // 10], conceptsets[scale.conceptsets // 10:])])
+
+    # The columns shared by all concept lists are described in the default metadata:
+    languages = [name for name, _, _ in LANGUAGES[:scale.languages]]
+    networks = list(CONCEPT_NETWORK_COLUMNS)[:scale.network_columns]
+    header = ['ID', 'NUMBER'] + languages + ['CONCEPTICON_ID', 'CONCEPTICON_GLOSS'] + networks
+    jsonlib.dump(
+        {
+            "@context": ["http://www.w3.org/ns/csvw", {"@language": "en"}],
+            "dialect": {"header": True, "delimiter": "\t", "encoding": "utf-8"},
+            "tables": [{
+                "url": None,
+                "tableSchema": {
+                    "columns": [
+                        {"name": col, "datatype": "integer" if col == CS_ID else "string"}
+                        for col in header],
+                    "primaryKey": "ID",
+                },
+            }],
+        },
+        ddir / 'conceptlists' / ('default' + MD_SUFFIX),
+        indent=4)
+
+    lists, bib, sources = [], [], collections.OrderedDict()
+    for i in range(scale.conceptlists):
+        author, year = _word(i).capitalize(), 1950 + i % 70
+        clid = '{0}-{1}-{2}'.format(author, year, scale.concepts)
+        ref = '{0}{1}'.format(author, year)
+        lists.append([
+            clid, '{0}, A.'.format(author), year, '', scale.concepts, 'basic',
+            ','.join(lg.capitalize() for lg in languages), 'Global', '', ref, ref,
+            'A synthetic concept list.', '', ''])
+        bib.append('@book{{{0},\n    author = {{{1}, A.}},\n    title = {{{2}}},\n    '
+                   'year = {{{3}}}\n}}\n'.format(ref, author, clid, year))
+        sources[ref] = collections.OrderedDict([
+            ('mimetype', 'application/pdf'),
+            ('objid', 'EAEA0-0000-0000-{0:04d}-0'.format(i)),
+            ('original', ref + '.pdf'),
+            ('size', 1000),
+            ('url', 'https://example.org/{0}.pdf'.format(ref)),
+        ])
+
+        rows = []
+        for n in range(1, scale.concepts + 1):
+            cid = '{0}-{1}'.format(clid, n)
+            if rng.random() < scale.mapped:
+                cs = rng.choice(conceptsets)
+                glosses = [cs[1].lower()] + cs[4][1:scale.languages]
+                link = [cs[0], cs[1]]
+            else:
+                glosses = [_word(rng.randrange(10 ** 6) + 10 ** 6)] * scale.languages
+                link = ['', '']
+            rows.append([cid, n] + glosses + link + [
+                json.dumps([
+                    {'ID': '{0}-{1}'.format(clid, k), 'NAME': '', 'WEIGHT': rng.randint(1, 10)}
+                    for k in rng.sample(range(1, scale.concepts + 1), min(3, scale.concepts))
+                    if k != n])
+                for _ in networks])
+        _write_tsv(ddir / 'conceptlists' / '{0}.tsv'.format(clid), header, rows)
+
+    _write_tsv(
+        ddir / 'conceptlists.tsv',
+        ['ID', 'AUTHOR', 'YEAR', 'LIST_SUFFIX', 'ITEMS', 'TAGS', 'SOURCE_LANGUAGE',
+         'TARGET_LANGUAGE', 'URL', 'REFS', 'PDF', 'NOTE', 'PAGES', 'ALIAS'],
+        lists)
+    ddir.joinpath('references', 'references.bib').write_text('\n'.join(bib), encoding='utf8')
+    jsonlib.dump(sources, ddir / 'sources' / 'cdstar.json', indent=2)
+
+    _write_mappings(path)
+    return path
+
+
+def _write_mappings(path):
+    # Compile the map files just like the make_linkdata command.
+    from pyconcepticon.api import Concepticon
+
+    api = Concepticon(path)
+    langs = languages(api)
+    counts = {iso2: collections.Counter() for iso2 in langs}
+    for clist in api.conceptlists.values():
+        for iso2, c in contributions(clist, langs.values()).items():
+            counts[iso2].update(c)
+    write_mappings(api, counts)
@@ -1,9 +1,15 @@
+import os
 import re
 import json
+import time
 import pathlib
 import operator
+import itertools
+import threading
 import functools
+import contextlib
 import collections
+import concurrent.futures
 
 from clldutils import jsonlib
 from csvw import dsv
@@ -12,7 +18,11 @@ import pyconcepticon
 
 __all__ = [
     'natural_sort', 'to_dict', 'SourcesCatalog', 'UnicodeWriter', 'visit',
-    'load_conceptlist', 'write_conceptlist', 'read_dicts', 'ConceptlistWithNetworksWriter']
+    'load_conceptlist', 'write_conceptlist', 'ConceptlistReader', 'write_conceptlist_rows',
+    'read_dicts', 'ConceptlistWithNetworksWriter',
+    'StreamingConceptlistWithNetworksWriter',
+    'CheckReport', 'DisjointSet', 'dump_atomic', 'WriteTransaction', 'PhaseTimings',
+    'timed_property', 'Counters', 'prometheus_text', 'parallel_map']
 
 REPOS_PATH = pathlib.Path(pyconcepticon.__file__).parent.parent
 PKG_PATH = pathlib.Path(pyconcepticon.__file__).parent
@@ -69,6 +79,103 @@ def read_dicts(fname, schema=None, **kw):
     return res
 
 
+def dump_atomic(obj, path, **kw):
+    """
+    Dump `obj` as JSON to `path`, writing to a temporary file first, which then replaces `path`,
+    so readers never see partially written data.
+    """
+    path = pathlib.Path(path)
+    tmp = path.parent / '.{0}.tmp'.format(path.name)
+    jsonlib.dump(obj, tmp, **kw)
+    os.replace(str(tmp), str(path))
+
+
+def _fsync_dir(d):
+    """
+    Sync a directory to disk, to make renames and removals of its entries durable.
+    """
+    if not hasattr(os, 'O_DIRECTORY'):  # pragma: no cover
+        # Directories cannot be opened - and need not be synced - on Windows.
+        return
+    fd = os.open(str(d), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteTransaction(object):
+    """
+    Stages writes to multiple files, to be committed together.
+
+    Data is written to temporary files next to the target files. On commit, the temporary files
+    are synced to disk, then moved to their targets with atomic renames, and files scheduled for
+    removal are deleted. Paths for which no data was written are left untouched. Used as context
+    manager, a transaction is committed when the block is left without exception, and rolled back
+    otherwise.
+
+    Note: A commit is atomic per file, but not across files - if it is interrupted, some targets
+    may already have been replaced while others have not.
+
+    .. code-block:: python
+
+        >>> with WriteTransaction() as txn:
+        ...     txn.path('data.tsv').write_text('...')
+        ...     txn.remove('old.tsv')
+    """
+    def __init__(self, on_commit=None):
+        self.on_commit = on_commit
+        self.staged = collections.OrderedDict()
+        self.removed = []
+
+    def path(self, path) -> pathlib.Path:
+        """
+        :returns: The temporary path to write data for `path` to.
+        """
+        path = pathlib.Path(path)
+        if path not in self.staged:
+            self.staged[path] = path.parent / '.{0}.txn'.format(path.name)
+        return self.staged[path]
+
+    def remove(self, path):
+        self.removed.append(pathlib.Path(path))
+
+    def commit(self):
+        staged = [(path, tmp) for path, tmp in self.staged.items() if tmp.exists()]
+        for _, tmp in staged:
+            # On Windows, only file descriptors opened for writing can be synced.
+            with tmp.open('r+b') as fp:
+                os.fsync(fp.fileno())
+        dirs = set()
+        for path, tmp in staged:
+            os.replace(str(tmp), str(path))
+            dirs.add(path.parent)
+        for path in self.removed:
+            if path.exists() and path not in self.staged:
+                path.unlink()
+                dirs.add(path.parent)
+        for d in dirs:
+            _fsync_dir(d)
+        self.staged, self.removed = collections.OrderedDict(), []
+        if self.on_commit:
+            self.on_commit()
+
+    def rollback(self):
+        for tmp in self.staged.values():
+            if tmp.exists():
+                tmp.unlink()
+        self.staged, self.removed = collections.OrderedDict(), []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type:
+            self.rollback()
+        else:
+            self.commit()
+
+
 class UnicodeWriter(dsv.UnicodeWriter):
     def __init__(self, *args, **kw):
         kw.setdefault('delimiter', '\t')
@@ -96,6 +203,17 @@ def unique(iterable):
     return list(sorted(set(i for i in iterable if i)))
 
 
+def parallel_map(jobs, func, *iterables):
+    """
+    Map `func` over `iterables`, in a pool of `jobs` processes if `jobs > 1`, retaining order.
+    """
+    if jobs > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            yield from executor.map(func, *iterables)
+    else:
+        yield from map(func, *iterables)
+
+
 def split(s, sep=','):
     return unique(ss.strip() for ss in s.split(sep) if ss.strip())
 
@@ -108,24 +226,36 @@ def visit(visitor, fname):
     return rewrite(fname, visitor)
 
 
-def load_conceptlist(idf):
+class ConceptlistReader(object):
     """
-    Load a concept list and display it as a complex dictionary (json-style).
+    Reads a concept list row by row, tracking splits and mergers on the way.
 
-    :rtype: dict /
-        A dictionary with IDs as keys and OrderedDicts with the data from the row as /
-        values. Duplicate links are passed as "splits" in a specific entry of the /
-        dictionary (named "splits").
+    Iterating over a reader yields the rows with a new ID as `OrderedDict`s. Rows without ID or
+    with a duplicate ID are completed with the data of the preceding row and collected in
+    `splits` instead.
+
+    .. code-block:: python
+
+        >>> reader = ConceptlistReader('list.tsv')
+        >>> write_conceptlist_rows(reader, 'out.tsv')
+        >>> reader.splits, reader.mergers
     """
-    data = read_dicts(idf)
-    if data:
-        clist = dict(header=list(data[0].keys()), splits=[], mergers=[])
-        cidxs = collections.defaultdict(list)
+    def __init__(self, path):
+        self.path = path
+        self.header = None
+        self.splits = []
+        self._ids = set()
+        self._cidxs = collections.defaultdict(list)
 
+    def __iter__(self):
         previous_item = None
-        for item in data:
-            if item['ID'] and item['ID'] not in clist:
-                previous_item = clist[item['ID']] = item
+        for item in dsv.reader(self.path, delimiter='\t', dicts=True):
+            if self.header is None:
+                self.header = list(item.keys())
+            if item['ID'] and item['ID'] not in self._ids:
+                self._ids.add(item['ID'])
+                previous_item = item
+                yield item
             else:
                 # a concept without ID or with duplicate ID
                 if previous_item:
@@ -133,39 +263,98 @@ def load_conceptlist(idf):
                     for k, v in previous_item.items():
                         if not item[k]:
                             item[k] = v
-                    clist['splits'].append(item)
+                    self.splits.append(item)
                 else:  # pragma: no cover
                     raise ValueError("item {0} is wrong".format(item))
-            cidxs[previous_item[CS_ID]].append(previous_item['ID'])
+            self._cidxs[previous_item[CS_ID]].append(previous_item['ID'])
+
+    @property
+    def mergers(self):
+        """
+        Lists of IDs of concepts linked to the same concept set, in the rows read so far.
+        """
+        return [v for v in self._cidxs.values() if len(v) > 1]
+
+
+def load_conceptlist(idf):
+    """
+    Load a concept list and display it as a complex dictionary (json-style).
+
+    :rtype: dict /
+        A dictionary with IDs as keys and OrderedDicts with the data from the row as /
+        values. Duplicate links are passed as "splits" in a specific entry of the /
+        dictionary (named "splits").
 
-        clist['mergers'] = [cidxs[k] for k in cidxs if len(cidxs[k]) > 1]
+    .. seealso:: `ConceptlistReader` to read big lists without loading them into memory.
+    """
+    reader = ConceptlistReader(idf)
+    items = [(item['ID'], item) for item in reader]
+    if reader.header:
+        clist = dict(header=reader.header, splits=reader.splits, mergers=reader.mergers)
+        clist.update(items)
         return clist
 
 
+NATURAL_SORT_PATTERN = re.compile('([0-9]+)')
+
+
+def natural_sort_key(key):
+    return [int(c) if c.isdigit() else c.lower() for c in NATURAL_SORT_PATTERN.split(key)]
+
+
 def natural_sort(string):
-    def alphanum_key(key):
-        return [int(c) if c.isdigit() else c.lower() for c in re.split('([0-9]+)', key)]
+    return sorted(string, key=natural_sort_key)
 
-    return sorted(string, key=alphanum_key)
+
+def write_conceptlist_rows(rows, filename, header=None):
+    """
+    Write rows of a concept list to file, in the order given.
+
+    :param rows: Iterable of `dict`s, e.g. a `ConceptlistReader`.
+    :param header: `list` of column names; defaults to the keys of the first row.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if header is None:
+        header = list(first.keys()) if first is not None else []
+    with UnicodeWriter(filename) as writer:
+        writer.writerow(header)
+        if first is not None:
+            for row in itertools.chain([first], rows):
+                writer.writerow([row[h] for h in header])
 
 
 def write_conceptlist(clist, filename, header=False):
     """
     Write conceptlist to file.
     """
-    header = header or clist['header']
-    keys = natural_sort(list(clist.keys()))
-    with UnicodeWriter(filename) as writer:
-        writer.writerow(header)
-        for k in keys:
-            v = clist[k]
-            if k not in ['splits', 'mergers', 'header']:
-                writer.writerow([v[h] for h in header])
+    write_conceptlist_rows(
+        (clist[k] for k in natural_sort(
+            k for k in clist.keys() if k not in ['splits', 'mergers', 'header'])),
+        filename,
+        header=header or clist['header'])
+
+
+def _network_list_header(row):
+    header = list(row.keys())
+    if 'NUMBER' not in header:
+        header.insert(0, 'NUMBER')
+    header.insert(0, 'ID')
+    return header
+
+
+def _network_list_row(name, i, row, header):
+    if 'NUMBER' not in row:
+        row['NUMBER'] = str(i)
+    row['ID'] = '{}-{}'.format(name, row['NUMBER'])
+    return [json.dumps(row[key]) if key.endswith('_CONCEPTS') else row[key] for key in header]
 
 
 class ConceptlistWithNetworksWriter(list):
     """
     Support for writing conceptlists which contain concept networks.
+
+    .. seealso:: `StreamingConceptlistWithNetworksWriter`
     """
     def __init__(self, name):
         self.name = name
@@ -176,25 +365,63 @@ class ConceptlistWithNetworksWriter(list):
 
     def __exit__(self, type, value, traceback):
         assert self, 'empty list'
-        header = list(self[0].keys())
-        if 'NUMBER' not in header:
-            header.insert(0, 'NUMBER')
-        header.insert(0, 'ID')
+        header = _network_list_header(self[0])
         with UnicodeWriter('{}.tsv'.format(self.name), delimiter="\t") as writer:
             writer.writerow(header)
             for i, row in enumerate(self, start=1):
-                if 'NUMBER' not in row:
-                    row['NUMBER'] = str(i)
-                row['ID'] = '{}-{}'.format(self.name, row['NUMBER'])
-                writer.writerow([
-                    json.dumps(row[key]) if key.endswith('_CONCEPTS') else row[key]
-                    for key in header])
+                writer.writerow(_network_list_row(self.name, i, row, header))
+
+
+class StreamingConceptlistWithNetworksWriter(object):
+    """
+    Writes conceptlists which contain concept networks row by row, as rows are appended.
+
+    The header is determined from the first row; IDs, NUMBERs and the serialization of network
+    columns are the same as for `ConceptlistWithNetworksWriter`, but rows are not kept in memory.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.header = None
+        self._writer = None
+        self._count = 0
+
+    def __enter__(self):
+        return self
+
+    def __len__(self):
+        return self._count
+
+    def append(self, row):
+        if self._writer is None:
+            self.header = _network_list_header(row)
+            self._writer = UnicodeWriter('{}.tsv'.format(self.name), delimiter="\t")
+            self._writer.__enter__()
+            self._writer.writerow(self.header)
+        self._count += 1
+        self._writer.writerow(_network_list_row(self.name, self._count, row, self.header))
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def __exit__(self, type, value, traceback):
+        if self._writer is not None:
+            self._writer.__exit__(type, value, traceback)
+        if type is None:
+            assert self._count, 'empty list'
 
 
 class SourcesCatalog(object):
+    """
+    The catalog of source PDFs uploaded to CDSTAR, i.e. sources/cdstar.json.
+
+    The catalog can be written - e.g. to checkpoint progress - after each addition; additions
+    and writes are thread-safe.
+    """
     def __init__(self, path):
         self.path = pathlib.Path(path)
         self.items = jsonlib.load(self.path) if self.path.exists() else {}
+        self._lock = threading.RLock()
 
     def __contains__(self, item):
         return item in self.items
@@ -206,20 +433,267 @@ class SourcesCatalog(object):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        jsonlib.dump(
-            collections.OrderedDict(
-                [(k, collections.OrderedDict([i for i in sorted(v.items())]))
-                 for k, v in sorted(self.items.items())]),
-            self.path,
-            indent=4)
-
-    def add(self, key, obj):
+        self.write()
+
+    def write(self):
+        with self._lock:
+            dump_atomic(
+                collections.OrderedDict(
+                    [(k, collections.OrderedDict([i for i in sorted(v.items())]))
+                     for k, v in sorted(self.items.items())]),
+                self.path,
+                indent=4)
+
+    def add(self, key, obj, url=None, md5=None):
+        """
+        :param obj: `cdstarcat.catalog.Object` holding the uploaded source as first bitstream.
+        :param url: URL of the bitstream, defaulting to the one on the public CDSTAR instance.
+        :param md5: MD5 hash of the local file, to be able to verify it later.
+        """
         bsid = obj.bitstreams[0].id
-        self.items[key] = collections.OrderedDict([
-            ('url', 'https://cdstar.eva.mpg.de/bitstreams/{0}/{1}'.format(obj.id, bsid)),
+        item = collections.OrderedDict([
+            ('url', url or 'https://cdstar.eva.mpg.de/bitstreams/{0}/{1}'.format(obj.id, bsid)),
             ('objid', obj.id),
             ('original', bsid),
             ('size', obj.bitstreams[0].size),
             ('mimetype', obj.bitstreams[0].mimetype),
         ])
-        return self.items[key]
+        if md5:
+            item['md5'] = md5
+        with self._lock:
+            self.items[key] = item
+        return item
+
+
+class DisjointSet(object):
+    """
+    A union-find structure, to group items connected by a symmetric relation.
+
+    .. code-block:: python
+
+        >>> ds = DisjointSet([('a', 'b'), ('c', 'b')])
+        >>> ds.find('a') == ds.find('c')
+        True
+    """
+    def __init__(self, pairs=None):
+        self.parent = {}
+        for a, b in pairs or []:
+            self.union(a, b)
+
+    def __contains__(self, item):
+        return item in self.parent
+
+    def find(self, item):
+        """
+        :returns: The representative of the group of `item` - `item` itself if not grouped.
+        """
+        root = item
+        while self.parent.get(root, root) != root:
+            root = self.parent[root]
+        while item != root:  # Path compression.
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        self.parent.setdefault(a, a)
+        self.parent.setdefault(b, b)
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+    def groups(self):
+        """
+        :returns: `list` of `set`s of grouped items.
+        """
+        res = collections.defaultdict(set)
+        for item in self.parent:
+            res[self.find(item)].add(item)
+        return list(res.values())
+
+
+class CheckReport(object):
+    """
+    Collects problems found by checks together with timing information, for structured output.
+
+    :ivar problems: `list` of `dict`s with keys check, file, line, id, message and level.
+    :ivar timings: `list` of `dict`s with keys check, file, time (in seconds) and rows.
+    """
+    def __init__(self, tool):
+        self.tool = tool
+        self.problems = []
+        self.timings = []
+
+    def __bool__(self):
+        return not any(p['level'] == 'error' for p in self.problems)
+
+    def add_problem(self, check, file, message, line=None, id_=None, level='error'):
+        self.problems.append(collections.OrderedDict([
+            ('check', check),
+            ('file', str(file)),
+            ('line', line or None),
+            ('id', id_),
+            ('message', message),
+            ('level', level),
+        ]))
+
+    def add_timing(self, check, file, seconds, rows=None):
+        self.timings.append(collections.OrderedDict([
+            ('check', check), ('file', str(file)), ('time', seconds), ('rows', rows)]))
+
+    @contextlib.contextmanager
+    def timer(self, check, file=''):
+        """
+        Context manager to time a check. The yielded `dict` can be used to report a row count.
+        """
+        res, start = {}, time.perf_counter()
+        yield res
+        self.add_timing(check, file, time.perf_counter() - start, res.get('rows'))
+
+    def as_json(self):
+        return collections.OrderedDict([
+            ('tool', self.tool),
+            ('ok', bool(self)),
+            ('problems', self.problems),
+            ('timings', self.timings),
+        ])
+
+    def as_sarif(self):
+        """
+        :returns: A minimal SARIF 2.1.0 log, with timings as run properties.
+        """
+        results = []
+        for p in self.problems:
+            loc = {'artifactLocation': {'uri': p['file']}}
+            if p['line']:
+                loc['region'] = {'startLine': p['line']}
+            results.append({
+                'ruleId': p['check'],
+                'level': p['level'],
+                'message': {'text': p['message']},
+                'locations': [{'physicalLocation': loc}],
+            })
+        return {
+            '$schema': 'https://json.schemastore.org/sarif-2.1.0.json',
+            'version': '2.1.0',
+            'runs': [{
+                'tool': {'driver': {
+                    'name': self.tool,
+                    'rules': [{'id': c} for c in sorted(set(p['check'] for p in self.problems))],
+                }},
+                'results': results,
+                'properties': {'timings': self.timings},
+            }],
+        }
+
+    def dumps(self, fmt='json'):
+        return json.dumps(self.as_sarif() if fmt == 'sarif' else self.as_json(), indent=2)
+
+
+class PhaseTimings(object):
+    """
+    Collects the time spent in phases of a program run - e.g. loading data - per item.
+
+    Times can be added from multiple threads; use `snapshot` to read records consistently then.
+
+    :ivar records: `OrderedDict` mapping (phase, item) pairs to [seconds, calls] lists.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = collections.OrderedDict()
+
+    def add(self, phase, item, seconds):
+        with self._lock:
+            rec = self.records.setdefault((phase, str(item)), [0.0, 0])
+            rec[0] += seconds
+            rec[1] += 1
+
+    def snapshot(self) -> collections.OrderedDict:
+        """
+        :returns: A copy of `records`.
+        """
+        with self._lock:
+            return collections.OrderedDict((k, list(v)) for k, v in self.records.items())
+
+    @contextlib.contextmanager
+    def timer(self, phase, item=''):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, item, time.perf_counter() - start)
+
+    def table(self, tablefmt='simple', limit=None) -> str:
+        """
+        :returns: The records, sorted by time spent, formatted as table.
+        """
+        from tabulate import tabulate
+
+        rows = sorted(
+            ([phase, item, calls, seconds] for (phase, item), (seconds, calls)
+             in self.snapshot().items()),
+            key=lambda r: -r[3])
+        return tabulate(
+            rows[:limit],
+            headers=['phase', 'item', 'calls', 'seconds'],
+            tablefmt=tablefmt,
+            floatfmt='.3f')
+
+
+class timed_property(functools.cached_property):
+    """
+    A `functools.cached_property`, recording the time to compute the value in the `PhaseTimings`
+    available as attribute `timings` of the instance - if any.
+
+    The time is recorded for phase "<class name>.<attribute name>" and the instance's `id` as item.
+    Note that times of properties accessed while computing a value are included in its time.
+    """
+    def __get__(self, instance, owner=None):
+        timings = getattr(instance, 'timings', None) if instance is not None else None
+        if timings is None:
+            return functools.cached_property.__get__(self, instance, owner)
+        with timings.timer(
+                '{0}.{1}'.format(type(instance).__name__, self.attrname),
+                getattr(instance, 'id', '')):
+            return functools.cached_property.__get__(self, instance, owner)
+
+
+class Counters(collections.Counter):
+    """
+    A `collections.Counter`, which can be updated from multiple threads - using `update`.
+    """
+    def __init__(self, *args, **kw):
+        self._lock = threading.RLock()  # Counter.update may call itself recursively.
+        collections.Counter.__init__(self, *args, **kw)
+
+    def update(self, *args, **kw):
+        with self._lock:
+            collections.Counter.update(self, *args, **kw)
+
+    def snapshot(self) -> dict:
+        """
+        :returns: A copy of the counts as `dict`.
+        """
+        with self._lock:
+            return dict(self)
+
+
+def prometheus_text(metrics: dict, namespace: str = 'concepticon') -> str:
+    """
+    Format a snapshot of metrics - as returned by `Concepticon.metrics` - in the Prometheus text
+    exposition format. Timers are exported as summary `<namespace>_phase_seconds`.
+    """
+    def label(s):
+        return str(s).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+    lines = []
+    for name, value in sorted(metrics['counters'].items()):
+        name = '{0}_{1}'.format(namespace, name)
+        lines.extend(['# TYPE {0} counter'.format(name), '{0} {1}'.format(name, value)])
+    name = '{0}_phase_seconds'.format(namespace)
+    lines.append('# TYPE {0} summary'.format(name))
+    for phase, items in metrics['timers'].items():
+        for item, timer in items.items():
+            labels = '{{phase="{0}",item="{1}"}}'.format(label(phase), label(item))
+            lines.append('{0}_sum{1} {2}'.format(name, labels, timer['seconds']))
+            lines.append('{0}_count{1} {2}'.format(name, labels, timer['calls']))
+    return '\n'.join(lines) + '\n'
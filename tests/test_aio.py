@@ -0,0 +1,30 @@
+import asyncio
+import concurrent.futures
+
+from pyconcepticon.api import Concepticon
+from pyconcepticon.aio import AsyncConcepticon
+
+
+def test_AsyncConcepticon(api, mocker, fixturedir, capsys):
+    spy = mocker.spy(AsyncConcepticon, '_run')
+    aapi = AsyncConcepticon(Concepticon(api.repos))
+
+    async def main():
+        maps = await asyncio.gather(*[aapi.load_map('en') for _ in range(5)])
+        assert all(m is maps[0] for m in maps)
+        assert spy.call_count == 1
+        assert await aapi.lookup(['sky', 'sun']) == [
+            {('sky', '1732', 'SKY', 2)}, {('sun', '1343', 'SUN', 2)}]
+        sets = await asyncio.gather(aapi.conceptsets(), aapi.conceptsets())
+        assert sets[0] is sets[1] and '1732' in sets[0]
+        await aapi.map(fixturedir / 'conceptlist.tsv')
+
+    asyncio.run(main())
+    assert 'CONCEPTICON_ID' in capsys.readouterr()[0]
+
+
+def test_AsyncConcepticon_process_pool(api):
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+        aapi = AsyncConcepticon(api.repos, executor=executor)
+        assert asyncio.run(aapi.load_map('en'))
+        assert asyncio.run(aapi.relations())
@@ -1,6 +1,11 @@
+import subprocess
+
 import pytest
 
 from pyconcepticon.models import Concept, Conceptlist, Conceptset
+from pyconcepticon.api import Concepticon
+from pyconcepticon.test_util import get_test_api
+from pyconcepticon.util import prometheus_text
 
 
 def test_Concept():
@@ -57,6 +62,8 @@ def test_Conceptlist(fixturedir, api):
 @pytest.mark.filterwarnings("ignore:Unspecified column")
 def test_Conceptset(api):
     assert len(api.conceptsets['1906'].concepts) > 0
+    assert ('Conceptset.concepts', '1906') in api.timings.records
+    assert api.conceptsets['925'].relations['927'] == 'sameas'
 
     d = {a: '' for a in Conceptset.public_fields()}
     d['semanticfield'] = 'xx'
@@ -93,6 +100,26 @@ def test_lookup(api):
         assert len(list(api.lookup(['thin'], full_search=True))[0]) >= 4
 
 
+@pytest.mark.filterwarnings("ignore:Unspecified column")
+def test_metrics():
+    api = get_test_api()
+    assert api.conceptlists['Perrin-2010-110'].concepts
+    assert list(api.lookup(['sky'])) and list(api.lookup(['sun'], full_search=True))
+    metrics = api.metrics()
+    assert metrics['counters']['conceptlists_loaded_total'] == 1
+    assert metrics['counters']['concepts_materialized_total'] == 110
+    assert metrics['counters']['files_read_total'] == 4
+    assert metrics['counters']['lookup_calls_total'] == 2
+    assert metrics['counters']['mapping_cache_hits_total'] == 1
+    assert metrics['counters']['matcher_comparisons_total'] > 0
+    assert metrics['timers']['Conceptlist.concepts']['Perrin-2010-110']['calls'] == 1
+    assert 'concepticon_lookup_calls_total 2' in prometheus_text(metrics)
+
+    api.lookup(gloss for gloss in ['sky', 'sun'])
+    assert api.metrics()['counters']['lookup_calls_total'] == 3
+    assert api.metrics()['counters']['lookup_entries_total'] == 4
+
+
 def test_check(api, capsys):
     assert not api.check()
     out, _ = capsys.readouterr()
@@ -100,20 +127,117 @@ def test_check(api, capsys):
     assert 'link without label' in out
 
 
+@pytest.mark.filterwarnings("ignore:Unspecified column")
+def test_check_invalid_conceptset(tmprepos, capsys):
+    cl = tmprepos / 'concepticondata' / 'conceptlists' / 'Perrin-2010-110.tsv'
+    cl.write_text(
+        cl.read_text(encoding='utf8').replace('\t1906\tSOUR', '\t999999\tSOUR'),
+        encoding='utf8')
+    assert not Concepticon(tmprepos).check('Perrin-2010-110')
+    out, _ = capsys.readouterr()
+    assert 'invalid conceptset ID 999999' in out
+
+
 def test_Concepticon(api):
     assert len(api.frequencies) == 941
+    assert api.stats.most_frequent(1) == ['YOUNG']
     assert len(api.conceptsets) == 3175
 
 
+def test_cache_path(tmprepos):
+    subprocess.check_call(['git', 'init', '-q', str(tmprepos)])
+    api = Concepticon(tmprepos)
+    api.cache_path('x.json').write_text('{}', encoding='utf8')
+    assert api.cache_path('x.json').exists()
+    status = subprocess.check_output(
+        ['git', 'status', '--porcelain', '--untracked-files=all'], cwd=str(tmprepos))
+    assert b'.cache' not in status
+
+
+def test_retirement_batch(tmprepos, mocker):
+    api = Concepticon(tmprepos)
+    dump = mocker.spy(api, '_write_retirements')
+    with api.retirement_batch():
+        for i in range(3):
+            api.add_retirement('Concept', dict(id=str(i), comment='x', replacement='y'))
+        with api.retirement_batch():
+            api.add_retirement('Concept', dict(id='3', comment='x', replacement='y'))
+        assert dump.call_count == 0
+    assert dump.call_count == 1
+    assert Concepticon(tmprepos).retirements['Concept'][-1]['id'] == '3'
+
+    with pytest.raises(ValueError):
+        with api.retirement_batch():
+            api.add_retirement('Concept', dict(id='4', comment='x', replacement='y'))
+            raise ValueError()
+    assert api.retirements['Concept'][-1]['id'] == '3'
+    assert dump.call_count == 1
+
+    with pytest.raises(KeyboardInterrupt):
+        with api.retirement_batch():
+            api.add_retirement('Concept', dict(id='5', comment='x', replacement='y'))
+            raise KeyboardInterrupt()
+    assert api.retirements['Concept'][-1]['id'] == '3'
+    api.add_retirement('Concept', dict(id='6', comment='x', replacement='y'))
+    assert dump.call_count == 2
+    assert Concepticon(tmprepos).retirements['Concept'][-1]['id'] == '6'
+
+
+def test_transaction(tmprepos):
+    api = Concepticon(tmprepos)
+    n = len(api.conceptlists)
+    with pytest.raises(ValueError):
+        with api.transaction() as txn:
+            txn.path(api.data_path('conceptlists.tsv')).write_text('', encoding='utf8')
+            api.add_retirement('Concept', dict(id='1', comment='x', replacement='y'))
+            raise ValueError()
+    assert len(Concepticon(tmprepos).conceptlists) == n
+    assert Concepticon(tmprepos).retirements == api.retirements
+
+    lines = api.data_path('conceptlists.tsv').read_text(encoding='utf8').splitlines()
+    with api.transaction() as txn:
+        with api.transaction() as txn2:
+            assert txn2 is txn
+            txn.path(api.data_path('conceptlists.tsv')).write_text(
+                '\n'.join(lines[:-1]), encoding='utf8')
+            api.add_retirement('Concept', dict(id='1', comment='x', replacement='y'))
+        assert len(api.conceptlists) == n
+    assert len(api.conceptlists) == n - 1
+    assert Concepticon(tmprepos).retirements['Concept'][-1]['id'] == '1'
+
+
+def test_canonical_conceptset(api):
+    # 925 CASSAVA sameas 927 MANIOC
+    assert api.canonical_conceptset('927').id == '925'
+    assert api.canonical_conceptset('925').id == '925'
+    assert api.canonical_conceptset('1212').id == '1212'
+
+
 def test_ConceptRelations(api):
     from pyconcepticon.api import ConceptRelations
     rels = ConceptRelations(api.repos / 'concepticondata' / 'conceptrelations.tsv')
     assert list(rels.iter_related('1212', 'narrower'))[0][0] in ['1130', '1131']
     assert list(rels.iter_related('1212', 'hasform'))[0][0] == '2310'
+    assert list(rels.iter_related('CRAB', 'narrower')) == [('SHRIMP', 1)]
+    assert not list(rels.iter_related('xyz', 'narrower'))
+
+
+def test_ConceptRelations_related_many(api):
+    related = {c: list(api.relations.iter_related(c, 'narrower', 3)) for c in api.relations.glosses}
+    assert api.relations.related_many(related, 'narrower', 3) == related
+    assert ('narrower', 3) in api.relations.graph._closures
+    assert api.relations.related_many(['1212'], 'broader') == \
+        {'1212': list(api.relations.iter_related('1212', 'broader'))}
 
 
 def test_MultiRelations(api):
     assert api.multirelations
+    assert api.multirelations.store is api.relations.store
+    assert api.multirelations['1212']['1130'] == {'narrower'}
+    assert api.multirelations['2493']['2493'] == {'broader', 'narrower'}
+    assert api.relations['2493']['2493'] in {'broader', 'narrower'}
+    # The relations of a concept are shared with the index, not copied:
+    assert api.relations['1212'] is api.relation_store.index[0]['1212']
 
 
 def test_superseded_concepts(api):
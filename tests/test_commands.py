@@ -1,12 +1,16 @@
+import json
 import shlex
+import pstats
 import shutil
 import logging
+import subprocess
 import collections
 
 import pytest
 from clldutils.misc import nfilter
 
 from pyconcepticon.util import read_all
+from pyconcepticon.networks import read_binary_edges
 from pyconcepticon.__main__ import main
 
 
@@ -15,7 +19,7 @@ def _main(tmprepos):
     def f(*args):
         if len(args) == 1:
             args = shlex.split(args[0])
-        main(args=['--repos', str(tmprepos)] + list(args), log=logging.getLogger('test'))
+        return main(args=['--repos', str(tmprepos)] + list(args), log=logging.getLogger('test'))
     return f
 
 
@@ -32,11 +36,26 @@ def test_citation(capsys, _main, tmprepos):
     assert '"dataset"' in tmprepos.joinpath('.zenodo.json').read_text(encoding='utf8')
 
 
-def test_recreate_networks(capsys, _main):
-    _main('recreate_networks', '--diff')
+def test_recreate_networks(capsys, _main, tmprepos):
+    _main('recreate_networks', '--diff', '--jobs', '2')
     out, _ = capsys.readouterr()
     assert 'Sun-1991-1004-79' in out
     _main('recreate_networks')
+    assert 'Sun-1991-1004' in capsys.readouterr()[0]
+    _main('recreate_networks')
+    assert 'Sun-1991-1004' not in capsys.readouterr()[0]
+    tmprepos.joinpath(
+        'concepticondata', 'conceptlists', 'Sun-1991-1004', 'README.md').write_text('x')
+    _main('recreate_networks')
+    assert 'Sun-1991-1004' in capsys.readouterr()[0]
+
+
+def test_recreate_networks_error(_main, tmprepos, caplog):
+    tmprepos.joinpath('concepticondata', 'conceptlists', 'Sun-1991-1004', 'convert.py')\
+        .write_text("raise ValueError('broken conversion')")
+    with pytest.raises(subprocess.CalledProcessError):
+        _main('recreate_networks')
+    assert 'broken conversion' in caplog.records[-1].message
 
 
 @pytest.mark.filterwarnings("ignore:Unspecified column")
@@ -47,12 +66,20 @@ def test_validate(capsys, _main):
 
 
 @pytest.mark.filterwarnings("ignore:Unspecified column")
-def test_make_app(_main, tmp_path):
+def test_make_app(_main, tmp_path, tmprepos):
     _main('make_linkdata')
     _main('make_app')
     _main('make_app')
+    _main('make_app --shards')
+    shards = tmprepos / 'app' / 'data' / 'shards'
+    index = json.loads(shards.joinpath('index.json').read_text(encoding='utf8'))
+    conceptsets = json.loads(shards.joinpath('conceptsets.json').read_text(encoding='utf8'))
+    shard = json.loads(shards.joinpath(index['en']['h']).read_text(encoding='utf8'))
+    assert conceptsets[shard['hand'][0]][:2] == ['1277', 'HAND']
     _main('dump --destination={}'.format(tmp_path / 'test.zip'))
     assert tmp_path.joinpath('test.zip').exists()
+    _main('dump --format binary --destination={}'.format(tmp_path / 'test.bin'))
+    assert tmp_path.joinpath('test.bin').exists()
 
 
 def test_rename(capsys, _main, tmprepos):
@@ -61,19 +88,68 @@ def test_rename(capsys, _main, tmprepos):
     assert tmprepos.joinpath('concepticondata/conceptlists/Moon-2011-234.tsv').exists()
 
 
-def test_graph(capsys, _main, tmprepos):
-    _main('graph', 'List-2023-1308', '--threshold', '3', '--threshold-property', 'FullFams')
+def test_graph(capsys, _main, fixturedir, tmp_path):
+    nets = fixturedir / 'networks.tsv'
+    _main('graph', str(nets), '--threshold', '3', '--threshold-property', 'FullFams')
     out, _ = capsys.readouterr()
-    assert 'GHOST' in out
-    assert 'CASSAVA' not in out
+    assert 'ghost' in out
+    assert 'cassava' not in out
 
-
-def test_upload_sources(_main, mocker, tmprepos):
+    _main('graph', str(nets), str(nets), '--merge', '--format', 'tsv')
+    out, _ = capsys.readouterr()
+    rows = [line.split('\t') for line in out.splitlines()]
+    assert rows[0][-1] == 'OCCURRENCES'
+    assert ['1175', 'GHOST', '53', 'SPIRIT', '20', '40', '4'] in rows
+
+    _main('graph', str(nets), '--output', str(tmp_path / 'graph.tsv'))
+    assert len(tmp_path.joinpath('graph.tsv').read_text(encoding='utf8').splitlines()) == 7
+
+    _main('graph', str(nets), '--output', str(tmp_path / 'graph.bin'), '--output-format', 'binary')
+    edges = list(read_binary_edges(tmp_path / 'graph.bin'))
+    assert len(edges) == 6
+    assert edges[0].target_name == 'spirit' and edges[0].weights == dict(FullFams=5, Weight=10)
+
+    sources = tmp_path / 'sources.tsv'
+    sources.write_text(
+        nets.read_text(encoding='utf8')
+        .replace('LINKED_CONCEPTS', 'SOURCE_CONCEPTS')
+        .replace('"Weight":10}', '"Weight":10,"Note":"cognate"}'),
+        encoding='utf8')
+    _main('graph', str(sources), '--graph-column', 'SOURCE_CONCEPTS', '--format', 'tsv')
+    rows = [line.split('\t') for line in capsys.readouterr()[0].splitlines()]
+    assert rows[0] == [
+        'SOURCE_ID', 'SOURCE_NAME', 'TARGET_ID', 'TARGET_NAME', 'FullFams', 'Weight', 'Note']
+    assert rows[1] == ['Net-2023-4-1', 'ghost', 'Net-2023-4-2', 'spirit', '5', '10', 'cognate']
+    _main('graph', str(sources), '--graph-column', 'SOURCE_CONCEPTS', '--weights', 'Note')
+    assert 'cognate' in capsys.readouterr()[0]
+
+
+def test_upload_sources(_main, mocker, tmprepos, caplog, capsys):
     tmprepos.joinpath('c').write_text('{}', encoding='utf8')
     mocker.patch(
         'pyconcepticon.commands.upload_sources.os',
         mocker.Mock(environ=collections.defaultdict(lambda: 'x')))
     _main('upload_sources', '--cdstar-catalog', str(tmprepos / 'c'))
+    with pytest.raises(SystemExit):
+        _main('upload_sources --backend local')
+    assert '--local-directory is required' in capsys.readouterr()[0]
+
+    sources = tmprepos / 'concepticondata' / 'sources'
+    for name in ['Perrin2010', 'Sun1991', 'Moon2011']:
+        sources.joinpath(name + '.pdf').write_bytes(name.encode('utf8'))
+    _main('upload_sources --backend local --local-directory {0} --jobs 2'.format(
+        tmprepos / 'uploads'))
+    cat = json.loads(sources.joinpath('cdstar.json').read_text(encoding='utf8'))
+    assert 'md5' not in cat['Perrin2010']
+    assert cat['Sun1991']['url'].startswith('file:')
+    assert cat['Moon2011']['md5'] == cat['Moon2011']['objid']
+    assert tmprepos.joinpath('uploads', cat['Sun1991']['objid'], 'Sun1991.pdf').exists()
+    assert 'Moon2011' in sources.joinpath('README.md').read_text(encoding='utf8')
+
+    sources.joinpath('Moon2011.pdf').write_bytes(b'changed')
+    with caplog.at_level(logging.WARNING):
+        _main('upload_sources --backend local --local-directory {0}'.format(tmprepos / 'uploads'))
+    assert 'Moon2011.pdf' in caplog.records[-1].message
 
 
 @pytest.mark.filterwarnings("ignore:Unspecified column")
@@ -84,8 +160,14 @@ def test_notlinked(_main, capsys):
 
 
 @pytest.mark.filterwarnings("ignore:Unspecified column")
-def test_test(_main):
+def test_test(_main, capsys):
     _main('test')
+    capsys.readouterr()
+    status = _main('test --format json')
+    out, _ = capsys.readouterr()
+    report = json.loads(out)
+    assert status == (0 if report['ok'] else 1)
+    assert {t['check'] for t in report['timings']} >= {'conceptlists', 'concepts', 'conceptsets'}
 
 
 @pytest.mark.filterwarnings("ignore:Unspecified column")
@@ -96,6 +178,39 @@ def test_make_linkdata(tmprepos, _main, caplog):
     assert caplog.records
     assert 'checking' in caplog.records[-1].message
     assert tmprepos.joinpath('mappings').exists()
+    maps = {p.name: p.read_bytes() for p in tmprepos.joinpath('mappings').iterdir()}
+    _main('make_linkdata --jobs 2')
+    assert maps == {p.name: p.read_bytes() for p in tmprepos.joinpath('mappings').iterdir()}
+
+
+def test_make_linkdata_incremental(tmprepos, _main, caplog):
+    def maps():
+        return {p.name: p.read_bytes() for p in tmprepos.joinpath('mappings').iterdir()}
+
+    _main('make_linkdata')
+    with caplog.at_level(logging.INFO):
+        _main('make_linkdata --incremental')
+    assert '0 concept lists changed' in caplog.records[-1].message
+
+    cl = tmprepos / 'concepticondata' / 'conceptlists' / 'Perrin-2010-110.tsv'
+    cl.write_text(cl.read_text(encoding='utf8').replace('\tACID\t', '\tSOURISH\t'), encoding='utf8')
+    with caplog.at_level(logging.INFO):
+        _main('make_linkdata --incremental')
+    assert '1 concept lists changed' in caplog.records[-1].message
+    incremental = maps()
+    assert b'SOURISH' in incremental['map-en.tsv']
+    _main('make_linkdata')
+    assert maps() == incremental
+
+    cls = tmprepos / 'concepticondata' / 'conceptlists.tsv'
+    cls.write_text(
+        ''.join(line for line in cls.read_text(encoding='utf8').splitlines(keepends=True)
+                if not line.startswith('Perrin-2010-110')),
+        encoding='utf8')
+    with caplog.at_level(logging.INFO):
+        _main('make_linkdata --incremental')
+    assert '1 concept lists changed' in caplog.records[-1].message
+    assert b'SOURISH' not in maps()['map-en.tsv']
 
 
 def test_create_metadata(tmprepos, _main):
@@ -117,8 +232,46 @@ def test_check(api, capsys, tmp_path, _main):
     test.write_text(t.replace('Sun-1991-1004-1', 'Sun-1991-1004-2'), encoding='utf8')
     _main('check', str(test))
     out, err = capsys.readouterr()
-    print(out)
     assert 'Sun-1991-1004-2 ' in out
+    assert 'column LINKED_CONCEPTS does not occur' in out
+
+    _main('check', '--jobs', '2', str(test), 'Perrin-2010-110')
+    out_parallel, _ = capsys.readouterr()
+    assert out_parallel.startswith(out)
+    assert 'Perrin-2010-110' in out_parallel
+
+    assert _main('check', '--format', 'json', str(test)) == 1
+    report = json.loads(capsys.readouterr()[0])
+    assert not report['ok']
+    assert any(p['check'] == 'unique_id' and p['id'] == 'Sun-1991-1004-2'
+               for p in report['problems'])
+    _main('check', '--format', 'sarif', str(test))
+    sarif = json.loads(capsys.readouterr()[0])
+    assert sarif['runs'][0]['results']
+
+
+def test_check_linked_concepts(tmp_path, capsys, _main):
+    test = tmp_path / 'Moon-2011-2.tsv'
+    test.write_text(
+        'ID\tNUMBER\tENGLISH\tCONCEPTICON_ID\tCONCEPTICON_GLOSS\tLINKED_CONCEPTS\n'
+        'Moon-2011-2-1\t1\thand\t1277\tHAND\t'
+        '[{"ID": "Moon-2011-2-2", "NAME": "arm", "WEIGHT": 2}]\n'
+        'Moon-2011-2-2\t2\tarm\t1673\tARM\t[{"ID": "Moon-2011-2-1", "NAME": "hand"}]\n',
+        encoding='utf8')
+
+    def problems():
+        _main('check', '--format', 'json', str(test))
+        return [p for p in json.loads(capsys.readouterr()[0])['problems']
+                if p['check'] == 'good_graph']
+
+    # A reverse link without numeric attributes is not compared:
+    assert not problems()
+    assert _main('check', '--format', 'sarif', str(test)) == 0
+    capsys.readouterr()
+    test.write_text(
+        test.read_text(encoding='utf8').replace('"NAME": "hand"', '"NAME": "hand", "WEIGHT": 3'),
+        encoding='utf8')
+    assert len(problems()) == 2
 
 
 def test_shring(_main, capsys):
@@ -163,12 +316,28 @@ def test_link(fixturedir, tmp_path, capsys, _main):
     assert 'unknown CONCEPTICON_GLOSS' in out
     assert 'mismatch' in out
 
+    for i in range(3):
+        shutil.copy(fixturedir.joinpath('conceptlist.tsv'), tmp_path / 'bulk{0}.tsv'.format(i))
+    shutil.copy(fixturedir.joinpath('conceptlist2.tsv'), tmp_path / 'bulk3.tsv')
+    _main('link', '--jobs', '2', str(tmp_path / 'bulk*.tsv'), str(tmp_path / 'bulk0.tsv'))
+    out, err = capsys.readouterr()
+    assert 'bulk3.tsv' in out and 'mismatch' in out
+    assert '4 concept lists linked' in out
+    for i in range(3):
+        assert nattr(tmp_path / 'bulk{0}.tsv'.format(i), 'CONCEPTICON_GLOSS') == 1
+    with pytest.raises(SystemExit):
+        _main('link', str(tmp_path / 'xyz*.tsv'))
+
 
 @pytest.mark.filterwarnings("ignore:Unspecified column")
 def test_stats(_main, tmprepos):
     assert not tmprepos.joinpath('concepticondata', 'README.md').exists()
     _main('stats')
     assert tmprepos.joinpath('concepticondata', 'README.md').exists()
+    readme = tmprepos.joinpath('concepticondata', 'README.md').read_text(encoding='utf8')
+    assert tmprepos.joinpath('.cache', 'stats.json').exists()
+    _main('stats')
+    assert tmprepos.joinpath('concepticondata', 'README.md').read_text(encoding='utf8') == readme
 
 
 def test_attributes(_main, capsys):
@@ -185,3 +354,23 @@ def test_lookup(capsys, _main):
     _main('lookup', '--language', 'en', 'sky')
     out, err = capsys.readouterr()
     assert '1732' in out
+
+
+def test_profile(capsys, _main, tmp_path):
+    _main('--profile', str(tmp_path / 'prof'), '--timings', 'lookup', 'sky')
+    out, err = capsys.readouterr()
+    assert '1732' in out
+    assert 'glosses.concept_map' in err and 'Concepticon.mapping' in err
+    assert pstats.Stats(str(tmp_path / 'prof')).total_calls
+
+
+@pytest.mark.filterwarnings("ignore:Unspecified column")
+def test_memory_report(_main, capsys):
+    _main('memory_report --top 1')
+    out, _ = capsys.readouterr()
+    assert 'conceptsets' in out and 'mappings' in out
+    assert 'Sun-1991-1004' in out and 'Perrin-2010-110' not in out
+
+    _main('memory_report --structure relations --format tsv')
+    out, _ = capsys.readouterr()
+    assert 'relations' in out and 'conceptsets' not in out and 'Concept lists' not in out
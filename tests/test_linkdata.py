@@ -0,0 +1,28 @@
+import builtins
+
+import pytest
+
+from pyconcepticon.linkdata import *
+
+
+def test_LinkingData(api, tmp_path):
+    mappings = read_mappings(api)
+    write_binary(tmp_path / 'linkdata.bin', mappings)
+    with LinkingData(tmp_path / 'linkdata.bin') as ld:
+        assert set(ld.languages) == set(mappings)
+        assert list(ld.keys('en')) == sorted(mappings['en'], key=lambda g: g.encode('utf8'))
+        for gloss, values in mappings['en'].items():
+            assert ld.lookup(gloss) == [tuple(v) for v in values]
+        assert ld.lookup('hand')[0][:2] == ('1277', 'HAND')
+        assert ld.lookup('zzzzz') == [] and ld.lookup('') == []
+        with pytest.raises(KeyError):
+            ld.lookup('hand', 'xx')
+
+
+@pytest.mark.parametrize('content', [b'x' * 100, b'x', b''])
+def test_LinkingData_invalid(tmp_path, mocker, content):
+    tmp_path.joinpath('test.bin').write_bytes(content)
+    fopen = mocker.spy(builtins, 'open')
+    with pytest.raises(ValueError):
+        LinkingData(tmp_path / 'test.bin')
+    assert fopen.spy_return.closed
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from pyconcepticon.networks import *
+
+
+@pytest.fixture
+def rows():
+    def row(id_, cid, **kw):
+        res = dict(ID=id_, NUMBER=id_, ENGLISH=id_.lower(), CONCEPTICON_ID=cid)
+        res.update({k: json.dumps(v) for k, v in kw.items()})
+        return res
+
+    return [
+        row('A', '1', LINKED_CONCEPTS=[dict(ID='B', NAME='b', W=3), dict(ID='C', NAME='c', W=1)]),
+        row('B', '2', LINKED_CONCEPTS=[dict(ID='A', NAME='a', W=3, X=2.5)]),
+        row('C', '', SOURCE_CONCEPTS=[dict(ID='A', NAME='a')]),
+    ]
+
+
+def test_iter_edges(rows):
+    edges = list(iter_edges(enumerate(rows, start=2)))
+    assert len(edges) == 4
+    assert edges[-1].source == 'A' and edges[-1].target == 'C' and edges[-1].directed
+    assert len(list(iter_edges(enumerate(rows), threshold=('W', 2)))) == 2
+
+
+def test_EdgeTable(rows):
+    table = EdgeTable.from_rows(rows, conceptlist='cl')
+    assert len(table) == 4
+    assert table[1].weights == {'W': 1}
+    assert table[2].weights == {'W': 3, 'X': 2.5}
+    assert [e.target for e in table.where('W', minimum=2)] == ['B', 'A']
+    assert len(table.where('X', maximum=2)) == 0
+    assert len(table.where('Y')) == 0
+
+    merged = EdgeTable.concat([table, table]).aggregate()
+    assert len(merged) == 1
+    assert merged[0].weights == {'W': 12, 'X': 5, 'OCCURRENCES': 4}
+    assert (merged[0].source, merged[0].target, merged[0].conceptlist) == ('1', '2', 'cl')
+
+
+def test_ConceptNetworks(api):
+    assert list(api.networks) == ['Sun-1991-1004']
+    assert len(api.networks['Sun-1991-1004']) == 2
+    assert len(api.networks.aggregate()) == 1
+    with pytest.raises(KeyError):
+        _ = api.networks['Perrin-2010-110']
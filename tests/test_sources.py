@@ -0,0 +1,30 @@
+import concurrent.futures
+
+from clldutils.path import md5
+from cdstarcat.catalog import Object, Bitstream
+
+from pyconcepticon.sources import CdstarBackend
+
+
+def test_CdstarBackend(tmp_path, mocker):
+    pdf = tmp_path / 'Moon2011.pdf'
+    pdf.write_bytes(b'pdf')
+    checksum = md5(pdf)
+    create = mocker.patch(
+        'pyconcepticon.sources.File.create_object', return_value=(mocker.Mock(), {}, None))
+
+    with CdstarBackend(tmp_path / 'catalog.json', 'http://example.org', 'u', 'p') as backend:
+        def add(obj, metadata=None):
+            res = Object(
+                checksum,
+                [Bitstream(pdf.name, 3, 'application/pdf', checksum, 0, 0)],
+                metadata)
+            backend.catalog.objects[res.id] = res
+            return res
+
+        mocker.patch.object(backend.catalog, 'add', side_effect=add)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as ex:
+            objs = list(ex.map(backend.upload, [pdf] * 8))
+    assert create.call_count == 1
+    assert {obj.id for obj in objs} == {checksum}
+    assert tmp_path.joinpath('catalog.json').exists()
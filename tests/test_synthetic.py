@@ -0,0 +1,28 @@
+import pytest
+
+from pyconcepticon import Concepticon
+from pyconcepticon.synthetic import Scale, generate
+
+
+def test_generate(tmp_path, capsys):
+    scale = Scale(conceptsets=50, conceptlists=3, concepts=20, network_columns=2, languages=3)
+    api = Concepticon(generate(tmp_path / 'repos', scale))
+    assert api.check()
+    assert len(api.conceptsets) == 50
+    assert len(api.conceptlists) == 3
+    assert all(len(cl.concepts) == 20 for cl in api.conceptlists.values())
+    assert set(api.networks) == set(api.conceptlists)
+    assert len(api.relations) > 0
+
+    cs = api.conceptsets['7']
+    assert [m[1] for m in next(api.lookup([cs.gloss.lower()]))] == ['7']
+
+    generate(tmp_path / 'other', scale)
+    for p in tmp_path.joinpath('repos').rglob('*.*'):
+        assert p.read_bytes() == tmp_path.joinpath('other', p.relative_to(tmp_path / 'repos'))\
+            .read_bytes()
+
+
+def test_Scale():
+    with pytest.raises(ValueError):
+        Scale(languages=0)
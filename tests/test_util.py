@@ -49,6 +49,27 @@ Bengtson-1994-27-1	2	knee, to bend	BU(N)KA	1371
     visit(lambda l, r: r, str(fname))
 
 
+def test_ConceptlistReader(tmp_path):
+    fname = tmp_path / 'cl.tsv'
+    fname.write_text("""\
+ID	NUMBER	ENGLISH	CONCEPTICON_ID	CONCEPTICON_GLOSS
+L-1	1	mother	1216	MOTHER
+L-2	2	mom	1216	MOTHER
+	3	mama
+L-10	10	knee	1371	KNEE
+""", encoding='utf8')
+    reader = ConceptlistReader(fname)
+    rows = iter(reader)
+    assert next(rows)['ID'] == 'L-1'
+    assert reader.header[0] == 'ID' and not reader.mergers
+    out = tmp_path / 'out.tsv'
+    write_conceptlist_rows(reversed(list(rows)), out, header=['ID', 'ENGLISH'])
+    assert out.read_text('utf8').split() == ['ID', 'ENGLISH', 'L-10', 'knee', 'L-2', 'mom']
+    assert reader.splits[0]['CONCEPTICON_ID'] == '1216'
+    assert reader.mergers == [['L-1', 'L-2', 'L-2']]
+    assert list(load_conceptlist(fname).keys())[3:] == ['L-1', 'L-2', 'L-10']
+
+
 def test_SourcesCatalog(tmp_path):
     cat_path = tmp_path / 'test.json'
     with SourcesCatalog(cat_path) as cat:
@@ -66,9 +87,106 @@ def test_natural_sort():
     assert natural_sort(source) == target
 
 
+def test_WriteTransaction(tmp_path):
+    tmp_path.joinpath('a.txt').write_text('a', encoding='utf8')
+    tmp_path.joinpath('b.txt').write_text('b', encoding='utf8')
+
+    with pytest.raises(ValueError):
+        with WriteTransaction() as txn:
+            txn.path(tmp_path / 'a.txt').write_text('x', encoding='utf8')
+            txn.remove(tmp_path / 'b.txt')
+            raise ValueError()
+    assert tmp_path.joinpath('a.txt').read_text(encoding='utf8') == 'a'
+    assert tmp_path.joinpath('b.txt').exists()
+    assert len(list(tmp_path.iterdir())) == 2
+
+    committed = []
+    with WriteTransaction(on_commit=lambda: committed.append(1)) as txn:
+        txn.path(tmp_path / 'a.txt').write_text('x', encoding='utf8')
+        txn.path(tmp_path / 'c.txt').write_text('c', encoding='utf8')
+        txn.remove(tmp_path / 'b.txt')
+        assert tmp_path.joinpath('a.txt').read_text(encoding='utf8') == 'a'
+    assert tmp_path.joinpath('a.txt').read_text(encoding='utf8') == 'x'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['a.txt', 'c.txt']
+    assert committed
+
+    with WriteTransaction() as txn:
+        txn.path(tmp_path / 'a.txt')  # staged, but never written
+        txn.path(tmp_path / 'd.txt').write_text('d', encoding='utf8')
+    assert tmp_path.joinpath('a.txt').read_text(encoding='utf8') == 'x'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['a.txt', 'c.txt', 'd.txt']
+
+
+def test_DisjointSet():
+    ds = DisjointSet([('1', '2'), ('3', '4'), ('4', '2')])
+    assert ds.find('1') == ds.find('3')
+    assert ds.find('5') == '5' and '5' not in ds
+    assert ds.groups() == [{'1', '2', '3', '4'}]
+
+
 def test_ConceptlistWithNetworksWriter(tmp_path):
     with ConceptlistWithNetworksWriter(tmp_path / 'stuff') as cl:
         cl.append(dict(TEST_CONCEPTS={"1": 2}))
     res = list(reader(tmp_path / 'stuff.tsv', dicts=True, delimiter='\t'))
     assert res[0]['NUMBER'] == '1'
     assert json.loads(res[0]['TEST_CONCEPTS'])['1'] == 2
+
+
+def test_StreamingConceptlistWithNetworksWriter(tmp_path):
+    rows = [dict(NAME='a', TEST_CONCEPTS=[{"ID": 2}]), dict(NAME='b', TEST_CONCEPTS=[])]
+    with ConceptlistWithNetworksWriter(tmp_path / 'list') as cl:
+        cl.extend(dict(r) for r in rows)
+    with StreamingConceptlistWithNetworksWriter(tmp_path / 'stream') as cl:
+        cl.append(dict(rows[0]))
+        assert len(cl) == 1 and tmp_path.joinpath('stream.tsv').exists()
+        cl.extend([dict(rows[1])])
+    assert tmp_path.joinpath('stream.tsv').read_text(encoding='utf8') == \
+        tmp_path.joinpath('list.tsv').read_text(encoding='utf8').replace('list-', 'stream-')
+
+    with pytest.raises(AssertionError):
+        with StreamingConceptlistWithNetworksWriter(tmp_path / 'empty'):
+            pass
+
+
+def test_CheckReport():
+    report = CheckReport('test')
+    with report.timer('check', 'file.tsv') as t:
+        t['rows'] = 5
+    report.add_problem('check', 'file.tsv', 'problem', level='warning')
+    assert report and report.timings[0]['rows'] == 5
+    report.add_problem('check', 'file.tsv', 'problem', line=3)
+    assert not report
+    assert json.loads(report.dumps('sarif'))['runs'][0]['results'][1]['locations'][0][
+        'physicalLocation']['region']['startLine'] == 3
+
+
+def test_timed_property(mocker):
+    class C(object):
+        id = 'x'
+
+        def __init__(self, timings=None):
+            self.timings = timings
+
+        @timed_property
+        def value(self):
+            return 5
+
+    timings = PhaseTimings()
+    assert C(timings).value == C().value == 5
+    assert timings.records[('C.value', 'x')][1] == 1
+    snapshot = timings.snapshot()
+    timings.add('C.value', 'x', 1)
+    assert snapshot[('C.value', 'x')][1] == 1
+    snapshot = mocker.spy(timings, 'snapshot')
+    assert 'C.value' in timings.table()
+    assert snapshot.called
+
+
+def test_prometheus_text():
+    counters = Counters(a_total=1)
+    counters.update(a_total=2)
+    assert counters.snapshot() == {'a_total': 3}
+    res = prometheus_text(dict(
+        counters=counters, timers={'load': {'x"y': dict(seconds=0.5, calls=2)}}), namespace='n')
+    assert 'n_a_total 3' in res
+    assert 'n_phase_seconds_count{phase="load",item="x\\"y"} 2' in res